@@ -1,4 +1,4 @@
-import { useEffect, useLayoutEffect, useMemo, useRef, useState } from 'react'
+import { useCallback, useEffect, useLayoutEffect, useMemo, useRef, useState } from 'react'
 import gsap from 'gsap'
 import { ScrollTrigger } from 'gsap/ScrollTrigger'
 import { Analytics } from '@vercel/analytics/react'
@@ -25,7 +25,9 @@ import OutroSection from './components/sections/OutroSection'
 import { EXAMPLE_NAMES_BY_LANG } from './components/chapters/shared/chapterConstants'
 import {
   buildTokenizerFromRaw,
+  decodeTrainingTraceChunk,
   getInitialMatch,
+  getTrainingTraceChunkIndices,
   isTrainingTracePayloadValid,
   parseDatasetNamesFromRaw,
 } from './components/chapters/shared/chapterUtils'
@@ -40,6 +42,41 @@ import {
 
 gsap.registerPlugin(ScrollTrigger)
 
+const fetchTrainingTraceChunk = async (source, chunk) => {
+  const response = await fetch(`${source.baseUrl}/${chunk.file}`, { signal: source.signal })
+  if (!response.ok) {
+    throw new Error('failed to fetch training trace chunk')
+  }
+  return response.arrayBuffer()
+}
+
+// Fetches the trace chunks still missing for steps 0..targetStep concurrently, decodes them in
+// step order, and returns the grown payload (or null when nothing new was needed).
+const fetchTrainingTraceSteps = async (source, targetStep) => {
+  const missing = getTrainingTraceChunkIndices(source.manifest, targetStep).slice(source.loadedChunks)
+  if (!missing.length) {
+    return null
+  }
+  const chunks = missing.map((chunkIndex) => source.manifest.chunks[chunkIndex])
+  const buffers = await Promise.all(chunks.map((chunk) => fetchTrainingTraceChunk(source, chunk)))
+  const records = chunks.map((chunk, index) => decodeTrainingTraceChunk(source.manifest, chunk, buffers[index]))
+  if (records.some((chunkRecords) => !chunkRecords)) {
+    throw new Error('invalid training trace chunk')
+  }
+  source.steps = [...source.steps, ...records.flat()]
+  source.loadedChunks += chunks.length
+
+  const { manifest } = source
+  return {
+    format_version: 1,
+    num_steps: manifest.num_steps,
+    step_options: manifest.step_options,
+    optimizer: manifest.optimizer,
+    parameter_options: manifest.parameter_options,
+    steps: source.steps,
+  }
+}
+
 function App() {
   const pageRef = useRef(null)
   const scrollProgressFillRef = useRef(null)
@@ -69,6 +106,7 @@ function App() {
   const [trainingTrace, setTrainingTrace] = useState(null)
   const [trainingTraceStatus, setTrainingTraceStatus] = useState('loading')
   const [trainingTraceErrorKey, setTrainingTraceErrorKey] = useState('')
+  const trainingTraceSourceRef = useRef(null)
   const copy = COPY_BY_LANG[descriptionLanguage] ?? COPY_BY_LANG.en
   const lessonSections = useMemo(
     () => getLessonSectionsForLanguage(descriptionLanguage, exampleLanguage),
@@ -279,12 +317,21 @@ function App() {
       setTrainingTraceErrorKey('')
 
       try {
-        const response = await fetch(`/data/${exampleLanguage}_training_trace.json`, { signal: controller.signal })
-        if (!response.ok) {
-          throw new Error('failed to fetch training trace')
+        const baseUrl = `/data/${exampleLanguage}_training_trace`
+        const manifestResponse = await fetch(`${baseUrl}/manifest.json`, { signal: controller.signal })
+        if (!manifestResponse.ok) {
+          throw new Error('failed to fetch training trace manifest')
+        }
+        const manifest = await manifestResponse.json()
+        if (!Array.isArray(manifest?.chunks) || !manifest.chunks.length) {
+          throw new Error('invalid training trace manifest')
         }
 
-        const payload = await response.json()
+        // Only the chunks for the smallest step preset are fetched up front; Chapter 6 asks
+        // for more through onTrainingTraceStepsRequest when a larger preset is selected.
+        const source = { baseUrl, manifest, signal: controller.signal, steps: [], loadedChunks: 0, queue: Promise.resolve() }
+        const stepOptions = Array.isArray(manifest.step_options) ? manifest.step_options.map(Number) : [0]
+        const payload = await fetchTrainingTraceSteps(source, Math.min(...stepOptions))
         if (!isTrainingTracePayloadValid(payload)) {
           throw new Error('invalid training trace payload')
         }
@@ -293,6 +340,7 @@ function App() {
           return
         }
 
+        trainingTraceSourceRef.current = source
         setTrainingTrace(payload)
         setTrainingTraceStatus('ready')
       } catch (error) {
@@ -309,10 +357,34 @@ function App() {
 
     return () => {
       isActive = false
+      trainingTraceSourceRef.current = null
       controller.abort()
     }
   }, [exampleLanguage])
 
+  const onTrainingTraceStepsRequest = useCallback((targetStep) => {
+    const source = trainingTraceSourceRef.current
+    if (!source) {
+      return
+    }
+    // Requests are chained so chunks are always appended in step order.
+    source.queue = source.queue
+      .then(() => fetchTrainingTraceSteps(source, targetStep))
+      .then((payload) => {
+        if (payload && trainingTraceSourceRef.current === source && isTrainingTracePayloadValid(payload)) {
+          setTrainingTrace(payload)
+        }
+      })
+      .catch((error) => {
+        if (error.name === 'AbortError' || trainingTraceSourceRef.current !== source) {
+          return
+        }
+        setTrainingTrace(null)
+        setTrainingTraceStatus('error')
+        setTrainingTraceErrorKey('trainingTraceLoadFailed')
+      })
+  }, [])
+
   useLayoutEffect(() => {
     let ctx = null
     if (!reducedMotion) {
@@ -573,6 +645,7 @@ function App() {
               <ChapterSixTrainingDemo
                 key={`chapter6-demo-${exampleLanguage}`}
                 trace={trainingTrace}
+                onRequestSteps={onTrainingTraceStepsRequest}
                 reducedMotion={reducedMotion}
                 isMobile={isMobile}
                 copy={copy}
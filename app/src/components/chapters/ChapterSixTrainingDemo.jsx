@@ -10,7 +10,7 @@ import {
 import { clamp, getRoleLabel, hasNumericVector } from './shared/chapterUtils'
 import SectionStateCard from '../common/SectionStateCard'
 
-function ChapterSixTrainingDemo({ trace, reducedMotion, isMobile, copy, exampleLanguage = 'ko' }) {
+function ChapterSixTrainingDemo({ trace, onRequestSteps, reducedMotion, isMobile, copy, exampleLanguage = 'ko' }) {
   const stepOptions = useMemo(() => {
     const raw = Array.isArray(trace?.step_options) ? trace.step_options : CHAPTER_SIX_DEFAULT_STEP_OPTIONS
     const normalized = raw
@@ -77,19 +77,29 @@ function ChapterSixTrainingDemo({ trace, reducedMotion, isMobile, copy, exampleL
   const hasStepRenderedRef = useRef(false)
   const previousAnimatedStepRef = useRef(0)
 
-  const maxTraceStep = Math.max(0, stepRecords.length - 1)
+  // The trace may hold only the chunks loaded so far; presets clamp to the manifest's total, and
+  // playback waits at the last loaded step until the rest arrives.
+  const maxLoadedStep = Math.max(0, stepRecords.length - 1)
+  const totalTraceSteps = Number(trace?.num_steps)
+  const maxTraceStep = Number.isFinite(totalTraceSteps) && totalTraceSteps > 0 ? totalTraceSteps : maxLoadedStep
   const safeTargetStepOptionIndex = clamp(targetStepOptionIndex, 0, Math.max(0, stepOptions.length - 1))
   const safeSelectedParameterIndex = clamp(selectedParameterIndex, 0, Math.max(0, localizedParameterOptions.length - 1))
   const targetStepRaw = Number(stepOptions[safeTargetStepOptionIndex] ?? CHAPTER_SIX_DEFAULT_STEP_OPTIONS[0])
   const targetStep = clamp(targetStepRaw, 0, maxTraceStep)
-  const safeCurrentStep = clamp(currentStep, 0, targetStep)
+  const playableStep = Math.min(targetStep, maxLoadedStep)
+  const safeCurrentStep = clamp(currentStep, 0, playableStep)
+
+  useEffect(() => {
+    // The trace may hold only a prefix of the steps; ask for the rest of the selected preset.
+    onRequestSteps?.(targetStepRaw)
+  }, [onRequestSteps, targetStepRaw])
 
   useEffect(() => {
     if (!hasStarted || !isPlaying) {
       return undefined
     }
 
-    if (safeCurrentStep >= targetStep) {
+    if (safeCurrentStep >= targetStep || safeCurrentStep >= playableStep) {
       return undefined
     }
 
@@ -100,7 +110,7 @@ function ChapterSixTrainingDemo({ trace, reducedMotion, isMobile, copy, exampleL
         setIsStepAnimating(true)
       }
       setCurrentStep((previousStep) => {
-        const nextStep = Math.min(previousStep + 1, targetStep)
+        const nextStep = Math.min(previousStep + 1, playableStep)
         if (nextStep >= targetStep) {
           setIsPlaying(false)
         }
@@ -114,7 +124,7 @@ function ChapterSixTrainingDemo({ trace, reducedMotion, isMobile, copy, exampleL
         chapterSixAdvanceTimerRef.current = null
       }
     }
-  }, [hasStarted, isPlaying, reducedMotion, safeCurrentStep, targetStep])
+  }, [hasStarted, isPlaying, playableStep, reducedMotion, safeCurrentStep, targetStep])
 
   const selectedParameter = localizedParameterOptions[safeSelectedParameterIndex]
   const currentRecord = stepRecords[safeCurrentStep] ?? stepRecords[0]
@@ -198,14 +208,14 @@ function ChapterSixTrainingDemo({ trace, reducedMotion, isMobile, copy, exampleL
   }
 
   const onStepSliderChange = (event) => {
-    const nextStep = clamp(Number(event.target.value), 0, targetStep)
+    const nextStep = clamp(Number(event.target.value), 0, playableStep)
     setCurrentStep(nextStep)
     setIsPlaying(false)
     setIsStepAnimating(false)
   }
 
   const onStepNudge = (direction) => {
-    setCurrentStep((previousStep) => clamp(previousStep + direction, 0, targetStep))
+    setCurrentStep((previousStep) => clamp(previousStep + direction, 0, playableStep))
     setIsPlaying(false)
     setIsStepAnimating(false)
   }
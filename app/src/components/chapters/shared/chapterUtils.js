@@ -388,7 +388,12 @@ export const isTrainingTracePayloadValid = (payload) => {
     return false
   }
 
-  if (!Array.isArray(payload?.steps) || payload.steps.length !== Number(payload.num_steps) + 1) {
+  // Steps may be a loaded prefix of the trace (chunks are fetched on demand).
+  if (
+    !Array.isArray(payload?.steps) ||
+    !payload.steps.length ||
+    payload.steps.length > Number(payload.num_steps) + 1
+  ) {
     return false
   }
 
@@ -428,6 +433,78 @@ export const isTrainingTracePayloadValid = (payload) => {
   return isStepRecordValid
 }
 
+const TRACE_TYPED_ARRAYS = { b: Int8Array, h: Int16Array, i: Int32Array }
+
+// Decodes one `*_training_trace/chunk_NNNN.bin` file (layout in model/trace_format.py)
+// into step records of the original JSON trace shape. Returns null for a malformed chunk.
+export const decodeTrainingTraceChunk = (manifest, chunk, buffer) => {
+  const scale = Number(manifest?.encoding?.scale)
+  const columns = Array.isArray(manifest?.encoding?.columns) ? manifest.encoding.columns : []
+  const dtypes = typeof chunk?.dtypes === 'string' ? chunk.dtypes : ''
+  const startStep = Number(chunk?.start_step)
+  const count = Number(chunk?.end_step) - startStep + 1
+  if (!(scale > 0) || !columns.length || dtypes.length !== columns.length || !(count > 0)) {
+    return null
+  }
+  if (!(buffer instanceof ArrayBuffer) || buffer.byteLength !== Number(chunk.bytes)) {
+    return null
+  }
+
+  const records = Array.from({ length: count }, (_, index) => ({
+    step: startStep + index,
+    word: '',
+    loss: null,
+    learning_rate: null,
+    params: {},
+  }))
+  let offset = 0
+  for (let columnIndex = 0; columnIndex < columns.length; columnIndex += 1) {
+    const column = columns[columnIndex]
+    const TypedArray = TRACE_TYPED_ARRAYS[dtypes[columnIndex]]
+    const length = Number(column.length)
+    if (!TypedArray || !(length > 0)) {
+      return null
+    }
+    let current = null
+    if (column.delta) {
+      current = Array.from(new Int32Array(buffer, offset, length))
+      offset += length * 4
+    }
+    const values = new TypedArray(buffer, offset, count * length)
+    offset += count * length * TypedArray.BYTES_PER_ELEMENT
+    offset += (4 - (offset % 4)) % 4
+
+    records.forEach((record, index) => {
+      let row = Array.from(values.subarray(index * length, (index + 1) * length))
+      if (current) {
+        current = current.map((previous, k) => previous + row[k])
+        row = current
+      }
+      const decoded = row.map((value) => value / scale)
+      if (column.param) {
+        record.params[column.param] = { ...record.params[column.param], [column.name]: decoded }
+      } else {
+        record[column.name] = decoded[0]
+      }
+    })
+  }
+
+  const words = new TextDecoder().decode(new Uint8Array(buffer, offset)).split('\n')
+  records.forEach((record, index) => {
+    record.word = words[index] ?? ''
+  })
+  if (records[0].step === 0) {
+    records[0].loss = null
+  }
+  return records
+}
+
+// Indices of the manifest chunks needed to show steps 0..targetStep.
+export const getTrainingTraceChunkIndices = (manifest, targetStep) => {
+  const chunks = Array.isArray(manifest?.chunks) ? manifest.chunks : []
+  return chunks.flatMap((chunk, index) => (Number(chunk?.start_step) <= targetStep ? [index] : []))
+}
+
 export const rmsNormVector = (vector, epsilon = 1e-5) => {
   if (!vector.length) {
     return []
@@ -0,0 +1,184 @@
+"""
+Content-addressed cache for the asset build (checkpoint, embedding snapshot, trace).
+
+Every build stage has a key: the sha256 of a JSON description of everything
+its output depends on. For training that is the dataset bytes and filter,
+config, optimizer settings, seed, step count, engine and a digest of the
+source files that define the training numerics. Downstream stages key on their own inputs
+only: the snapshot on the training key plus the exporter source, the trace on
+the training key plus the trace settings.
+
+After a stage runs, its output files are copied to ``<root>/<stage>/<key>/``
+together with an ``entry.json`` listing each file's digest. On a later build
+with the same key, ``restore()`` copies the stored files back into place
+(only those that differ) and the stage is skipped.
+
+``build()`` runs a list of stages: cached ones are restored, and the rest are
+produced by one training run with their observers attached. A stage with a
+``rebuild`` callback (the snapshot, which only needs the checkpoint) is rebuilt
+without training when every training stage was a cache hit.
+"""
+
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+
+from observers import TimedObserver
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = BASE_DIR / ".build_cache"
+CACHE_FORMAT_VERSION = 1
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_digest(paths):
+    """Digest of source files, keyed by their path relative to the model directory."""
+    return {
+        Path(path).resolve().relative_to(BASE_DIR).as_posix(): file_digest(path) for path in sorted(map(str, paths))
+    }
+
+
+def cache_key(inputs):
+    payload = json.dumps({"cache_format_version": CACHE_FORMAT_VERSION, **inputs}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def training_inputs(data_path, dataset_filter, config, seed, num_steps, optimizer, engine, batch_size, workers, sources):
+    return {
+        "dataset": file_digest(data_path),
+        "dataset_filter": dataset_filter,
+        "config": config,
+        "seed": seed,
+        "num_steps": num_steps,
+        "optimizer": optimizer,
+        "engine": engine,
+        "batch_size": batch_size,
+        "workers": workers,
+        "sources": source_digest(sources),
+    }
+
+
+def _output_files(path):
+    path = Path(path)
+    if path.is_dir():
+        return sorted(p.relative_to(path).as_posix() for p in path.rglob("*") if p.is_file())
+    return [""] if path.is_file() else None
+
+
+class BuildCache:
+    def __init__(self, root=CACHE_DIR, enabled=True):
+        self.root = Path(root)
+        self.enabled = enabled
+
+    def _entry_dir(self, stage, key):
+        return self.root / stage / key
+
+    def restore(self, stage, key, outputs):
+        """Put the cached outputs of (stage, key) in place. Returns False on a cache miss."""
+        if not self.enabled:
+            return False
+        entry_dir = self._entry_dir(stage, key)
+        entry_path = entry_dir / "entry.json"
+        if not entry_path.exists():
+            return False
+        with entry_path.open(encoding="utf-8") as f:
+            entry = json.load(f)
+        if len(entry["outputs"]) != len(outputs):
+            return False
+
+        for index, (output, stored) in enumerate(zip(outputs, entry["outputs"])):
+            output = Path(output)
+            files = stored["files"]
+            if stored["is_dir"]:
+                current = {name: output / name for name in (_output_files(output) or [])}
+                if output.exists() and not output.is_dir():
+                    output.unlink()
+                for name, target in current.items():
+                    if name not in files:
+                        target.unlink()
+            for name, digest in files.items():
+                target = output / name if stored["is_dir"] else output
+                if target.is_file() and file_digest(target) == digest:
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(entry_dir / str(index) / name if stored["is_dir"] else entry_dir / str(index), target)
+        print(f"build cache hit: {stage} ({key[:12]})")
+        return True
+
+    def store(self, stage, key, outputs, inputs=None):
+        if not self.enabled:
+            return
+        entry_dir = self._entry_dir(stage, key)
+        if entry_dir.exists():
+            shutil.rmtree(entry_dir)
+        entry_dir.mkdir(parents=True)
+
+        stored_outputs = []
+        for index, output in enumerate(outputs):
+            output = Path(output)
+            names = _output_files(output)
+            if names is None:
+                raise FileNotFoundError(f"Build output not found: {output}")
+            is_dir = output.is_dir()
+            if is_dir:
+                shutil.copytree(output, entry_dir / str(index))
+            else:
+                shutil.copyfile(output, entry_dir / str(index))
+            files = {name: file_digest(output / name if is_dir else output) for name in names}
+            stored_outputs.append({"path": str(output), "is_dir": is_dir, "files": files})
+
+        with (entry_dir / "entry.json").open("w", encoding="utf-8") as f:
+            json.dump({"stage": stage, "key": key, "inputs": inputs, "outputs": stored_outputs}, f, ensure_ascii=False, indent=2)
+
+
+class Stage:
+    def __init__(self, name, inputs, outputs, observer, rebuild=None):
+        self.name = name
+        self.inputs = inputs
+        self.key = cache_key(inputs)
+        self.outputs = [Path(output) for output in outputs]
+        self.observer = observer
+        self.rebuild = rebuild
+
+
+def build(cache, stages, train, timings=None):
+    """
+    Restore or rebuild every stage; ``train(observers)`` runs one training pass.
+
+    Wall times go into ``timings`` (if given): "cache_restore", "train" (net of
+    observer time), one entry per rebuilt stage, and "cache_store".
+    Returns the rebuilt stages.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    pending = [stage for stage in stages if not cache.restore(stage.name, stage.key, stage.outputs)]
+    timings["cache_restore"] = time.perf_counter() - start
+
+    if any(stage.rebuild is None for stage in pending):
+        observers = [TimedObserver(stage.observer) for stage in pending]
+        start = time.perf_counter()
+        train(observers)
+        elapsed = time.perf_counter() - start
+        for stage, observer in zip(pending, observers):
+            timings[stage.name] = observer.elapsed
+        timings["train"] = elapsed - sum(observer.elapsed for observer in observers)
+    else:
+        for stage in pending:
+            start = time.perf_counter()
+            stage.rebuild()
+            timings[stage.name] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for stage in pending:
+        cache.store(stage.name, stage.key, stage.outputs, stage.inputs)
+    timings["cache_store"] = time.perf_counter() - start
+    return pending
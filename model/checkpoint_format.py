@@ -0,0 +1,310 @@
+"""
+Binary checkpoint format with memory-mapped, lazily decoded tensors.
+
+Layout (all integers little-endian):
+
+    magic b"MGPT" | uint32 format version | uint32 header length
+    JSON header (config, tokenizer, tensor table, name index file)
+    zero padding up to a 64-byte boundary
+    tensors, row-major, each starting on a 64-byte boundary: float32, or
+    quantized int8 (followed by its float32 per-row scales) or float16
+    optional float32 layer-0 table (layer0_table.py), laid out the same way
+
+The training names are not part of the checkpoint: save() writes them to a
+name_index file next to it (``ko_model.bin`` -> ``ko_model.names``), so the
+checkpoint size does not grow with the corpus.
+
+load() parses only the header. The returned state_dict is a LazyStateDict:
+a tensor is read from the memory-mapped file the first time it is indexed.
+Tensor entries may name their own ``dtype``; the header ``dtype`` is the
+default. Quantized tensors (quantize.py) decode to floats on first use.
+Version 2 files, which end with a newline-separated dataset-name blob, are
+still read. Legacy pickle checkpoints (format_version 1) are read by
+ko_main.load_checkpoint().
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+
+import layer0_table
+import name_index
+import quantize
+
+MAGIC = b"MGPT"
+FORMAT_VERSION = 3
+READABLE_VERSIONS = (2, 3)
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<4sII")
+# Array typecodes of the tensor dtypes; float16 goes through struct instead.
+_TYPECODES = {"float32": "f", "int8": "b"}
+_NUMPY_DTYPES = {"float32": "<f4", "float16": "<f2", "int8": "i1"}
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _to_bytes(matrix, dtype="float32"):
+    flat = [x for row in matrix for x in row]
+    if dtype == "float16":
+        return struct.pack(f"<{len(flat)}e", *flat)
+    values = array(_TYPECODES[dtype], flat)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _encode(matrix, dtype):
+    """
+    ``((dtype, shape, value bytes, scale bytes or None), decoded)`` for one tensor.
+
+    ``decoded`` is the matrix as LazyStateDict will read it back.
+    """
+    rows = [[float(getattr(x, "data", x)) for x in row] for row in matrix]
+    scales = None
+    if dtype == "int8":
+        values, scales = quantize.quantize_int8(rows)
+        decoded = quantize.dequantize_int8(values, scales)
+    elif dtype == "float16":
+        values = decoded = quantize.round_float16(rows)
+    else:
+        values = decoded = [array("f", row).tolist() for row in rows]
+    scale_bytes = _to_bytes([scales]) if scales is not None else None
+    return (dtype, [len(rows), len(rows[0])], _to_bytes(values, dtype), scale_bytes), decoded
+
+
+def is_binary_checkpoint(path):
+    with Path(path).open("rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save(
+    path,
+    config,
+    tokenizer,
+    state_dict,
+    dataset_names=(),
+    with_layer0_table=False,
+    quantization=None,
+    index_file=None,
+):
+    """
+    Write a binary checkpoint plus its name index. ``state_dict`` holds float (or Value) matrices.
+
+    ``quantization`` ("int8" or "float16", see quantize.py) stores wte,
+    lm_head and the layer matrices quantized instead of as float32. With
+    ``with_layer0_table``, the layer-0 table is built from the weights as
+    stored and written after them (add_layer0_table() adds it to an existing file).
+    ``index_file`` points the header at an existing name index in the same
+    directory (of ``dataset_names``) instead of writing a new one, so
+    checkpoints of the same model can share it.
+    """
+    if quantization is not None and quantization not in quantize.QUANT_DTYPES:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {quantize.QUANT_DTYPES}")
+    path = Path(path)
+    tensors, weights = {}, {}
+    for name, mat in state_dict.items():
+        dtype = quantization if quantization is not None and quantize.is_quantizable(name) else "float32"
+        tensors[name], weights[name] = _encode(mat, dtype)
+    groups = {"tensors": tensors}
+    if with_layer0_table:
+        table = layer0_table.build(weights, config)
+        groups["layer0_table"] = {name: _encode(mat, "float32")[0] for name, mat in table.items()}
+    index_path = name_index.index_path(path) if index_file is None else path.parent / index_file
+    header = {
+        "format_version": FORMAT_VERSION,
+        "dtype": "float32",
+        "config": config,
+        "tokenizer": tokenizer,
+        "name_index": {"file": index_path.name, "count": len(dataset_names)} if dataset_names else None,
+    }
+    _write(path, header, groups)
+    if dataset_names and index_file is None:
+        name_index.save(index_path, dataset_names)
+
+
+def add_layer0_table(path):
+    """Rebuild a version 3 checkpoint's layer-0 table from its weights, rewriting the file in place."""
+    path = Path(path)
+    header = read_header(path)
+    if header["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Layer-0 tables need a version {FORMAT_VERSION} checkpoint, got {header['format_version']}")
+    state_dict = LazyStateDict(path, header["tensors"])
+    # Re-encoding decoded weights with their own dtype reproduces the stored bytes.
+    tensors, weights = {}, {}
+    for name in state_dict:
+        tensors[name], weights[name] = _encode(state_dict[name], state_dict.dtype(name))
+    table = layer0_table.build(weights, header["config"])
+    groups = {"tensors": tensors, "layer0_table": {name: _encode(mat, "float32")[0] for name, mat in table.items()}}
+    tmp_path = path.with_name(path.name + ".tmp")
+    _write(tmp_path, header, groups)
+    os.replace(tmp_path, path)
+
+
+def _write(path, header, groups):
+    """
+    Write ``header`` plus the encoded tensors, filling in their offsets.
+
+    ``groups`` maps header keys ("tensors", "layer0_table") to
+    ``{name: (dtype, shape, value bytes, scale bytes or None)}``.
+    """
+    # The header stores absolute offsets, which depend on the header length;
+    # two passes settle it because the padding absorbs small size changes.
+    header = {key: value for key, value in header.items() if key not in groups and key != "layer0_table"}
+    data_start = 0
+    while True:
+        offset = data_start
+        blobs = []
+        for key, tensors in groups.items():
+            entries = {}
+            for name, (dtype, shape, value_bytes, scale_bytes) in tensors.items():
+                entries[name] = {"shape": shape, "offset": offset}
+                if dtype != header["dtype"]:
+                    entries[name]["dtype"] = dtype
+                blobs.append((offset, value_bytes))
+                offset = _align(offset + len(value_bytes))
+                if scale_bytes is not None:
+                    entries[name]["scale_offset"] = offset
+                    blobs.append((offset, scale_bytes))
+                    offset = _align(offset + len(scale_bytes))
+            header[key] = entries
+        header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        needed = _align(_PREAMBLE.size + len(header_bytes))
+        if needed == data_start:
+            break
+        data_start = needed
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for offset, blob in blobs:
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(blob)
+
+
+def read_header(path):
+    with Path(path).open("rb") as f:
+        magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"Not a binary checkpoint: {Path(path).resolve()}")
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported binary checkpoint version {version}, expected one of {READABLE_VERSIONS}")
+        return json.loads(f.read(header_len).decode("utf-8"))
+
+
+class LazyStateDict(Mapping):
+    """Read-only state_dict backed by a memory-mapped checkpoint.
+
+    Indexing returns the tensor as a list of float rows, decoded (and
+    dequantized) on first use and cached. array() returns a zero-copy NumPy
+    view instead, dequantized for int8 tensors; quantized() gives the stored
+    int8/float16 values and scales as they are.
+    """
+
+    def __init__(self, path, tensors):
+        self.path = Path(path)
+        self.tensors = tensors
+        self._cache = {}
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __reduce__(self):
+        # Worker processes re-map the file instead of receiving the tensors.
+        return (LazyStateDict, (self.path, self.tensors))
+
+    def _read(self, offset, dtype, count):
+        if dtype == "float16":
+            return list(struct.unpack_from(f"<{count}e", self._mm, offset))
+        values = array(_TYPECODES[dtype])
+        values.frombytes(self._mm[offset : offset + values.itemsize * count])
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values.tolist()
+
+    def __getitem__(self, name):
+        matrix = self._cache.get(name)
+        if matrix is None:
+            entry = self.tensors[name]
+            rows, cols = entry["shape"]
+            flat = self._read(entry["offset"], self.dtype(name), rows * cols)
+            matrix = [flat[r * cols : (r + 1) * cols] for r in range(rows)]
+            if "scale_offset" in entry:
+                matrix = quantize.dequantize_int8(matrix, self._read(entry["scale_offset"], "float32", rows))
+            self._cache[name] = matrix
+        return matrix
+
+    def __iter__(self):
+        return iter(self.tensors)
+
+    def __len__(self):
+        return len(self.tensors)
+
+    def dtype(self, name):
+        return self.tensors[name].get("dtype", "float32")
+
+    def quantized(self, name):
+        """``(values, scales)`` as stored for an int8 or float16 tensor (scales None for float16), else None."""
+        import numpy as np
+
+        entry = self.tensors[name]
+        dtype = self.dtype(name)
+        if dtype not in quantize.QUANT_DTYPES:
+            return None
+        rows, cols = entry["shape"]
+        values = np.frombuffer(self._mm, dtype=_NUMPY_DTYPES[dtype], count=rows * cols, offset=entry["offset"])
+        scales = None
+        if "scale_offset" in entry:
+            scales = np.frombuffer(self._mm, dtype="<f4", count=rows, offset=entry["scale_offset"])
+        return values.reshape(rows, cols), scales
+
+    def array(self, name):
+        import numpy as np
+
+        entry = self.tensors[name]
+        rows, cols = entry["shape"]
+        dtype = _NUMPY_DTYPES[self.dtype(name)]
+        values = np.frombuffer(self._mm, dtype=dtype, count=rows * cols, offset=entry["offset"]).reshape(rows, cols)
+        if "scale_offset" in entry:
+            scales = np.frombuffer(self._mm, dtype="<f4", count=rows, offset=entry["scale_offset"])
+            values = values * scales.astype(np.float64)[:, None]
+        return values
+
+    def loaded(self):
+        """Names of the tensors decoded so far."""
+        return list(self._cache)
+
+
+def load(path):
+    """
+    Checkpoint dict with the same keys as a pickle checkpoint; tensors stay on disk until used.
+
+    Instead of a ``dataset_names`` list, a version 3 checkpoint has ``name_index``:
+    a NameIndex (or None if the checkpoint was saved without names), and
+    ``layer0_table``: a LazyStateDict of the layer-0 table, or None.
+    """
+    path = Path(path)
+    header = read_header(path)
+    checkpoint = {
+        "format_version": header["format_version"],
+        "config": header["config"],
+        "tokenizer": header["tokenizer"],
+        "state_dict": LazyStateDict(path, header["tensors"]),
+        "layer0_table": LazyStateDict(path, header["layer0_table"]) if header.get("layer0_table") else None,
+    }
+    if "dataset_names" in header:
+        names = header["dataset_names"]
+        with path.open("rb") as f:
+            f.seek(names["offset"])
+            names_text = f.read(names["length"]).decode("utf-8")
+        checkpoint["dataset_names"] = names_text.split("\n") if names["count"] else []
+    else:
+        entry = header.get("name_index")
+        checkpoint["name_index"] = name_index.load(path.parent / entry["file"]) if entry else None
+    return checkpoint
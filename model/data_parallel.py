@@ -0,0 +1,102 @@
+"""
+Data-parallel gradient computation over a pool of worker processes.
+
+DataParallelEngine has the same forward_backward(sequences) interface as the
+single-process engines. Each step it publishes the current parameters to a
+shared-memory buffer, splits the minibatch into one contiguous shard per
+worker, lets every worker write its shard gradient into its own shared slot,
+and averages the slots (weighted by shard size) into ``params.grad`` of the
+parent's optim.FlatParams (one vectorized sum over NumPy views of the slots
+when NumPy is installed). The optimizer step then runs once, in the parent
+process.
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from optim import FlatParams
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_worker = {}
+
+
+def _init_worker(shm_name, shapes, build_engine, engine, config):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    params = FlatParams(shapes)
+    grad_engine = build_engine(engine, params, config)
+    _worker.update(shm=shm, buf=shm.buf.cast("d"), engine=grad_engine, params=params)
+
+
+def _shard_grad(task):
+    slot, sequences = task
+    buf = _worker["buf"]
+    params = _worker["params"]
+    size = params.size
+
+    memoryview(params.data)[:] = buf[:size]
+    params.grad[:] = array("d", bytes(8 * size))
+    loss = _worker["engine"].forward_backward(sequences)
+
+    offset = (slot + 1) * size
+    buf[offset : offset + size] = memoryview(params.grad)
+    return loss
+
+
+class DataParallelEngine:
+    def __init__(self, build_engine, engine, params, config, workers):
+        if workers <= 1:
+            raise ValueError("DataParallelEngine needs workers > 1")
+        self.workers = workers
+        self.params = params
+        self.num_params = params.size
+
+        # Layout: [params | grad slot 0 | ... | grad slot workers-1], float64.
+        self._shm = shared_memory.SharedMemory(create=True, size=8 * self.num_params * (workers + 1))
+        self._buf = self._shm.buf.cast("d")
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self._shm.name, params.shapes, build_engine, engine, config),
+        )
+
+    def forward_backward(self, sequences):
+        buf = self._buf
+        num_params = self.num_params
+        buf[:num_params] = memoryview(self.params.data)
+
+        batch = len(sequences)
+        bounds = [k * batch // self.workers for k in range(self.workers + 1)]
+        shards = [sequences[bounds[k] : bounds[k + 1]] for k in range(self.workers)]
+        tasks = [(slot, shard) for slot, shard in enumerate(shards) if shard]
+        losses = list(self._executor.map(_shard_grad, tasks))
+
+        # Reduce in slot order so the result does not depend on scheduling.
+        slots = [slot for slot, _ in tasks]
+        weights = [len(shard) / batch for _, shard in tasks]
+        loss = 0.0
+        for weight, shard_loss in zip(weights, losses):
+            loss += weight * shard_loss
+        if np is not None:
+            slot_grads = np.frombuffer(buf, dtype=np.float64)[num_params:].reshape(self.workers, num_params)
+            grad = np.frombuffer(self.params.grad, dtype=np.float64)
+            grad += (slot_grads[slots] * np.array(weights)[:, None]).sum(axis=0)
+            return loss
+
+        grads = [0.0] * num_params
+        for slot, weight in zip(slots, weights):
+            offset = (slot + 1) * num_params
+            grads = [g + weight * x for g, x in zip(grads, buf[offset : offset + num_params])]
+        grad = self.params.grad
+        grad[:] = array("d", [g + x for g, x in zip(grad, grads)])
+        return loss
+
+    def close(self):
+        self._executor.shutdown()
+        self._buf.release()
+        self._shm.close()
+        self._shm.unlink()
@@ -0,0 +1,120 @@
+"""
+Graph-free inference on plain floats for checkpoints written by ko_main.save().
+
+gpt() mirrors ko_main.gpt() op for op: sums accumulate left to right and
+divisions are multiplications by the reciprocal, exactly like the Value
+operators. Sampling with the same seed therefore returns the same names as the
+Value path, without allocating an autograd graph per token.
+"""
+
+import math
+
+
+def dot(w, x):
+    acc = 0
+    for wi, xi in zip(w, x):
+        acc += wi * xi
+    return acc
+
+
+def linear(x, w):
+    return [dot(wo, x) for wo in w]
+
+
+def softmax(logits):
+    max_val = max(logits)
+    exps = [math.exp(val - max_val) for val in logits]
+    total = 0
+    for e in exps:
+        total += e
+    inv_total = total**-1
+    return [e * inv_total for e in exps]
+
+
+def rmsnorm(x):
+    ms = dot(x, x) * len(x) ** -1
+    scale = (ms + 1e-5) ** -0.5
+    return [xi * scale for xi in x]
+
+
+def sampling_probs(logits, temperature):
+    inv_temperature = temperature**-1
+    return softmax([l * inv_temperature for l in logits])
+
+
+def filter_probs(probs, top_k=None, top_p=None):
+    """List version of numpy_inference.filter_probs(): zero all but the top-k / nucleus tokens."""
+    ranked = sorted(probs, reverse=True)
+    if top_k is not None and top_k < len(probs):
+        kth = ranked[top_k - 1]
+        probs = [p if p >= kth else 0.0 for p in probs]
+        ranked = [p for p in ranked if p >= kth]
+    if top_p is not None:
+        threshold = top_p * sum(ranked)
+        mass = 0.0
+        smallest = ranked[-1]
+        for p in ranked:
+            if mass >= threshold:
+                break
+            smallest = p
+            mass += p
+        probs = [p if p >= smallest else 0.0 for p in probs]
+    return probs
+
+
+def new_kv_cache(config):
+    """Empty per-layer key and value lists for gpt(); ko_main.gpt() reads the same layout."""
+    n_layer = config["n_layer"]
+    return [[] for _ in range(n_layer)], [[] for _ in range(n_layer)]
+
+
+def gpt(token_id, pos_id, keys, values, state_dict, config, table=None):
+    """Logits for one position; ``table`` (layer0_table.build()) replaces the embedding and layer 0's Q/K/V."""
+    n_layer = config["n_layer"]
+    n_embd = config["n_embd"]
+    n_head = config["n_head"]
+    head_dim = n_embd // n_head
+    inv_scale = (head_dim**0.5) ** -1
+
+    if table is not None:
+        row = token_id * config["block_size"] + pos_id  # layer0_table.row_index()
+        x = table["x"][row]
+    else:
+        tok_emb = state_dict["wte"][token_id]
+        pos_emb = state_dict["wpe"][pos_id]
+        x = [t + p for t, p in zip(tok_emb, pos_emb)]
+        x = rmsnorm(x)
+
+    for li in range(n_layer):
+        x_residual = x
+        if li == 0 and table is not None:
+            q, k, v = table["q"][row], table["k"][row], table["v"][row]
+        else:
+            x = rmsnorm(x)
+            q = linear(x, state_dict[f"layer{li}.attn_wq"])
+            k = linear(x, state_dict[f"layer{li}.attn_wk"])
+            v = linear(x, state_dict[f"layer{li}.attn_wv"])
+        keys[li].append(k)
+        values[li].append(v)
+
+        x_attn = []
+        for h in range(n_head):
+            hs = h * head_dim
+            he = hs + head_dim
+            q_h = q[hs:he]
+            attn_logits = [dot(q_h, ki[hs:he]) * inv_scale for ki in keys[li]]
+            attn_weights = softmax(attn_logits)
+            for j in range(hs, he):
+                x_attn.append(dot(attn_weights, [vi[j] for vi in values[li]]))
+
+        x = linear(x_attn, state_dict[f"layer{li}.attn_wo"])
+        x = [a + b for a, b in zip(x, x_residual)]
+
+        x_residual = x
+        x = rmsnorm(x)
+        x = linear(x, state_dict[f"layer{li}.mlp_fc1"])
+        x = [xi if xi > 0 else 0.0 for xi in x]
+        x = linear(x, state_dict[f"layer{li}.mlp_fc2"])
+        x = [a + b for a, b in zip(x, x_residual)]
+
+    return linear(x, state_dict["lm_head"])
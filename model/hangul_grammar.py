@@ -0,0 +1,102 @@
+"""
+Hangul syllable grammar for decoding over NFD jamo tokens.
+
+A Korean name is a sequence of syllables, each one choseong (initial), one
+jungseong (medial) and an optional jongseong (final). HangulGrammar turns that
+into a small state machine over the tokenizer's vocabulary and precomputes,
+for every state, the 0/1 mask of tokens that keep the sequence composable and
+the state each token leads to. Decoding then costs one table lookup per token.
+
+States track the phase (start, after choseong, after jungseong, after
+jongseong) and, with ``max_syllables``, how many syllables have been started.
+BOS is only allowed after a complete syllable, and a new choseong only while
+the syllable limit has room.
+"""
+
+CHOSEONG = range(0x1100, 0x1113)
+JUNGSEONG = range(0x1161, 0x1176)
+JONGSEONG = range(0x11A8, 0x11C3)
+
+START, CHO, JUNG, JONG = range(4)
+INVALID = -1
+
+
+def jamo_class(token):
+    code = ord(token) if len(token) == 1 else -1
+    if code in CHOSEONG:
+        return CHO
+    if code in JUNGSEONG:
+        return JUNG
+    if code in JONGSEONG:
+        return JONG
+    return None
+
+
+class HangulGrammar:
+    """
+    Per-state token masks and transitions for a jamo vocabulary.
+
+    ``masks[state]`` lists 1.0 for allowed token ids and 0.0 otherwise;
+    ``final_masks[state]`` is the same for the last position a sample can use
+    (``max_tokens - 1``), where a new syllable could not be completed.
+    ``transitions[state][token_id]`` is the next state, INVALID for BOS and
+    for disallowed tokens.
+    """
+
+    def __init__(self, uchars, bos, max_syllables=None):
+        if max_syllables is not None and max_syllables <= 0:
+            raise ValueError("max_syllables must be > 0")
+        classes = [jamo_class(token) for token in uchars]
+        unknown = [token for token, cls in zip(uchars, classes) if cls is None]
+        if unknown:
+            raise ValueError(f"Hangul grammar needs a jamo vocabulary, got non-jamo tokens {unknown[:5]}")
+
+        self.bos = bos
+        self.max_syllables = max_syllables
+        vocab_size = len(uchars) + 1
+        # Without a limit, syllable counts collapse into one.
+        limit = max_syllables or 1
+        self.num_states = 1 + 3 * limit
+        self.masks = []
+        self.final_masks = []
+        self.transitions = []
+        for state in range(self.num_states):
+            phase, syllables = self.phase(state)
+            next_states = [INVALID] * vocab_size
+            for token_id, cls in enumerate(classes):
+                if cls == CHO and phase in (START, JUNG, JONG) and (max_syllables is None or syllables < limit):
+                    next_states[token_id] = self.state(CHO, min(syllables + 1, limit))
+                elif (cls == JUNG and phase == CHO) or (cls == JONG and phase == JUNG):
+                    next_states[token_id] = self.state(cls, syllables)
+            mask = [0.0 if next_state == INVALID else 1.0 for next_state in next_states]
+            mask[bos] = 1.0 if phase in (JUNG, JONG) else 0.0
+            final_mask = [0.0 if cls == CHO else allowed for cls, allowed in zip(classes + [None], mask)]
+            self.masks.append(mask)
+            self.final_masks.append(final_mask)
+            self.transitions.append(next_states)
+
+    @staticmethod
+    def state(phase, syllables):
+        return 0 if phase == START else 1 + 3 * (syllables - 1) + (phase - CHO)
+
+    @staticmethod
+    def phase(state):
+        """(phase, syllables started) of a state id."""
+        if state == 0:
+            return START, 0
+        syllables, offset = divmod(state - 1, 3)
+        return CHO + offset, syllables + 1
+
+    def mask(self, state, last=False):
+        return self.final_masks[state] if last else self.masks[state]
+
+    def step(self, state, token_id):
+        return self.transitions[state][token_id]
+
+    def walk(self, token_ids, state=0):
+        """State after ``token_ids``; ValueError if the grammar does not allow them."""
+        for token_id in token_ids:
+            state = self.step(state, token_id)
+            if state == INVALID:
+                raise ValueError("Token sequence does not follow the Hangul syllable grammar")
+        return state
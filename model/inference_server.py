@@ -0,0 +1,474 @@
+"""
+Long-lived HTTP inference server for the ko and en checkpoints (stdlib asyncio).
+
+Each checkpoint is loaded once into a numpy_inference.NumpyModel. Requests go
+through a MicroBatcher: requests that arrive within ``BATCH_WINDOW`` seconds
+of each other are grouped by what they ask for, and each group runs as one
+lockstep batch (one sample() call for all of a group's names, one score()
+call for every name to score). Model work runs on a single worker thread so
+the event loop keeps accepting connections meanwhile.
+
+Endpoints (JSON in, JSON out):
+
+    POST /generate  {"lang": "ko", "n": 10, "temperature": 0.5, ...}
+    POST /complete  {"lang": "ko", "prefix": "서", "n": 10, ...}
+    POST /score     {"lang": "en", "names": ["emma", "zzz"]}
+    GET  /stats     p50/p99 latency per endpoint, queue depth, batch sizes
+    GET  /health
+"""
+
+import asyncio
+import json
+import math
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy_inference
+from ko_main import TEMPERATURE, _decoding_constraints, _load_for_inference, load_checkpoint, prefill_state
+from languages import LANGUAGES
+from prefix_cache import encode_prefix
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+# How long the first request of a batch waits for others to join it.
+BATCH_WINDOW = 0.005
+MAX_BATCH_SAMPLES = numpy_inference.SAMPLE_BATCH_SIZE
+MAX_REQUEST_SAMPLES = 1000
+MAX_BODY_BYTES = 1 << 16
+# Latencies kept per endpoint for the percentiles in /stats.
+LATENCY_WINDOW = 10000
+
+
+class LoadedModel:
+    """One language's checkpoint, numpy model, tokenizer and training names."""
+
+    def __init__(self, spec, checkpoint=None):
+        checkpoint, names = _load_for_inference(checkpoint or load_checkpoint(spec.checkpoint_path))
+        self.spec = spec
+        self.checkpoint = checkpoint
+        self.names = names
+        self.config = checkpoint["config"]
+        self.uchars = checkpoint["tokenizer"]["uchars"]
+        self.bos = checkpoint["tokenizer"]["BOS"]
+        self.model = numpy_inference.NumpyModel(checkpoint["state_dict"], self.config, checkpoint.get("layer0_table"))
+        self._constraints = {}
+
+    def encode(self, text):
+        """(token ids, tokens banned right after them) of user text."""
+        return encode_prefix(text.lower() if self.spec.lowercase else text, self.checkpoint["tokenizer"])
+
+    def decode(self, token_ids):
+        return unicodedata.normalize("NFC", "".join(self.uchars[token_id] for token_id in token_ids))
+
+    def in_dataset(self, text):
+        # Same as ko_main.inference(): "N/A" when the checkpoint has no training names.
+        return text in self.names if self.names else "N/A"
+
+    def constraints(self, max_tokens, novel_only, hangul_grammar, max_syllables):
+        """_decoding_constraints(), kept so name tries and grammars are built once per option set."""
+        key = (max_tokens, novel_only, hangul_grammar, max_syllables)
+        if key not in self._constraints:
+            self._constraints[key] = _decoding_constraints(
+                self.checkpoint, self.names, max_tokens, novel_only, hangul_grammar, max_syllables
+            )
+        return self._constraints[key]
+
+
+def _number(body, key, default, cast, low=None, high=None):
+    value = body.get(key, default)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"'{key}' must be {'an integer' if cast is int else 'a number'}")
+    # json.loads() reads 1e400 as inf and accepts NaN / Infinity.
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f"'{key}' must be finite")
+    if cast is int and value != int(value):
+        raise ValueError(f"'{key}' must be an integer")
+    try:
+        value = cast(value)
+    except OverflowError:
+        raise ValueError(f"'{key}' is out of range") from None
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise ValueError(f"'{key}' must be in [{low}, {high}]")
+    return value
+
+
+def _flag(body, key):
+    value = body.get(key, False)
+    if not isinstance(value, bool):
+        raise ValueError(f"'{key}' must be true or false")
+    return value
+
+
+class Job:
+    def __init__(self, key, size, payload, future):
+        self.key = key
+        self.size = size
+        self.payload = payload
+        self.future = future
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent jobs into batches and run each key group in one call.
+
+    ``run_group(key, payloads)`` runs on a single worker thread and returns
+    one result per payload. A batch closes ``window`` seconds after its first
+    job or once it holds ``max_size`` samples; jobs submitted while a batch
+    runs wait in the queue and form the next one.
+    """
+
+    def __init__(self, run_group, window=BATCH_WINDOW, max_size=MAX_BATCH_SAMPLES):
+        self.run_group = run_group
+        self.window = window
+        self.max_size = max_size
+        self.queue = asyncio.Queue()
+        self.in_flight = 0
+        self.max_depth = 0
+        self.batches = 0
+        self.batched_jobs = 0
+        self.batched_samples = 0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def depth(self):
+        """Jobs submitted and not answered yet (queued or running)."""
+        return self.queue.qsize() + self.in_flight
+
+    async def submit(self, key, size, payload):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(Job(key, size, payload, future))
+        self.max_depth = max(self.max_depth, self.depth)
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = batch[0].size
+            deadline = loop.time() + self.window
+            while size < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    job = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(job)
+                size += job.size
+
+            self.in_flight = len(batch)
+            groups = {}
+            for job in batch:
+                groups.setdefault(job.key, []).append(job)
+            for key, jobs in groups.items():
+                try:
+                    results = await loop.run_in_executor(
+                        self._executor, self.run_group, key, [job.payload for job in jobs]
+                    )
+                except Exception as exc:
+                    for job in jobs:
+                        if not job.future.done():
+                            job.future.set_exception(exc)
+                else:
+                    for job, result in zip(jobs, results):
+                        if not job.future.done():
+                            job.future.set_result(result)
+                self.in_flight -= len(jobs)
+            self.batches += 1
+            self.batched_jobs += len(batch)
+            self.batched_samples += size
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LatencyStats:
+    """Recent request latencies per endpoint, for nearest-rank percentiles."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.latencies = {}
+        self.counts = {}
+
+    def record(self, endpoint, seconds):
+        self.latencies.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    @staticmethod
+    def percentile(values, q):
+        ordered = sorted(values)
+        return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+    def report(self):
+        return {
+            endpoint: {
+                "count": self.counts[endpoint],
+                "p50_ms": 1000 * self.percentile(latencies, 50),
+                "p99_ms": 1000 * self.percentile(latencies, 99),
+            }
+            for endpoint, latencies in self.latencies.items()
+        }
+
+
+class InferenceServer:
+    """
+    The HTTP front end: parses requests, submits them to the MicroBatcher and
+    answers with JSON. ``models`` maps language names to LoadedModel.
+    """
+
+    def __init__(self, models, window=BATCH_WINDOW, max_batch_samples=MAX_BATCH_SAMPLES):
+        self.models = models
+        self.batcher = MicroBatcher(self._run_group, window, max_batch_samples)
+        self.stats = LatencyStats()
+        self.started = time.monotonic()
+        self.routes = {
+            ("POST", "/generate"): self.generate,
+            ("POST", "/complete"): self.complete,
+            ("POST", "/score"): self.score,
+            ("GET", "/stats"): self.report,
+            ("GET", "/health"): self.health,
+        }
+        self._batcher_task = None
+
+    async def start(self, host=SERVER_HOST, port=SERVER_PORT):
+        """Start listening; returns the asyncio.Server (``port=0`` picks a free port)."""
+        self._batcher_task = asyncio.create_task(self.batcher.run())
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def stop(self, server):
+        server.close()
+        await server.wait_closed()
+        self._batcher_task.cancel()
+        self.batcher.close()
+
+    # --- endpoints -------------------------------------------------------
+
+    def _model(self, body):
+        lang = body.get("lang", "ko")
+        if not isinstance(lang, str) or lang not in self.models:
+            raise ValueError(f"Unknown lang {lang!r}, expected one of {sorted(self.models)}")
+        return lang, self.models[lang]
+
+    def _sampling_options(self, body, model):
+        temperature = _number(body, "temperature", TEMPERATURE, float)
+        if temperature <= 0:
+            raise ValueError("temperature must be > 0")
+        top_p = _number(body, "top_p", None, float)
+        if top_p is not None and not 0 < top_p <= 1:
+            raise ValueError("top_p must be in (0, 1]")
+        block_size = model.config["block_size"]
+        return (
+            temperature,
+            _number(body, "top_k", None, int, 1),
+            top_p,
+            _number(body, "max_tokens", None, int, 1, block_size),
+            _flag(body, "novel_only"),
+            _flag(body, "hangul_grammar"),
+            _number(body, "max_syllables", None, int, 1, block_size),
+        )
+
+    async def _sample(self, body, prefix):
+        lang, model = self._model(body)
+        n = _number(body, "n", 10, int, 1, MAX_REQUEST_SAMPLES)
+        seed = _number(body, "seed", None, int, 0)
+        options = self._sampling_options(body, model)
+        max_tokens, grammar, _ = model.constraints(*options[3:])
+        prefix_ids, banned = model.encode(prefix) if prefix else ([], [])
+        if len(prefix_ids) >= max_tokens:
+            raise ValueError(f"Prefix {prefix!r} is {len(prefix_ids)} tokens, max_tokens is {max_tokens}")
+        if grammar is not None:
+            grammar.walk(prefix_ids)
+        # Requests with a seed get a group of their own so their names only depend on it.
+        key = ("sample", lang, tuple(prefix_ids), tuple(banned), options, seed, object() if seed is not None else None)
+        samples = await self.batcher.submit(key, n, n)
+        names = []
+        for sample_ids in samples:
+            text = model.decode(sample_ids)
+            names.append({"name": text, "in_dataset": model.in_dataset(text)})
+        return {"lang": lang, "names": names}
+
+    async def generate(self, body):
+        return await self._sample(body, "")
+
+    async def complete(self, body):
+        prefix = body.get("prefix")
+        if not isinstance(prefix, str) or not prefix:
+            raise ValueError("'prefix' must be a non-empty string")
+        return await self._sample(body, prefix)
+
+    async def score(self, body):
+        lang, model = self._model(body)
+        texts = body.get("names")
+        if not isinstance(texts, list) or not texts or not all(isinstance(text, str) for text in texts):
+            raise ValueError("'names' must be a non-empty list of strings")
+        if len(texts) > MAX_REQUEST_SAMPLES:
+            raise ValueError(f"At most {MAX_REQUEST_SAMPLES} names per request")
+        sequences = [model.encode(text)[0] for text in texts]
+        too_long = [text for text, sequence in zip(texts, sequences) if len(sequence) > model.config["block_size"]]
+        if too_long:
+            raise ValueError(f"{too_long[0]!r} does not fit block_size {model.config['block_size']}")
+        log_probs = await self.batcher.submit(("score", lang), len(sequences), sequences)
+        scores = []
+        for sequence, log_prob in zip(sequences, log_probs):
+            text = model.decode(sequence)
+            scores.append(
+                {
+                    "name": text,
+                    "log_prob": log_prob,
+                    "prob": math.exp(log_prob),
+                    "tokens": len(sequence),
+                    "in_dataset": model.in_dataset(text),
+                }
+            )
+        return {"lang": lang, "scores": scores}
+
+    async def report(self, body):
+        batcher = self.batcher
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "latency": self.stats.report(),
+            "queue_depth": batcher.depth,
+            "max_queue_depth": batcher.max_depth,
+            "batches": batcher.batches,
+            "mean_batch_requests": batcher.batched_jobs / batcher.batches if batcher.batches else 0.0,
+            "mean_batch_samples": batcher.batched_samples / batcher.batches if batcher.batches else 0.0,
+        }
+
+    async def health(self, body):
+        return {"status": "ok", "langs": sorted(self.models)}
+
+    # --- model work (batcher thread) --------------------------------------
+
+    def _run_group(self, key, payloads):
+        if key[0] == "score":
+            model = self.models[key[1]]
+            sequences = [sequence for payload in payloads for sequence in payload]
+            log_probs = numpy_inference.score(model.model, model.bos, sequences).tolist()
+            results, start = [], 0
+            for payload in payloads:
+                results.append(log_probs[start : start + len(payload)])
+                start += len(payload)
+            return results
+
+        _, lang, prefix_ids, banned, options, seed, _ = key
+        model = self.models[lang]
+        temperature, top_k, top_p, *constraints = options
+        max_tokens, grammar, trie = model.constraints(*constraints)
+        prefill = None
+        if prefix_ids:
+            prefill = prefill_state("numpy", model.model, model.config, model.bos, list(prefix_ids))
+        samples = numpy_inference.sample(
+            model.model,
+            sum(payloads),
+            temperature,
+            model.bos,
+            max_tokens,
+            seed,
+            trie=trie,
+            grammar=grammar,
+            top_k=top_k,
+            top_p=top_p,
+            prefill=prefill,
+            banned=banned,
+        )
+        results, start = [], 0
+        for n in payloads:
+            results.append(samples[start : start + n])
+            start += n
+        return results
+
+    # --- HTTP -------------------------------------------------------------
+
+    async def _respond(self, method, target, body):
+        path = target.split("?", 1)[0]
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"{method} not allowed on {path}"}
+            return HTTPStatus.NOT_FOUND, {"error": f"No endpoint {path}"}
+
+        start = time.perf_counter()
+        try:
+            request = json.loads(body) if body else {}
+            if not isinstance(request, dict):
+                raise ValueError("Request body must be a JSON object")
+            status, payload = HTTPStatus.OK, await handler(request)
+        except ValueError as exc:  # includes json.JSONDecodeError
+            status, payload = HTTPStatus.BAD_REQUEST, {"error": str(exc)}
+        except Exception as exc:
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"}
+        if method == "POST":
+            self.stats.record(path, time.perf_counter() - start)
+        return status, payload
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode("latin-1").split()
+                length = headers.get("content-length", "0")
+                if len(parts) != 3 or not length.isdigit():
+                    writer.write(_http_response(HTTPStatus.BAD_REQUEST, {"error": "Malformed request"}, False))
+                    break
+                method, target, version = parts
+                if int(length) > MAX_BODY_BYTES:
+                    error = {"error": f"Body over {MAX_BODY_BYTES} bytes"}
+                    writer.write(_http_response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, error, False))
+                    break
+                body = await reader.readexactly(int(length))
+
+                status, payload = await self._respond(method, target, body)
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                writer.write(_http_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _http_response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+def load_models(langs=tuple(LANGUAGES)):
+    """LoadedModel per language, each checkpoint loaded once."""
+    return {lang: LoadedModel(LANGUAGES[lang]) for lang in langs}
+
+
+async def serve(models, host=SERVER_HOST, port=SERVER_PORT, window=BATCH_WINDOW):
+    """Serve ``models`` until cancelled."""
+    app = InferenceServer(models, window)
+    server = await app.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"serving {', '.join(sorted(models))} on http://{address[0]}:{address[1]}")
+    try:
+        await server.serve_forever()
+    finally:
+        await app.stop(server)
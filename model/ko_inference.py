@@ -2,7 +2,26 @@
 Inference-only entrypoint that reuses ko_main.inference().
 """
 
-from ko_main import CHECKPOINT_PATH, MAX_TOKENS, NUM_SAMPLES, RANDOM_SEED, TEMPERATURE, inference
+from ko_main import (
+    BEAM_WIDTH,
+    CHECKPOINT_PATH,
+    DECODING,
+    HANGUL_GRAMMAR,
+    INFERENCE_ENGINE,
+    LENGTH_PENALTY,
+    MAX_SYLLABLES,
+    MAX_TOKENS,
+    NOVEL_ONLY,
+    NUM_SAMPLES,
+    PREFIX,
+    RANDOM_SEED,
+    SAMPLE_BATCH_SIZE,
+    SAMPLE_WORKERS,
+    TEMPERATURE,
+    TOP_K,
+    TOP_P,
+    inference,
+)
 
 
 def main():
@@ -12,6 +31,18 @@ def main():
         temperature=TEMPERATURE,
         seed=RANDOM_SEED,
         max_tokens=MAX_TOKENS,
+        engine=INFERENCE_ENGINE,
+        batch_size=SAMPLE_BATCH_SIZE,
+        workers=SAMPLE_WORKERS,
+        novel_only=NOVEL_ONLY,
+        hangul_grammar=HANGUL_GRAMMAR,
+        max_syllables=MAX_SYLLABLES,
+        decoding=DECODING,
+        top_k=TOP_K,
+        top_p=TOP_P,
+        beam_width=BEAM_WIDTH,
+        length_penalty=LENGTH_PENALTY,
+        prefix=PREFIX,
     )
 
 
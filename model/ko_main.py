@@ -2,17 +2,33 @@
 Train, save, and run inference for Korean-name GPT (Jamo-token based).
 """
 
+import hashlib
+import itertools
 import math
 import pickle
 import random
 import re
+import time
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import checkpoint_format
+import float_engine
+import name_index
+from build_cache import BuildCache, Stage, build, training_inputs
+from hangul_grammar import HangulGrammar
+from prefix_cache import PREFILL_CACHE, PrefillState, encode_prefix
+from observers import CheckpointObserver, TrainingRun
+from optim import Adam, FlatParams
+from tape_engine import TapeEngine
+
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_PATH = BASE_DIR / "data" / "ko_name.txt"
-CHECKPOINT_PATH = BASE_DIR / "checkpoints" / "ko_model.pkl"
+CHECKPOINT_PATH = BASE_DIR / "checkpoints" / "ko_model.bin"
+NAME_PATTERN = r"[가-힣]+"
+NORMALIZATION = "NFD"
 
 RANDOM_SEED = 42
 NUM_STEPS = 1000
@@ -30,6 +46,53 @@ BETA1 = 0.85
 BETA2 = 0.99
 EPS_ADAM = 1e-8
 
+ENGINES = ("value", "tape", "numpy")
+ENGINE = "value"
+BATCH_SIZE = 1
+BUCKET_WIDTH = 2
+TRAIN_WORKERS = 1
+
+INFERENCE_ENGINES = ("float", "value", "numpy")
+INFERENCE_ENGINE = "float"
+SAMPLE_BATCH_SIZE = 1024
+BEST_FIRST_BATCH_SIZE = 256
+SAMPLE_WORKERS = 1
+# Never end a sample where it would spell a training name (see inference()).
+NOVEL_ONLY = False
+# Only sample jamo that still compose into Hangul syllables (hangul_grammar.py);
+# setting MAX_SYLLABLES turns the grammar on as well.
+HANGUL_GRAMMAR = False
+MAX_SYLLABLES = None
+# "sample" draws with temperature, optionally limited to the TOP_K most likely
+# tokens and/or the TOP_P nucleus; "beam" approximates the most likely names,
+# "exact" enumerates them in order (see top_names()).
+DECODINGS = ("sample", "beam", "exact")
+DECODING = "sample"
+TOP_K = None
+TOP_P = None
+BEAM_WIDTH = 20
+LENGTH_PENALTY = 1.0
+# Every sample starts with this text (e.g. "서"); "" starts from BOS.
+PREFIX = ""
+
+# Reuse the stored checkpoint when the dataset, hyperparameters, seed and
+# training code are unchanged (see build_cache.py).
+BUILD_CACHE = True
+TRAINING_SOURCES = [
+    BASE_DIR / name
+    for name in (
+        "ko_main.py",
+        "optim.py",
+        "tape_engine.py",
+        "numpy_engine.py",
+        "data_parallel.py",
+        "checkpoint_format.py",
+        "name_index.py",
+        "layer0_table.py",
+        "float_engine.py",
+    )
+]
+
 
 class Value:
     __slots__ = ("data", "grad", "_children", "_local_grads")
@@ -120,24 +183,26 @@ def rmsnorm(x):
     return [xi * scale for xi in x]
 
 
-def load_dataset(data_path=DATA_PATH):
+def load_dataset(data_path=DATA_PATH, pattern=NAME_PATTERN, normalization=NORMALIZATION, lowercase=False):
     data_path = Path(data_path)
     if not data_path.exists():
         raise FileNotFoundError(f"Required dataset file not found: {data_path.resolve()}")
 
     raw_docs = [line.strip() for line in data_path.open(encoding="utf-8") if line.strip()]
-    hangul_docs = [name for name in raw_docs if re.fullmatch(r"[가-힣]+", name)]
+    if lowercase:
+        raw_docs = [name.lower() for name in raw_docs]
+    names = [name for name in raw_docs if re.fullmatch(pattern, name)]
 
     print(f"raw docs: {len(raw_docs)}")
-    print(f"filtered docs: {len(hangul_docs)}")
-    print(f"dropped: {len(raw_docs) - len(hangul_docs)}")
-    if not hangul_docs:
-        raise ValueError("No valid Hangul names found after filtering with ^[가-힣]+$.")
+    print(f"filtered docs: {len(names)}")
+    print(f"dropped: {len(raw_docs) - len(names)}")
+    if not names:
+        raise ValueError(f"No valid names found after filtering with ^{pattern}$.")
 
-    docs = [unicodedata.normalize("NFD", name) for name in hangul_docs]
+    docs = [unicodedata.normalize(normalization, name) for name in names]
     random.shuffle(docs)
     print(f"num docs: {len(docs)}")
-    return docs, set(hangul_docs)
+    return docs, set(names)
 
 
 def build_tokenizer(docs):
@@ -231,6 +296,67 @@ def gpt(token_id, pos_id, keys, values, state_dict, config):
     return linear(x, state_dict["lm_head"])
 
 
+class ValueEngine:
+    def __init__(self, params, config):
+        self.params = params
+        self.config = config
+        self.state_dict = to_value_state_dict(params.to_float_state_dict())
+        self.values = [p for mat in self.state_dict.values() for row in mat for p in row]
+
+    def forward_backward(self, sequences):
+        for p, x in zip(self.values, self.params.data):
+            p.data = x
+            p.grad = 0
+
+        n_layer = self.config["n_layer"]
+        doc_losses = []
+        for tokens in sequences:
+            n = len(tokens) - 1
+            keys, values = [[] for _ in range(n_layer)], [[] for _ in range(n_layer)]
+            losses = []
+            for pos_id in range(n):
+                token_id, target_id = tokens[pos_id], tokens[pos_id + 1]
+                logits = gpt(token_id, pos_id, keys, values, self.state_dict, self.config)
+                probs = softmax(logits)
+                losses.append(-probs[target_id].log())
+            doc_losses.append((1 / n) * sum(losses))
+        loss = doc_losses[0] if len(doc_losses) == 1 else (1 / len(doc_losses)) * sum(doc_losses)
+
+        loss.backward()
+        grad = self.params.grad
+        for i, p in enumerate(self.values):
+            grad[i] += p.grad
+        return loss.data
+
+
+def build_engine(engine, params, config):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if engine == "tape":
+        return TapeEngine(params, config)
+    if engine == "numpy":
+        from numpy_engine import NumpyEngine
+
+        return NumpyEngine(params, config)
+    return ValueEngine(params, config)
+
+
+def length_bucketed_batches(docs, batch_size, block_size, bucket_width=BUCKET_WIDTH):
+    buckets = {}
+    for doc in docs:
+        n = min(block_size, len(doc) + 1)
+        buckets.setdefault((n - 1) // bucket_width, []).append(doc)
+
+    while True:
+        batches = []
+        for key in sorted(buckets):
+            bucket = buckets[key]
+            random.shuffle(bucket)
+            batches.extend(bucket[i : i + batch_size] for i in range(0, len(bucket), batch_size))
+        random.shuffle(batches)
+        yield from batches
+
+
 def train(
     docs,
     tokenizer,
@@ -242,43 +368,65 @@ def train(
     beta1=BETA1,
     beta2=BETA2,
     eps_adam=EPS_ADAM,
+    engine=ENGINE,
+    batch_size=BATCH_SIZE,
+    workers=TRAIN_WORKERS,
+    observers=(),
 ):
-    m = [0.0] * len(params)
-    v = [0.0] * len(params)
+    if batch_size <= 0:
+        raise ValueError("batch_size must be > 0")
+    if workers <= 0:
+        raise ValueError("workers must be > 0")
+    if batch_size < workers:
+        raise ValueError(f"batch_size ({batch_size}) must be >= workers ({workers})")
+
+    flat = FlatParams.from_state_dict(state_dict)
+    optimizer = Adam(flat, beta1, beta2, eps_adam)
 
     bos = tokenizer["BOS"]
     stoi = tokenizer["stoi"]
     block_size = config["block_size"]
-    n_layer = config["n_layer"]
-
-    for step in range(num_steps):
-        doc = docs[step % len(docs)]
-        tokens = [bos] + [stoi[ch] for ch in doc] + [bos]
-        n = min(block_size, len(tokens) - 1)
-
-        keys, values = [[] for _ in range(n_layer)], [[] for _ in range(n_layer)]
-        losses = []
-        for pos_id in range(n):
-            token_id, target_id = tokens[pos_id], tokens[pos_id + 1]
-            logits = gpt(token_id, pos_id, keys, values, state_dict, config)
-            probs = softmax(logits)
-            losses.append(-probs[target_id].log())
-        loss = (1 / n) * sum(losses)
-
-        loss.backward()
+    if workers > 1:
+        from data_parallel import DataParallelEngine
 
-        lr_t = learning_rate * (1 - step / num_steps)
-        for i, p in enumerate(params):
-            m[i] = beta1 * m[i] + (1 - beta1) * p.grad
-            v[i] = beta2 * v[i] + (1 - beta2) * p.grad**2
-            m_hat = m[i] / (1 - beta1 ** (step + 1))
-            v_hat = v[i] / (1 - beta2 ** (step + 1))
-            p.data -= lr_t * m_hat / (v_hat**0.5 + eps_adam)
-            p.grad = 0
-
-        print(f"step {step+1:4d} / {num_steps:4d} | loss {loss.data:.4f}", end="\r")
+        grad_engine = DataParallelEngine(build_engine, engine, flat, config, workers)
+    else:
+        grad_engine = build_engine(engine, flat, config)
+    batches = length_bucketed_batches(docs, batch_size, block_size) if batch_size > 1 else None
+
+    run = TrainingRun(docs, tokenizer, config, state_dict, flat, num_steps, learning_rate, beta1, beta2, eps_adam)
+    for observer in observers:
+        observer.on_train_begin(run)
+
+    try:
+        for step in range(num_steps):
+            batch = [docs[step % len(docs)]] if batches is None else next(batches)
+            sequences = []
+            for doc in batch:
+                tokens = [bos] + [stoi[ch] for ch in doc] + [bos]
+                n = min(block_size, len(tokens) - 1)
+                sequences.append(tokens[: n + 1])
+
+            loss_data = grad_engine.forward_backward(sequences)
+
+            lr_t = learning_rate * (1 - step / num_steps)
+            for observer in observers:
+                observer.on_gradients(run, step, batch, loss_data, lr_t)
+            optimizer.step(step, lr_t)
+            for observer in observers:
+                observer.on_step_end(run, step)
+
+            print(f"step {step+1:4d} / {num_steps:4d} | loss {loss_data:.4f}", end="\r")
+    finally:
+        if workers > 1:
+            grad_engine.close()
+
+    for p, x in zip(params, flat.data):
+        p.data = x
 
     print()
+    for observer in observers:
+        observer.on_train_end(run)
 
 
 def to_float_state_dict(state_dict):
@@ -289,10 +437,30 @@ def to_value_state_dict(float_state_dict):
     return {name: [[Value(v) for v in row] for row in mat] for name, mat in float_state_dict.items()}
 
 
+def training_cache_inputs(
+    config,
+    engine=ENGINE,
+    batch_size=BATCH_SIZE,
+    workers=TRAIN_WORKERS,
+    data_path=DATA_PATH,
+    pattern=NAME_PATTERN,
+    normalization=NORMALIZATION,
+    lowercase=False,
+):
+    dataset_filter = {"pattern": pattern, "normalization": normalization, "lowercase": lowercase}
+    optimizer = {"learning_rate": LEARNING_RATE, "beta1": BETA1, "beta2": BETA2, "eps": EPS_ADAM}
+    return training_inputs(
+        data_path, dataset_filter, config, RANDOM_SEED, NUM_STEPS, optimizer, engine, batch_size, workers, TRAINING_SOURCES
+    )
+
+
 def save(path, state_dict, config, tokenizer, dataset_names):
+    # A ".pkl" path keeps writing the legacy pickle format (names inline);
+    # anything else gets the memory-mappable binary format from
+    # checkpoint_format, with the names in a name_index file next to it.
     path = Path(path)
     checkpoint = {
-        "format_version": 1,
+        "format_version": 1 if path.suffix == ".pkl" else checkpoint_format.FORMAT_VERSION,
         "config": config,
         "tokenizer": {
             "uchars": tokenizer["uchars"],
@@ -303,9 +471,15 @@ def save(path, state_dict, config, tokenizer, dataset_names):
         "dataset_names": sorted(dataset_names),
     }
 
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("wb") as f:
-        pickle.dump(checkpoint, f)
+    if path.suffix == ".pkl":
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as f:
+            pickle.dump(checkpoint, f)
+    else:
+        checkpoint_format.save(
+            path, checkpoint["config"], checkpoint["tokenizer"], checkpoint["state_dict"], checkpoint.pop("dataset_names")
+        )
+        checkpoint["name_index"] = name_index.load(name_index.index_path(path))
 
     print(f"saved checkpoint: {path.resolve()}")
     return checkpoint
@@ -315,6 +489,9 @@ def load_checkpoint(path):
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(f"Checkpoint not found: {path.resolve()}")
+    if checkpoint_format.is_binary_checkpoint(path):
+        return checkpoint_format.load(path)
+    # Legacy format: only unpickle checkpoints from a trusted source.
     with path.open("rb") as f:
         checkpoint = pickle.load(f)
     for key in ("config", "tokenizer", "state_dict"):
@@ -323,65 +500,699 @@ def load_checkpoint(path):
     return checkpoint
 
 
-def inference(checkpoint, num_samples=NUM_SAMPLES, temperature=TEMPERATURE, seed=RANDOM_SEED, max_tokens=MAX_TOKENS):
-    if num_samples <= 0:
-        raise ValueError("num_samples must be > 0")
-    if temperature <= 0:
-        raise ValueError("temperature must be > 0")
+def mask_known_name(probs, bos):
+    """Drop the BOS probability (the rest is renormalized by the sampler), unless nothing else is left."""
+    if probs[bos] < sum(probs):
+        probs = list(probs)
+        probs[bos] = 0.0
+    return probs
+
 
+def _sample_steps(
+    engine,
+    model,
+    config,
+    bos,
+    vocab_size,
+    temperature,
+    max_tokens,
+    rng=random,
+    trie=None,
+    grammar=None,
+    top_k=None,
+    top_p=None,
+    prefill=None,
+    banned=(),
+    table=None,
+):
+    """
+    Sample one name token by token, yielding ``(token_id, prob)`` per draw.
+
+    ``model`` is what the engine runs (state_dict, Value state_dict or
+    NumpyModel); the float engine reads layer 0's Q/K/V from ``table``
+    (layer0_table.py) when given. ``prob`` is the drawn token's probability in the
+    distribution it came from, after temperature and every mask. The last
+    draw is BOS unless the name runs into ``max_tokens``. The name's
+    keys/values live in this generator and are freed when it is closed.
+
+    With a name_index.NameTrie, the sampler follows the trie while decoding and
+    never ends a sample with BOS where that would complete a training name.
+    With a hangul_grammar.HangulGrammar, only tokens the grammar allows in the
+    current state can be drawn. ``top_k`` / ``top_p`` then keep only the most
+    likely of the remaining tokens.
+
+    With a prefix_cache.PrefillState, sampling starts after its prefix from a
+    fork of the prefilled keys/values. ``banned`` tokens cannot be the first
+    token after the prefix.
+    """
+    prefix_ids = prefill.prefix_ids if prefill is not None else []
+    start = len(prefix_ids)
+    if engine == "numpy":
+        import numpy as np
+
+        cache = model.new_cache(1) if prefill is None else prefill.cache.repeat(1)
+    elif prefill is not None:
+        keys, values = prefill.fork_lists()
+    else:
+        keys, values = float_engine.new_kv_cache(config)
+    token_id = bos
+    node = trie.walk(prefix_ids) if trie is not None else None
+    state = grammar.walk(prefix_ids) if grammar is not None else 0
+
+    for pos_id in range(start, max_tokens):
+        if prefill is not None and pos_id == start:
+            logits = prefill.logits[0].tolist() if engine == "numpy" else prefill.logits
+        elif engine == "numpy":
+            logits = model.forward(np.array([token_id]), pos_id, cache)[0].tolist()
+        elif engine == "value":
+            logits = gpt(token_id, pos_id, keys, values, model, config)
+        else:
+            logits = float_engine.gpt(token_id, pos_id, keys, values, model, config, table)
+        if engine == "value":
+            probs = [p.data for p in softmax([l / temperature for l in logits])]
+        else:
+            probs = float_engine.sampling_probs(logits, temperature)
+        if banned and pos_id == start:
+            probs = [0.0 if i in banned else p for i, p in enumerate(probs)]
+        if grammar is not None:
+            probs = [p * allowed for p, allowed in zip(probs, grammar.mask(state, pos_id == max_tokens - 1))]
+        if node is not None and trie.is_name(node):
+            probs = mask_known_name(probs, bos)
+        if top_k is not None or top_p is not None:
+            probs = float_engine.filter_probs(probs, top_k, top_p)
+        token_id = rng.choices(range(vocab_size), weights=probs)[0]
+        yield token_id, probs[token_id] / sum(probs)
+        if token_id == bos:
+            return
+        if node is not None:
+            node = trie.step(node, token_id)
+        if grammar is not None:
+            state = grammar.step(state, token_id)
+
+
+def _sample_token_ids(
+    engine,
+    state_dict,
+    config,
+    bos,
+    vocab_size,
+    num_samples,
+    temperature,
+    max_tokens,
+    rng=random,
+    trie=None,
+    grammar=None,
+    top_k=None,
+    top_p=None,
+    prefill=None,
+    banned=(),
+    table=None,
+):
+    """
+    Yield ``num_samples`` token-id lists (without BOS), sampled by _sample_steps().
+
+    With a prefix_cache.PrefillState, yielded ids include the prefix.
+    """
+    prefix_ids = prefill.prefix_ids if prefill is not None else []
+    for _ in range(num_samples):
+        steps = _sample_steps(
+            engine,
+            state_dict,
+            config,
+            bos,
+            vocab_size,
+            temperature,
+            max_tokens,
+            rng,
+            trie,
+            grammar,
+            top_k,
+            top_p,
+            prefill,
+            banned,
+            table,
+        )
+        yield prefix_ids + [token_id for token_id, _ in steps if token_id != bos]
+
+
+def prefill_state(engine, model, config, bos, prefix_ids, key=None, table=None):
+    """
+    PrefillState of BOS + ``prefix_ids``, from prefix_cache.PREFILL_CACHE when present.
+
+    ``model`` is what the engine runs (state_dict, Value state_dict or
+    NumpyModel). ``key`` is the object that identifies the weights in the
+    cache, ``model`` by default; pass the checkpoint's state_dict to share
+    entries between calls that rebuild the engine model. The float engine
+    uses ``table`` like _sample_steps().
+    """
+    if len(prefix_ids) >= config["block_size"]:
+        raise ValueError(f"Prefix of {len(prefix_ids)} tokens leaves no room in block_size {config['block_size']}")
+
+    def run():
+        if engine == "numpy":
+            from numpy_inference import prefill
+
+            return prefill(model, bos, prefix_ids)
+        keys, values = float_engine.new_kv_cache(config)
+        for pos_id, token_id in enumerate([bos] + list(prefix_ids)):
+            if engine == "value":
+                logits = gpt(token_id, pos_id, keys, values, model, config)
+            else:
+                logits = float_engine.gpt(token_id, pos_id, keys, values, model, config, table)
+        return PrefillState(prefix_ids, (keys, values), logits)
+
+    return PREFILL_CACHE.get(model if key is None else key, engine, prefix_ids, run)
+
+
+def derive_seed(seed, index):
+    """Seed of the index-th independent sampling stream derived from ``seed``."""
+    digest = hashlib.sha256(f"{seed}:{index}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+_sample_worker = {}
+
+
+def _init_sample_worker(
+    engine, state_dict, config, bos, vocab_size, names=None, uchars=None, grammar=None, table=None
+):
+    if engine == "numpy":
+        from numpy_inference import NumpyModel
+
+        model = NumpyModel(state_dict, config, table)
+    elif engine == "value":
+        model = to_value_state_dict(state_dict)
+    else:
+        model = state_dict
+    trie = name_index.NameTrie(names, uchars) if names is not None else None
+    _sample_worker.update(
+        engine=engine,
+        model=model,
+        config=config,
+        bos=bos,
+        vocab_size=vocab_size,
+        trie=trie,
+        grammar=grammar,
+        table=table if engine == "float" else None,
+    )
+
+
+def _sample_shard(shard):
+    num_samples, seed, temperature, max_tokens, batch_size, top_k, top_p, prefix_ids, banned = shard
+    engine = _sample_worker["engine"]
+    model = _sample_worker["model"]
+    bos = _sample_worker["bos"]
+    trie = _sample_worker["trie"]
+    grammar = _sample_worker["grammar"]
+    config = _sample_worker["config"]
+    table = _sample_worker["table"]
+    prefill = prefill_state(engine, model, config, bos, prefix_ids, table=table) if prefix_ids else None
+    if engine == "numpy":
+        from numpy_inference import sample
+
+        return sample(
+            model,
+            num_samples,
+            temperature,
+            bos,
+            max_tokens,
+            seed,
+            batch_size=batch_size,
+            trie=trie,
+            grammar=grammar,
+            top_k=top_k,
+            top_p=top_p,
+            prefill=prefill,
+            banned=banned,
+        )
+
+    vocab_size = _sample_worker["vocab_size"]
+    rng = random.Random(seed)
+    return list(
+        _sample_token_ids(
+            engine,
+            model,
+            config,
+            bos,
+            vocab_size,
+            num_samples,
+            temperature,
+            max_tokens,
+            rng,
+            trie,
+            grammar,
+            top_k,
+            top_p,
+            prefill,
+            banned,
+            table,
+        )
+    )
+
+
+def parallel_sample_token_ids(
+    engine,
+    state_dict,
+    config,
+    bos,
+    vocab_size,
+    num_samples,
+    temperature,
+    max_tokens,
+    seed,
+    workers,
+    batch_size,
+    names=None,
+    uchars=None,
+    grammar=None,
+    top_k=None,
+    top_p=None,
+    prefix_ids=(),
+    banned=(),
+    table=None,
+):
+    """Sample on a process pool; the merged output only depends on (seed, num_samples, workers).
+
+    Shard i gets a contiguous share of ``num_samples`` and the stream
+    derive_seed(seed, i), and shards are merged in index order, so scheduling
+    never changes the result. Each worker builds its model (and, given
+    ``names``, its name trie) once, in the pool initializer, and prefills
+    ``prefix_ids`` once per shard.
+    """
+    base, extra = divmod(num_samples, workers)
+    shards = [
+        (
+            base + (i < extra),
+            derive_seed(seed, i),
+            temperature,
+            max_tokens,
+            batch_size,
+            top_k,
+            top_p,
+            prefix_ids,
+            banned,
+        )
+        for i in range(workers)
+        if base + (i < extra) > 0
+    ]
+    with ProcessPoolExecutor(
+        max_workers=len(shards),
+        initializer=_init_sample_worker,
+        initargs=(engine, state_dict, config, bos, vocab_size, names, uchars, grammar, table),
+    ) as executor:
+        return [sample_ids for shard_ids in executor.map(_sample_shard, shards) for sample_ids in shard_ids]
+
+
+def _load_for_inference(checkpoint):
+    """The checkpoint (loaded if given as a path) and its training names, or None."""
     if isinstance(checkpoint, (str, Path)):
         checkpoint_path = Path(checkpoint)
         checkpoint = load_checkpoint(checkpoint_path)
         print(f"loaded checkpoint: {checkpoint_path.resolve()}")
 
+    config = checkpoint["config"]
+    if config["n_embd"] % config["n_head"] != 0:
+        raise ValueError(
+            f"Invalid config: n_embd ({config['n_embd']}) is not divisible by n_head ({config['n_head']})"
+        )
+    names = checkpoint.get("name_index")
+    if names is None and checkpoint.get("dataset_names"):
+        names = set(checkpoint["dataset_names"])  # pickle and version 2 checkpoints
+    return checkpoint, names
+
+
+def _decoding_constraints(checkpoint, names, max_tokens, novel_only, hangul_grammar, max_syllables):
+    """Effective max_tokens, plus the HangulGrammar and NameTrie to decode with (or None)."""
+    block_size = checkpoint["config"]["block_size"]
+    uchars = checkpoint["tokenizer"]["uchars"]
+    max_tokens = block_size if max_tokens is None else min(max_tokens, block_size)
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be > 0")
+    if novel_only and not names:
+        raise ValueError("novel_only needs the training names (a name index or dataset_names in the checkpoint)")
+
+    grammar = None
+    if hangul_grammar or max_syllables is not None:
+        if max_tokens < 2:
+            raise ValueError("hangul_grammar needs max_tokens >= 2 to fit a syllable")
+        grammar = HangulGrammar(uchars, checkpoint["tokenizer"]["BOS"], max_syllables)
+    trie = name_index.NameTrie(names, uchars) if novel_only else None
+    return max_tokens, grammar, trie
+
+
+def top_names(
+    checkpoint,
+    max_tokens=MAX_TOKENS,
+    min_prob=None,
+    novel_only=NOVEL_ONLY,
+    hangul_grammar=HANGUL_GRAMMAR,
+    max_syllables=MAX_SYLLABLES,
+    batch_size=BEST_FIRST_BATCH_SIZE,
+):
+    """
+    Yield the checkpoint's names in exact descending probability (numpy engine).
+
+    Each item is a dict with ``ko_text``, ``jamo_text``, ``in_dataset``,
+    ``log_prob`` and ``prob`` (model probability of the name and its closing
+    BOS). Results stream from numpy_inference.best_first_names(), so taking
+    the first N only pays for the search up to the N-th name. ``min_prob``
+    ends the enumeration at names less likely than that; the other options
+    constrain decoding as in inference().
+    """
+    from numpy_inference import NumpyModel, best_first_names
+
+    checkpoint, names = _load_for_inference(checkpoint)
+    max_tokens, grammar, trie = _decoding_constraints(
+        checkpoint, names, max_tokens, novel_only, hangul_grammar, max_syllables
+    )
+    uchars = checkpoint["tokenizer"]["uchars"]
+    model = NumpyModel(checkpoint["state_dict"], checkpoint["config"], checkpoint.get("layer0_table"))
+    min_log_prob = -math.inf if min_prob is None else math.log(min_prob)
+    for token_ids, log_prob in best_first_names(
+        model, checkpoint["tokenizer"]["BOS"], max_tokens, min_log_prob, batch_size, trie, grammar
+    ):
+        jamo_text = "".join(uchars[token_id] for token_id in token_ids)
+        ko_text = unicodedata.normalize("NFC", jamo_text)
+        yield {
+            "ko_text": ko_text,
+            "jamo_text": jamo_text,
+            "in_dataset": ko_text in names if names else "N/A",
+            "log_prob": log_prob,
+            "prob": math.exp(log_prob),
+        }
+
+
+def stream_name(
+    checkpoint,
+    temperature=TEMPERATURE,
+    seed=None,
+    max_tokens=MAX_TOKENS,
+    engine=INFERENCE_ENGINE,
+    novel_only=NOVEL_ONLY,
+    hangul_grammar=HANGUL_GRAMMAR,
+    max_syllables=MAX_SYLLABLES,
+    top_k=TOP_K,
+    top_p=TOP_P,
+    prefix=PREFIX,
+):
+    """
+    Sample one name and yield an event dict as soon as each token is drawn.
+
+    Events have ``token`` (the jamo or letter, "" for the closing BOS),
+    ``token_id``, ``prob`` (its probability in the distribution it was drawn
+    from), ``jamo_text`` / ``ko_text`` (the name so far, raw and
+    NFC-composed, including ``prefix``), ``done`` and ``in_dataset`` (None
+    until ``done``). The name's KV cache stays alive between events; stop
+    iterating and close() the generator (breaking out of a for loop over it
+    does the same once it is unreferenced) to cancel and free it right away.
+    The options are those of inference(); pass a loaded checkpoint to reuse
+    prefills across calls.
+    """
+    if temperature <= 0:
+        raise ValueError("temperature must be > 0")
+    if engine not in INFERENCE_ENGINES:
+        raise ValueError(f"Unknown inference engine '{engine}', expected one of {INFERENCE_ENGINES}")
+    if top_k is not None and top_k <= 0:
+        raise ValueError("top_k must be > 0")
+    if top_p is not None and not 0 < top_p <= 1:
+        raise ValueError("top_p must be in (0, 1]")
+
+    checkpoint, names = _load_for_inference(checkpoint)
     config = checkpoint["config"]
     tokenizer = checkpoint["tokenizer"]
-    state_dict = to_value_state_dict(checkpoint["state_dict"])
-    dataset_names_set = set(checkpoint.get("dataset_names", []))
+    uchars = tokenizer["uchars"]
+    bos = tokenizer["BOS"]
+    max_tokens, grammar, trie = _decoding_constraints(
+        checkpoint, names, max_tokens, novel_only, hangul_grammar, max_syllables
+    )
+    prefix_ids, banned = encode_prefix(prefix, tokenizer) if prefix else ([], [])
+    if len(prefix_ids) >= max_tokens:
+        raise ValueError(f"Prefix {prefix!r} is {len(prefix_ids)} tokens, max_tokens is {max_tokens}")
+    if grammar is not None:
+        grammar.walk(prefix_ids)
+
+    table = checkpoint.get("layer0_table")
+    if engine == "numpy":
+        from numpy_inference import NumpyModel
+
+        model = NumpyModel(checkpoint["state_dict"], config, table)
+    elif engine == "value":
+        model = to_value_state_dict(checkpoint["state_dict"])
+    else:
+        model = checkpoint["state_dict"]
+    prefill = None
+    if prefix_ids:
+        prefill = prefill_state(engine, model, config, bos, prefix_ids, key=checkpoint["state_dict"], table=table)
+    steps = _sample_steps(
+        engine,
+        model,
+        config,
+        bos,
+        tokenizer["vocab_size"],
+        temperature,
+        max_tokens,
+        random.Random(seed),
+        trie,
+        grammar,
+        top_k,
+        top_p,
+        prefill,
+        banned,
+        table,
+    )
 
-    n_embd = config["n_embd"]
-    n_head = config["n_head"]
-    if n_embd % n_head != 0:
-        raise ValueError(f"Invalid config: n_embd ({n_embd}) is not divisible by n_head ({n_head})")
+    jamo_text = "".join(uchars[token_id] for token_id in prefix_ids)
+    try:
+        for pos_id, (token_id, prob) in enumerate(steps, len(prefix_ids)):
+            done = token_id == bos or pos_id == max_tokens - 1
+            token = "" if token_id == bos else uchars[token_id]
+            jamo_text += token
+            ko_text = unicodedata.normalize("NFC", jamo_text)
+            in_dataset = None
+            if done:
+                in_dataset = ko_text in names if names else "N/A"
+            yield {
+                "token": token,
+                "token_id": token_id,
+                "prob": prob,
+                "jamo_text": jamo_text,
+                "ko_text": ko_text,
+                "done": done,
+                "in_dataset": in_dataset,
+            }
+    finally:
+        steps.close()
+
+
+def inference(
+    checkpoint,
+    num_samples=NUM_SAMPLES,
+    temperature=TEMPERATURE,
+    seed=RANDOM_SEED,
+    max_tokens=MAX_TOKENS,
+    engine=INFERENCE_ENGINE,
+    batch_size=SAMPLE_BATCH_SIZE,
+    workers=SAMPLE_WORKERS,
+    novel_only=NOVEL_ONLY,
+    hangul_grammar=HANGUL_GRAMMAR,
+    max_syllables=MAX_SYLLABLES,
+    decoding=DECODING,
+    top_k=TOP_K,
+    top_p=TOP_P,
+    beam_width=BEAM_WIDTH,
+    length_penalty=LENGTH_PENALTY,
+    prefix=PREFIX,
+):
+    """
+    Sample names from a checkpoint and print them with their ``in_dataset`` flag.
+
+    With ``novel_only``, decoding walks a trie of the training names and masks
+    BOS whenever it would complete one, so the remaining probability is
+    renormalized over continuations instead of the sample being thrown away.
+    Only samples cut off at ``max_tokens`` can still be training names. The
+    summary reports the acceptance rate (share of novel samples) and unique
+    novel names per second.
+
+    With ``hangul_grammar`` (implied by ``max_syllables``), every sample is a
+    sequence of complete choseong-jungseong(-jongseong) syllables, at most
+    ``max_syllables`` of them.
+
+    ``decoding="sample"`` draws ``num_samples`` names with ``temperature``,
+    restricted to the ``top_k`` most likely tokens and/or the ``top_p`` nucleus
+    when given. ``decoding="beam"`` (numpy engine) runs
+    numpy_inference.beam_search() and returns the ``num_samples`` best names by
+    length-normalized log-probability, without temperature; the beams share
+    their prefixes' KV cache. ``decoding="exact"`` (numpy engine) prints the
+    ``num_samples`` most likely names from top_names().
+
+    A ``prefix`` is NFD-tokenized with the checkpoint tokenizer and prefilled
+    once (prefill_state(), LRU-cached per checkpoint state_dict), and every
+    sample continues from a fork of that KV cache. Pass the same loaded
+    checkpoint to repeated calls to reuse cached prefills. Prefixes work with
+    ``decoding="sample"``.
+    """
+    if num_samples <= 0:
+        raise ValueError("num_samples must be > 0")
+    if workers <= 0:
+        raise ValueError("workers must be > 0")
+    if temperature <= 0:
+        raise ValueError("temperature must be > 0")
+    if engine not in INFERENCE_ENGINES:
+        raise ValueError(f"Unknown inference engine '{engine}', expected one of {INFERENCE_ENGINES}")
+    if decoding not in DECODINGS:
+        raise ValueError(f"Unknown decoding '{decoding}', expected one of {DECODINGS}")
+    if decoding in ("beam", "exact") and engine != "numpy":
+        raise ValueError(f"{decoding} decoding runs on the numpy engine")
+    if top_k is not None and top_k <= 0:
+        raise ValueError("top_k must be > 0")
+    if top_p is not None and not 0 < top_p <= 1:
+        raise ValueError("top_p must be in (0, 1]")
+
+    checkpoint, names = _load_for_inference(checkpoint)
+    config = checkpoint["config"]
+    tokenizer = checkpoint["tokenizer"]
+    if engine == "value":
+        state_dict = to_value_state_dict(checkpoint["state_dict"])
+    else:
+        state_dict = checkpoint["state_dict"]
+    # The Value engine stays the unoptimized reference and ignores the table.
+    table = checkpoint.get("layer0_table") if engine != "value" else None
 
     block_size = config["block_size"]
-    n_layer = config["n_layer"]
     uchars = tokenizer["uchars"]
     bos = tokenizer["BOS"]
     vocab_size = tokenizer["vocab_size"]
-
-    if max_tokens is None:
-        max_tokens = block_size
+    max_tokens, grammar, trie = _decoding_constraints(
+        checkpoint, names, max_tokens, novel_only, hangul_grammar, max_syllables
+    )
+    prefix_ids, banned = encode_prefix(prefix, tokenizer) if prefix else ([], [])
+    if prefix_ids and decoding != "sample":
+        raise ValueError("prefix works with decoding='sample'")
+    if len(prefix_ids) >= max_tokens:
+        raise ValueError(f"Prefix {prefix!r} is {len(prefix_ids)} tokens, max_tokens is {max_tokens}")
+    if grammar is not None:
+        grammar.walk(prefix_ids)
+
+    log_probs = None
+    start = time.perf_counter()
+    if decoding == "beam":
+        from numpy_inference import NumpyModel, beam_search
+
+        model = NumpyModel(state_dict, config, table)
+        beams = beam_search(
+            model,
+            bos,
+            max(beam_width, num_samples),
+            max_tokens,
+            num_results=num_samples,
+            length_penalty=length_penalty,
+            trie=trie,
+            grammar=grammar,
+        )
+        samples = [sample_ids for sample_ids, _, _ in beams]
+        log_probs = [log_prob for _, log_prob, _ in beams]
+    elif decoding == "exact":
+        from numpy_inference import NumpyModel, best_first_names
+
+        model = NumpyModel(state_dict, config, table)
+        found = list(itertools.islice(best_first_names(model, bos, max_tokens, trie=trie, grammar=grammar), num_samples))
+        samples = [sample_ids for sample_ids, _ in found]
+        log_probs = [log_prob for _, log_prob in found]
+    elif workers > 1:
+        samples = parallel_sample_token_ids(
+            engine,
+            checkpoint["state_dict"],
+            config,
+            bos,
+            vocab_size,
+            num_samples,
+            temperature,
+            max_tokens,
+            seed,
+            workers,
+            batch_size,
+            names=names if novel_only else None,
+            uchars=uchars,
+            grammar=grammar,
+            top_k=top_k,
+            top_p=top_p,
+            prefix_ids=prefix_ids,
+            banned=banned,
+            table=table,
+        )
+    elif engine == "numpy":
+        from numpy_inference import NumpyModel, sample
+
+        model = NumpyModel(state_dict, config, table)
+        prefill = None
+        if prefix_ids:
+            prefill = prefill_state(engine, model, config, bos, prefix_ids, key=checkpoint["state_dict"])
+        samples = sample(
+            model,
+            num_samples,
+            temperature,
+            bos,
+            max_tokens,
+            seed,
+            batch_size=batch_size,
+            trie=trie,
+            grammar=grammar,
+            top_k=top_k,
+            top_p=top_p,
+            prefill=prefill,
+            banned=banned,
+        )
     else:
-        max_tokens = min(max_tokens, block_size)
-    if max_tokens <= 0:
-        raise ValueError("max_tokens must be > 0")
-
-    random.seed(seed)
+        prefill = None
+        if prefix_ids:
+            prefill = prefill_state(
+                engine, state_dict, config, bos, prefix_ids, key=checkpoint["state_dict"], table=table
+            )
+        random.seed(seed)
+        samples = list(
+            _sample_token_ids(
+                engine,
+                state_dict,
+                config,
+                bos,
+                vocab_size,
+                num_samples,
+                temperature,
+                max_tokens,
+                trie=trie,
+                grammar=grammar,
+                top_k=top_k,
+                top_p=top_p,
+                prefill=prefill,
+                banned=banned,
+                table=table,
+            )
+        )
+    elapsed = time.perf_counter() - start
 
     print(f"vocab size: {vocab_size}")
     print(f"block size: {block_size}")
     print("\n--- inference ---")
 
     results = []
-    for sample_idx in range(num_samples):
-        keys, values = [[] for _ in range(n_layer)], [[] for _ in range(n_layer)]
-        token_id = bos
-        sample_chars = []
-
-        for pos_id in range(max_tokens):
-            logits = gpt(token_id, pos_id, keys, values, state_dict, config)
-            probs = softmax([l / temperature for l in logits])
-            token_id = random.choices(range(vocab_size), weights=[p.data for p in probs])[0]
-            if token_id == bos:
-                break
-            sample_chars.append(uchars[token_id])
-
-        jamo_text = "".join(sample_chars)
+    for sample_idx, sample_ids in enumerate(samples):
+        jamo_text = "".join(uchars[token_id] for token_id in sample_ids)
         ko_text = unicodedata.normalize("NFC", jamo_text)
-        in_dataset = ko_text in dataset_names_set if dataset_names_set else "N/A"
-        print(f"sample {sample_idx+1:2d}: {ko_text} | in_dataset: {in_dataset}")
-        results.append({"ko_text": ko_text, "jamo_text": jamo_text, "in_dataset": in_dataset})
+        in_dataset = ko_text in names if names else "N/A"
+        result = {"ko_text": ko_text, "jamo_text": jamo_text, "in_dataset": in_dataset}
+        if log_probs is None:
+            print(f"sample {sample_idx+1:2d}: {ko_text} | in_dataset: {in_dataset}")
+        else:
+            result["log_prob"] = log_probs[sample_idx]
+            log_prob = result["log_prob"]
+            print(f"sample {sample_idx+1:2d}: {ko_text} | in_dataset: {in_dataset} | log_prob: {log_prob:.4f}")
+        results.append(result)
+
+    if novel_only:
+        novel = [result["ko_text"] for result in results if not result["in_dataset"]]
+        unique_novel = len(set(novel))
+        print(f"\nacceptance rate: {len(novel) / len(results):.1%} ({len(novel)}/{len(results)} novel)")
+        print(f"unique novel names: {unique_novel} ({unique_novel / elapsed:.1f}/s over {elapsed:.2f}s)")
 
     return results
 
@@ -393,14 +1204,41 @@ def main():
     config = build_config()
     state_dict, params = init_model(tokenizer["vocab_size"], config)
 
-    train(docs, tokenizer, state_dict, params, config)
-    checkpoint = save(CHECKPOINT_PATH, state_dict, config, tokenizer, dataset_names)
+    saver = CheckpointObserver(CHECKPOINT_PATH, dataset_names, save)
+    outputs = [CHECKPOINT_PATH, name_index.index_path(CHECKPOINT_PATH)]
+    stage = Stage("ko_checkpoint", training_cache_inputs(config), outputs, saver)
+    build(
+        BuildCache(enabled=BUILD_CACHE),
+        [stage],
+        lambda observers: train(
+            docs,
+            tokenizer,
+            state_dict,
+            params,
+            config,
+            engine=ENGINE,
+            batch_size=BATCH_SIZE,
+            workers=TRAIN_WORKERS,
+            observers=observers,
+        ),
+    )
+    checkpoint = saver.checkpoint or CHECKPOINT_PATH
     inference(
         checkpoint,
         num_samples=NUM_SAMPLES,
         temperature=TEMPERATURE,
         seed=RANDOM_SEED,
         max_tokens=MAX_TOKENS,
+        engine=INFERENCE_ENGINE,
+        novel_only=NOVEL_ONLY,
+        hangul_grammar=HANGUL_GRAMMAR,
+        max_syllables=MAX_SYLLABLES,
+        decoding=DECODING,
+        top_k=TOP_K,
+        top_p=TOP_P,
+        beam_width=BEAM_WIDTH,
+        length_penalty=LENGTH_PENALTY,
+        prefix=PREFIX,
     )
 
 
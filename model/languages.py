@@ -0,0 +1,138 @@
+"""
+Language specs for the asset build (scripts/build_assets.py).
+
+A spec says where a language's names come from, how they are filtered and
+normalized into training docs, and which rows the Chapter 6 trace follows.
+Model, training and export code is shared; adding a language means adding its
+dataset and one LanguageSpec to LANGUAGES.
+"""
+
+from pathlib import Path
+
+from ko_main import DATA_PATH, NAME_PATTERN, NORMALIZATION
+
+BASE_DIR = Path(__file__).resolve().parent
+APP_DATA_DIR = BASE_DIR.parent / "app" / "public" / "data"
+
+CHOSEONG_IEUNG_NFD = "\u110b"
+CHOSEONG_SIOS_NFD = "\u1109"
+
+
+def _shared_parameter_options():
+    return [
+        {
+            "id": "position_0",
+            "label": "POS 0 position embedding",
+            "matrix": "wpe",
+            "row_index": 0,
+        },
+        {
+            "id": "attn_wq_row_0",
+            "label": "W_Q row 0",
+            "matrix": "attn_wq",
+            "row_index": 0,
+        },
+    ]
+
+
+def ko_parameter_options(tokenizer):
+    stoi = tokenizer.get("stoi", {})
+    if not isinstance(stoi, dict):
+        raise ValueError("Tokenizer stoi is missing.")
+
+    ieung_token_id = stoi.get(CHOSEONG_IEUNG_NFD)
+    sios_token_id = stoi.get(CHOSEONG_SIOS_NFD)
+    if not isinstance(ieung_token_id, int):
+        raise ValueError("Tokenizer does not include 초성 ㅇ (U+110B).")
+    if not isinstance(sios_token_id, int):
+        raise ValueError("Tokenizer does not include 초성 ㅅ (U+1109).")
+
+    return [
+        {
+            "id": "token_choseong_ieung",
+            "label": "초성 ㅇ token embedding",
+            "matrix": "wte",
+            "row_index": ieung_token_id,
+            "token_char_nfd": CHOSEONG_IEUNG_NFD,
+            "token_char_display": "ㅇ",
+        },
+        {
+            "id": "lm_head_choseong_sios",
+            "label": "초성 ㅅ LM Head parameter",
+            "matrix": "lm_head",
+            "row_index": sios_token_id,
+            "token_char_nfd": CHOSEONG_SIOS_NFD,
+            "token_char_display": "ㅅ",
+        },
+        *_shared_parameter_options(),
+    ]
+
+
+def en_parameter_options(tokenizer):
+    stoi = tokenizer.get("stoi", {})
+    uchars = tokenizer.get("uchars", [])
+    if not isinstance(stoi, dict):
+        raise ValueError("Tokenizer stoi is missing.")
+    if not isinstance(uchars, list) or not uchars:
+        raise ValueError("Tokenizer uchars is missing.")
+
+    used_token_ids = set()
+
+    def pick_token(preferred_chars):
+        for char in [*preferred_chars, *uchars]:
+            token_id = stoi.get(char)
+            if isinstance(token_id, int) and token_id not in used_token_ids:
+                used_token_ids.add(token_id)
+                return char, token_id
+        raise ValueError("Unable to select token for trace parameter options.")
+
+    letter_a, token_a = pick_token(["a"])
+    letter_e, token_e = pick_token(["e"])
+
+    return [
+        {
+            "id": f"token_letter_{letter_a}",
+            "label": f"Letter {letter_a} token embedding",
+            "matrix": "wte",
+            "row_index": token_a,
+            "token_char_nfd": letter_a,
+            "token_char_display": letter_a,
+        },
+        {
+            "id": f"lm_head_letter_{letter_e}",
+            "label": f"Letter {letter_e} LM Head parameter",
+            "matrix": "lm_head",
+            "row_index": token_e,
+            "token_char_nfd": letter_e,
+            "token_char_display": letter_e,
+        },
+        *_shared_parameter_options(),
+    ]
+
+
+class LanguageSpec:
+    def __init__(self, name, data_path, pattern, normalization, parameter_options, lowercase=False, data_url=None):
+        self.name = name
+        self.data_path = Path(data_path)
+        self.pattern = pattern
+        self.normalization = normalization
+        self.lowercase = lowercase
+        self.parameter_options = parameter_options
+        self.data_url = data_url
+        self.checkpoint_path = BASE_DIR / "checkpoints" / f"{name}_model.bin"
+        self.app_dataset_path = APP_DATA_DIR / f"{name}_name.txt"
+        self.snapshot_path = APP_DATA_DIR / f"{name}_embedding_snapshot.json"
+        self.trace_path = APP_DATA_DIR / f"{name}_training_trace.json"
+
+
+KO = LanguageSpec("ko", DATA_PATH, NAME_PATTERN, NORMALIZATION, ko_parameter_options)
+EN = LanguageSpec(
+    "en",
+    BASE_DIR / "data" / "en_name.txt",
+    r"[a-z]+",
+    "NFC",
+    en_parameter_options,
+    lowercase=True,
+    data_url="https://raw.githubusercontent.com/karpathy/makemore/988aa59/names.txt",
+)
+LANGUAGES = {spec.name: spec for spec in (KO, EN)}
@@ -0,0 +1,39 @@
+"""
+Layer-0 lookup table: normalized embeddings and Q/K/V projections per (token, position).
+
+Layer 0 starts from x = rmsnorm(wte[token] + wpe[pos]) and projects
+rmsnorm(x), which depend only on (token_id, pos_id). build() evaluates x, q, k
+and v once for all vocab_size * block_size pairs; the float and numpy
+inference engines then replace the embedding rmsnorm, layer 0's second rmsnorm
+and its three matmuls with a row lookup. The table is opt-in: only
+scripts/precompile_checkpoint.py writes it (checkpoint_format.add_layer0_table()),
+as float32, so lookups agree with the computed values to float32 precision.
+"""
+
+import float_engine
+
+TABLE_NAMES = ("x", "q", "k", "v")
+
+
+def row_index(token_id, pos_id, block_size):
+    return token_id * block_size + pos_id
+
+
+def build(state_dict, config):
+    """
+    Tables keyed by TABLE_NAMES, each a list of vocab_size * block_size rows.
+
+    ``x`` is the normalized embedding (layer 0's residual input), ``q``/``k``/``v``
+    its projections, computed with float_engine from the weights as given.
+    """
+    wq, wk, wv = (state_dict[f"layer0.attn_{name}"] for name in ("wq", "wk", "wv"))
+    tables = {name: [] for name in TABLE_NAMES}
+    for tok_emb in state_dict["wte"]:
+        for pos_emb in state_dict["wpe"][: config["block_size"]]:
+            x = float_engine.rmsnorm([t + p for t, p in zip(tok_emb, pos_emb)])
+            x_norm = float_engine.rmsnorm(x)
+            tables["x"].append(x)
+            tables["q"].append(float_engine.linear(x_norm, wq))
+            tables["k"].append(float_engine.linear(x_norm, wk))
+            tables["v"].append(float_engine.linear(x_norm, wv))
+    return tables
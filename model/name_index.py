@@ -0,0 +1,268 @@
+"""
+Compact, memory-mapped index of the training names, stored next to a checkpoint.
+
+Layout (all integers little-endian):
+
+    magic b"MGNI" | uint32 format version | uint32 header length
+    JSON header (count, block_size, num_blocks, key normalization)
+    uint32 block offsets, one per block, relative to the start of the block data
+    block data
+
+Keys are the NFD form of each name, UTF-8 encoded and sorted bytewise, so a
+jamo sequence produced by the Korean tokenizer is directly a key prefix.
+Keys are front-coded in blocks of ``block_size``: the first key of a block is
+stored whole (varint length + bytes), every other key as (varint shared-prefix
+length, varint suffix length, suffix bytes) relative to the previous key.
+
+Opening an index reads only the header. Lookups binary-search the block heads
+and decode a single block, so startup does not depend on the corpus size.
+"""
+
+import json
+import mmap
+import struct
+import unicodedata
+from pathlib import Path
+
+MAGIC = b"MGNI"
+FORMAT_VERSION = 1
+BLOCK_SIZE = 16
+KEY_NORMALIZATION = "NFD"
+_PREAMBLE = struct.Struct("<4sII")
+_OFFSET = struct.Struct("<I")
+
+
+def index_path(checkpoint_path):
+    """Where the name index of a checkpoint lives: ``ko_model.bin`` -> ``ko_model.names``."""
+    return Path(checkpoint_path).with_suffix(".names")
+
+
+def _key(name):
+    return unicodedata.normalize(KEY_NORMALIZATION, name).encode("utf-8")
+
+
+def _write_varint(buf, value):
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _shared_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def save(path, names, block_size=BLOCK_SIZE):
+    if block_size <= 0:
+        raise ValueError("block_size must be > 0")
+    keys = sorted({_key(name) for name in names})
+
+    offsets = bytearray()
+    data = bytearray()
+    previous = b""
+    for i, key in enumerate(keys):
+        if i % block_size == 0:
+            offsets += _OFFSET.pack(len(data))
+            _write_varint(data, len(key))
+            data += key
+        else:
+            shared = _shared_prefix(previous, key)
+            _write_varint(data, shared)
+            _write_varint(data, len(key) - shared)
+            data += key[shared:]
+        previous = key
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "key_normalization": KEY_NORMALIZATION,
+        "count": len(keys),
+        "block_size": block_size,
+        "num_blocks": len(offsets) // _OFFSET.size,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(offsets)
+        f.write(data)
+
+
+class NameIndex:
+    """
+    Read-only set of names with exact and prefix queries.
+
+    Queries are normalized to NFD first, so ``"김민준" in index`` and
+    ``index.has_prefix(jamo_prefix)`` both work on the same index.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"Not a name index: {self.path.resolve()}")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported name index version {version}, expected {FORMAT_VERSION}")
+            self.header = json.loads(f.read(header_len).decode("utf-8"))
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.header["count"] else b""
+        self.count = self.header["count"]
+        self.block_size = self.header["block_size"]
+        self.num_blocks = self.header["num_blocks"]
+        self._blocks_offset = _PREAMBLE.size + header_len
+        self._data_offset = self._blocks_offset + _OFFSET.size * self.num_blocks
+        self._heads = {}
+
+    def __reduce__(self):
+        return (NameIndex, (self.path,))
+
+    def __len__(self):
+        return self.count
+
+    def _block_start(self, block):
+        return self._data_offset + _OFFSET.unpack_from(self._mm, self._blocks_offset + _OFFSET.size * block)[0]
+
+    def _head(self, block):
+        head = self._heads.get(block)
+        if head is None:
+            length, pos = _read_varint(self._mm, self._block_start(block))
+            head = self._heads[block] = self._mm[pos : pos + length]
+        return head
+
+    def _block_keys(self, block):
+        pos = self._block_start(block)
+        length, pos = _read_varint(self._mm, pos)
+        key = self._mm[pos : pos + length]
+        pos += length
+        yield key
+        for _ in range(min(self.block_size, self.count - block * self.block_size) - 1):
+            shared, pos = _read_varint(self._mm, pos)
+            length, pos = _read_varint(self._mm, pos)
+            key = key[:shared] + self._mm[pos : pos + length]
+            pos += length
+            yield key
+
+    def _find_block(self, key):
+        """Last block whose head is <= key, or 0 if key sorts before every head."""
+        low, high = 0, self.num_blocks - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self._head(mid) <= key:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def _keys_from(self, key):
+        """Keys >= key in sorted order."""
+        if not self.count:
+            return
+        for block in range(self._find_block(key), self.num_blocks):
+            for candidate in self._block_keys(block):
+                if candidate >= key:
+                    yield candidate
+
+    def __contains__(self, name):
+        if not isinstance(name, str):
+            return False
+        key = _key(name)
+        return next(self._keys_from(key), None) == key
+
+    def has_prefix(self, prefix):
+        """True if some name starts with ``prefix`` (compared in NFD)."""
+        key = _key(prefix)
+        candidate = next(self._keys_from(key), None)
+        return candidate is not None and candidate.startswith(key)
+
+    def match(self, prefix):
+        """``(prefix in self, self.has_prefix(prefix))`` with a single lookup."""
+        key = _key(prefix)
+        candidate = next(self._keys_from(key), None)
+        if candidate is None or not candidate.startswith(key):
+            return False, False
+        return candidate == key, True
+
+    def names(self, prefix=""):
+        """Names starting with ``prefix``, in sorted order, as NFC strings."""
+        key = _key(prefix)
+        for candidate in self._keys_from(key):
+            if not candidate.startswith(key):
+                return
+            yield unicodedata.normalize("NFC", candidate.decode("utf-8"))
+
+    def __iter__(self):
+        return self.names()
+
+
+def load(path):
+    """The index at ``path``, or None if there is none."""
+    path = Path(path)
+    return NameIndex(path) if path.exists() else None
+
+
+class NameTrie:
+    """
+    Prefix trie of a name set over token ids, expanded lazily while decoding.
+
+    Node 0 is the empty prefix. ``step(node, token_id)`` returns the child node,
+    or None once no name starts with the prefix; ``is_name(node)`` tells whether
+    the prefix is a complete name. ``names`` is a NameIndex or a plain set of
+    names (pickle and version 2 checkpoints). Each (node, token) edge is looked
+    up once and memoized, since samples share most of their prefixes.
+    """
+
+    def __init__(self, names, uchars):
+        self.uchars = uchars
+        if isinstance(names, NameIndex):
+            self._match = names.match
+        else:
+            keys = {unicodedata.normalize(KEY_NORMALIZATION, name) for name in names}
+            prefixes = {key[:i] for key in keys for i in range(len(key) + 1)}
+            self._match = lambda prefix: (prefix in keys, prefix in prefixes)
+        self._prefixes = [""]
+        self._terminal = [False]
+        self._children = [{}]
+
+    def __len__(self):
+        return len(self._prefixes)
+
+    def is_name(self, node):
+        return self._terminal[node]
+
+    def step(self, node, token_id):
+        children = self._children[node]
+        if token_id not in children:
+            prefix = self._prefixes[node] + self.uchars[token_id]
+            child = None
+            is_name, has_prefix = self._match(prefix)
+            if has_prefix:
+                child = len(self._prefixes)
+                self._prefixes.append(prefix)
+                self._terminal.append(is_name)
+                self._children.append({})
+            children[token_id] = child
+        return children[token_id]
+
+    def walk(self, token_ids, node=0):
+        """Node after ``token_ids``, or None once no name starts with them."""
+        for token_id in token_ids:
+            node = self.step(node, token_id)
+            if node is None:
+                return None
+        return node
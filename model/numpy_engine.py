@@ -0,0 +1,209 @@
+"""
+NumPy forward/backward pass that processes whole names, a padded batch at a time.
+
+Same model as ko_main.gpt(), but every position goes through one matmul per
+weight matrix and attention is a causal-masked softmax over the sequence, so the
+KV cache is not needed during training. Gradients come from an analytic backward
+pass instead of an autograd graph.
+"""
+
+import numpy as np
+
+RMS_EPS = 1e-5
+
+
+def rmsnorm(x):
+    scale = (np.mean(x * x, axis=-1, keepdims=True) + RMS_EPS) ** -0.5
+    return x * scale, scale
+
+
+def rmsnorm_backward(x, scale, dy):
+    n = x.shape[-1]
+    return scale * dy - (scale**3 / n) * x * np.sum(dy * x, axis=-1, keepdims=True)
+
+
+def causal_mask(t):
+    return np.triu(np.ones((t, t), dtype=bool), k=1)
+
+
+def pad_sequences(sequences):
+    """Right-pad token sequences into (inputs, targets, weights) arrays.
+
+    ``weights[b, t]`` is 1 / (len(sequences) * n_b) on the n_b real positions of
+    sequence b and 0 on padding, so ``sum(weights * nll)`` is the mean over
+    sequences of each sequence's mean loss.
+    """
+    lengths = [len(tokens) - 1 for tokens in sequences]
+    batch, t = len(sequences), max(lengths)
+    inputs = np.zeros((batch, t), dtype=np.int64)
+    targets = np.zeros((batch, t), dtype=np.int64)
+    weights = np.zeros((batch, t))
+    for b, (tokens, n) in enumerate(zip(sequences, lengths)):
+        inputs[b, :n] = tokens[:-1]
+        targets[b, :n] = tokens[1:]
+        weights[b, :n] = 1.0 / (batch * n)
+    return inputs, targets, weights
+
+
+def forward(weights, sequences, config):
+    """Run the model over a batch of token sequences, each scored on ``tokens[1:]``.
+
+    Sequences may differ in length; padded positions sit after the real ones, so
+    the causal mask keeps them out of every real position's attention and the
+    loss weights keep them out of the loss. Returns the batch-mean loss and the
+    activations needed by backward().
+    """
+    n_layer = config["n_layer"]
+    n_embd = config["n_embd"]
+    n_head = config["n_head"]
+    head_dim = n_embd // n_head
+
+    inputs, targets, loss_weights = pad_sequences(sequences)
+    batch, t = inputs.shape
+    mask = causal_mask(t)
+
+    x0 = weights["wte"][inputs] + weights["wpe"][:t]
+    x, scale0 = rmsnorm(x0)
+    cache = {
+        "inputs": inputs,
+        "targets": targets,
+        "loss_weights": loss_weights,
+        "x0": x0,
+        "scale0": scale0,
+        "layers": [],
+    }
+
+    for li in range(n_layer):
+        x_in = x
+        h, scale_attn = rmsnorm(x_in)
+        q = h @ weights[f"layer{li}.attn_wq"].T
+        k = h @ weights[f"layer{li}.attn_wk"].T
+        v = h @ weights[f"layer{li}.attn_wv"].T
+
+        qh = q.reshape(batch, t, n_head, head_dim).transpose(0, 2, 1, 3)
+        kh = k.reshape(batch, t, n_head, head_dim).transpose(0, 2, 1, 3)
+        vh = v.reshape(batch, t, n_head, head_dim).transpose(0, 2, 1, 3)
+        att = (qh @ kh.swapaxes(-1, -2)) / head_dim**0.5
+        att = np.where(mask, -np.inf, att)
+        att = np.exp(att - att.max(axis=-1, keepdims=True))
+        att /= att.sum(axis=-1, keepdims=True)
+        x_attn = (att @ vh).transpose(0, 2, 1, 3).reshape(batch, t, n_embd)
+
+        x_mid = x_attn @ weights[f"layer{li}.attn_wo"].T + x_in
+        h2, scale_mlp = rmsnorm(x_mid)
+        fc1 = h2 @ weights[f"layer{li}.mlp_fc1"].T
+        act = np.maximum(fc1, 0.0)
+        x = act @ weights[f"layer{li}.mlp_fc2"].T + x_mid
+
+        cache["layers"].append(
+            {
+                "x_in": x_in,
+                "h": h,
+                "scale_attn": scale_attn,
+                "qh": qh,
+                "kh": kh,
+                "vh": vh,
+                "att": att,
+                "x_attn": x_attn,
+                "x_mid": x_mid,
+                "h2": h2,
+                "scale_mlp": scale_mlp,
+                "fc1": fc1,
+                "act": act,
+            }
+        )
+
+    logits = x @ weights["lm_head"].T
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    probs = np.exp(logits)
+    probs /= probs.sum(axis=-1, keepdims=True)
+    target_probs = np.take_along_axis(probs, targets[..., None], axis=-1)[..., 0]
+    loss = -np.sum(loss_weights * np.log(target_probs))
+
+    cache["x_out"] = x
+    cache["probs"] = probs
+    return float(loss), cache
+
+
+def _weight_grad(dy, x):
+    return dy.reshape(-1, dy.shape[-1]).T @ x.reshape(-1, x.shape[-1])
+
+
+def backward(weights, cache, config):
+    """Return d(loss)/d(weight) for every matrix in ``weights``."""
+    n_layer = config["n_layer"]
+    n_embd = config["n_embd"]
+    n_head = config["n_head"]
+    head_dim = n_embd // n_head
+
+    inputs = cache["inputs"]
+    batch, t = inputs.shape
+    grads = {name: np.zeros_like(w) for name, w in weights.items()}
+
+    dlogits = cache["probs"].copy()
+    dlogits[np.arange(batch)[:, None], np.arange(t), cache["targets"]] -= 1.0
+    dlogits *= cache["loss_weights"][..., None]
+    grads["lm_head"] += _weight_grad(dlogits, cache["x_out"])
+    dx = dlogits @ weights["lm_head"]
+
+    for li in reversed(range(n_layer)):
+        c = cache["layers"][li]
+        w_fc1 = weights[f"layer{li}.mlp_fc1"]
+        w_fc2 = weights[f"layer{li}.mlp_fc2"]
+
+        grads[f"layer{li}.mlp_fc2"] += _weight_grad(dx, c["act"])
+        dact = dx @ w_fc2
+        dfc1 = dact * (c["fc1"] > 0)
+        grads[f"layer{li}.mlp_fc1"] += _weight_grad(dfc1, c["h2"])
+        dh2 = dfc1 @ w_fc1
+        dx_mid = rmsnorm_backward(c["x_mid"], c["scale_mlp"], dh2) + dx
+
+        grads[f"layer{li}.attn_wo"] += _weight_grad(dx_mid, c["x_attn"])
+        dx_attn = dx_mid @ weights[f"layer{li}.attn_wo"]
+        dout = dx_attn.reshape(batch, t, n_head, head_dim).transpose(0, 2, 1, 3)
+
+        att = c["att"]
+        datt = dout @ c["vh"].swapaxes(-1, -2)
+        dvh = att.swapaxes(-1, -2) @ dout
+        dscores = att * (datt - np.sum(datt * att, axis=-1, keepdims=True)) / head_dim**0.5
+        dqh = dscores @ c["kh"]
+        dkh = dscores.swapaxes(-1, -2) @ c["qh"]
+
+        dq = dqh.transpose(0, 2, 1, 3).reshape(batch, t, n_embd)
+        dk = dkh.transpose(0, 2, 1, 3).reshape(batch, t, n_embd)
+        dv = dvh.transpose(0, 2, 1, 3).reshape(batch, t, n_embd)
+        h = c["h"]
+        grads[f"layer{li}.attn_wq"] += _weight_grad(dq, h)
+        grads[f"layer{li}.attn_wk"] += _weight_grad(dk, h)
+        grads[f"layer{li}.attn_wv"] += _weight_grad(dv, h)
+        dh = (
+            dq @ weights[f"layer{li}.attn_wq"]
+            + dk @ weights[f"layer{li}.attn_wk"]
+            + dv @ weights[f"layer{li}.attn_wv"]
+        )
+        dx = rmsnorm_backward(c["x_in"], c["scale_attn"], dh) + dx_mid
+
+    dx0 = rmsnorm_backward(cache["x0"], cache["scale0"], dx)
+    np.add.at(grads["wte"], inputs.ravel(), dx0.reshape(-1, n_embd))
+    grads["wpe"][:t] += dx0.sum(axis=0)
+    return grads
+
+
+class NumpyEngine:
+    """Computes minibatch gradients for an optim.FlatParams buffer with NumPy.
+
+    Weights and gradients are matrix views into the flat buffer, so nothing is
+    copied between steps.
+    """
+
+    def __init__(self, params, config):
+        self.params = params
+        self.config = config
+        self.weights = {name: params.matrix(name) for name in params.shapes}
+        self.grads = {name: params.matrix(name, grad=True) for name in params.shapes}
+
+    def forward_backward(self, sequences):
+        loss, cache = forward(self.weights, sequences, self.config)
+        for name, grad in backward(self.weights, cache, self.config).items():
+            self.grads[name] += grad
+        return loss
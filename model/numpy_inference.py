@@ -0,0 +1,646 @@
+"""
+Batched NumPy inference: many sequences advance through gpt() in lockstep.
+
+Every call to NumpyModel.forward() runs one position for a whole batch of
+sequences, reading and writing a preallocated KV cache of shape
+(n_layer, batch, block_size, n_embd). sample() retires a sequence as soon as it
+emits BOS and draws all next tokens with one vectorized inverse-CDF step,
+optionally restricted to the top-k / top-p tokens. beam_search() keeps the
+best partial names instead, in a PagedKVCache whose beams share their common
+prefix. best_first_names() enumerates names in exact descending
+probability, reusing every expanded prefix's keys and values. score()
+teacher-forces given names to get their log-probabilities.
+"""
+
+import heapq
+import itertools
+
+import numpy as np
+
+SAMPLE_BATCH_SIZE = 1024
+BEST_FIRST_BATCH_SIZE = 256
+
+
+def softmax(logits):
+    exps = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exps / exps.sum(axis=-1, keepdims=True)
+
+
+def log_softmax(logits):
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+
+
+def rmsnorm(x):
+    return x * (np.mean(x * x, axis=-1, keepdims=True) + 1e-5) ** -0.5
+
+
+class KVCache:
+    def __init__(self, n_layer, batch, block_size, n_embd):
+        self.keys = np.zeros((n_layer, batch, block_size, n_embd))
+        self.values = np.zeros((n_layer, batch, block_size, n_embd))
+        self.length = 0
+
+    @property
+    def batch(self):
+        return self.keys.shape[1]
+
+    def select(self, rows):
+        """Keep only the given batch rows (index array or boolean mask)."""
+        self.keys = self.keys[:, rows]
+        self.values = self.values[:, rows]
+
+    def repeat(self, batch):
+        """A new cache with every row copied ``batch`` times (forks a prefill for a batch)."""
+        cache = KVCache.__new__(KVCache)
+        cache.keys = np.repeat(self.keys, batch, axis=1)
+        cache.values = np.repeat(self.values, batch, axis=1)
+        cache.length = self.length
+        return cache
+
+    def start(self, pos_id):
+        if self.length != pos_id:
+            raise ValueError(f"KV cache holds {self.length} positions, cannot run position {pos_id}")
+
+    def write(self, li, pos_id, k, v):
+        self.keys[li, :, pos_id] = k
+        self.values[li, :, pos_id] = v
+
+    def read(self, li, t):
+        return self.keys[li, :, :t], self.values[li, :, :t]
+
+
+class PagedKVCache:
+    """
+    KV cache for sequences that fork from each other, as beams do.
+
+    Key/value vectors live in a pool of slots, one per (prefix, position), and
+    each sequence has a table of slot ids, one per position. fork() copies
+    only the tables, so the children of a beam share every position of their
+    parent's prefix. A new position always goes to a fresh slot, so a shared
+    slot is never overwritten (copy-on-write without the copy). Slots no
+    sequence references anymore are reused, and the pool grows only when all
+    slots are live. Width-W search therefore stores one copy of every common
+    prefix instead of W copies.
+    """
+
+    def __init__(self, n_layer, capacity, block_size, n_embd):
+        self.keys = np.zeros((n_layer, capacity, n_embd))
+        self.values = np.zeros((n_layer, capacity, n_embd))
+        self.tables = np.zeros((1, block_size), dtype=np.int64)
+        self.length = 0
+        self.peak_slots = 0
+
+    @property
+    def batch(self):
+        return len(self.tables)
+
+    @property
+    def capacity(self):
+        return self.keys.shape[1]
+
+    def live_slots(self):
+        return np.unique(self.tables[:, : self.length])
+
+    def fork(self, parents):
+        """Continue with one sequence per entry of ``parents`` (indices into the current batch, repeats allowed)."""
+        self.tables = self.tables[parents]
+
+    select = fork
+
+    def _free_slots(self):
+        used = np.zeros(self.capacity, dtype=bool)
+        used[self.live_slots()] = True
+        return np.flatnonzero(~used)
+
+    def _allocate(self, count):
+        free = self._free_slots()
+        self.peak_slots = max(self.peak_slots, self.capacity - len(free) + count)
+        if len(free) < count:
+            grow = max(self.capacity, count - len(free))
+            pad = ((0, 0), (0, grow), (0, 0))
+            self.keys = np.pad(self.keys, pad)
+            self.values = np.pad(self.values, pad)
+            free = np.concatenate([free, np.arange(self.capacity - grow, self.capacity)])
+        return free[:count]
+
+    def start(self, pos_id):
+        if self.length != pos_id:
+            raise ValueError(f"KV cache holds {self.length} positions, cannot run position {pos_id}")
+        self.tables[:, pos_id] = self._allocate(self.batch)
+
+    def write(self, li, pos_id, k, v):
+        slots = self.tables[:, pos_id]
+        self.keys[li, slots] = k
+        self.values[li, slots] = v
+
+    def read(self, li, t):
+        slots = self.tables[:, :t]
+        return self.keys[li][slots], self.values[li][slots]
+
+
+class PrefixTreeCache(PagedKVCache):
+    """
+    Slot pool for a search tree whose prefixes are expanded in any order.
+
+    Used by best_first_names(): every expanded prefix keeps its key/value
+    slots for as long as the search runs, because children waiting in the
+    queue attend to them, so slots are handed out by a bump pointer and never
+    reclaimed. attach() points the cache at the slot tables of the next batch
+    of prefixes, which all have the same length.
+    """
+
+    def __init__(self, n_layer, capacity, block_size, n_embd):
+        super().__init__(n_layer, capacity, block_size, n_embd)
+        self.block_size = block_size
+        self.used_slots = 0
+
+    def attach(self, tables, length):
+        self.tables = np.zeros((len(tables), self.block_size), dtype=np.int64)
+        self.tables[:, :length] = tables
+        self.length = length
+
+    def _free_slots(self):
+        return np.arange(self.used_slots, self.capacity)
+
+    def _allocate(self, count):
+        slots = super()._allocate(count)
+        self.used_slots += count
+        return slots
+
+
+class NumpyModel:
+    def __init__(self, state_dict, config, table=None):
+        n_embd = config["n_embd"]
+        n_head = config["n_head"]
+        if n_embd % n_head != 0:
+            raise ValueError(f"Invalid config: n_embd ({n_embd}) is not divisible by n_head ({n_head})")
+
+        self.config = config
+        self.n_layer = config["n_layer"]
+        self.n_embd = n_embd
+        self.n_head = n_head
+        self.head_dim = n_embd // n_head
+        self.block_size = config["block_size"]
+        # A checkpoint_format.LazyStateDict hands out float32 views of the mapped
+        # file directly, skipping the per-float list decode. Quantized tensors
+        # stay int8/float16 and are dequantized inside each matmul (linear()).
+        to_array = getattr(state_dict, "array", None)
+        quantized = getattr(state_dict, "quantized", None)
+        self.weights = {}
+        self.scales = {}
+        for name in state_dict:
+            stored = quantized(name) if quantized else None
+            if stored is None:
+                self.weights[name] = np.asarray(to_array(name) if to_array else state_dict[name], dtype=np.float64)
+            else:
+                self.weights[name], scales = stored
+                if scales is not None:
+                    self.scales[name] = scales.astype(np.float64)
+        self.vocab_size = self.weights["lm_head"].shape[0]
+        # Normalized embedding and layer-0 Q/K/V rows per (token, position), see layer0_table.py.
+        self.table = None
+        if table is not None:
+            to_array = getattr(table, "array", None)
+            self.table = {
+                name: np.asarray(to_array(name) if to_array else table[name], dtype=np.float64) for name in table
+            }
+
+    def new_cache(self, batch):
+        return KVCache(self.n_layer, batch, self.block_size, self.n_embd)
+
+    def linear(self, x, name):
+        """``x @ W.T``; int8 rows are scaled after the product, since row i of W is scales[i] * q[i]."""
+        y = x @ self.weights[name].T
+        scales = self.scales.get(name)
+        return y if scales is None else y * scales
+
+    def embed(self, token_ids):
+        rows = self.weights["wte"][token_ids].astype(np.float64)
+        scales = self.scales.get("wte")
+        return rows if scales is None else rows * scales[token_ids, None]
+
+    def forward(self, token_ids, pos_id, cache):
+        """Logits of shape (batch, vocab_size) for one position of every row."""
+        cache.start(pos_id)
+        w = self.weights
+        batch = len(token_ids)
+        n_head, head_dim = self.n_head, self.head_dim
+        t = pos_id + 1
+
+        if self.table is not None:
+            rows = token_ids * self.block_size + pos_id  # layer0_table.row_index()
+            x = self.table["x"][rows]
+        else:
+            x = rmsnorm(self.embed(token_ids) + w["wpe"][pos_id])
+        for li in range(self.n_layer):
+            x_residual = x
+            if li == 0 and self.table is not None:
+                q, k, v = self.table["q"][rows], self.table["k"][rows], self.table["v"][rows]
+            else:
+                x = rmsnorm(x)
+                q = self.linear(x, f"layer{li}.attn_wq")
+                k = self.linear(x, f"layer{li}.attn_wk")
+                v = self.linear(x, f"layer{li}.attn_wv")
+            cache.write(li, pos_id, k, v)
+
+            keys, values = cache.read(li, t)
+            qh = q.reshape(batch, n_head, head_dim)
+            kh = keys.reshape(batch, t, n_head, head_dim)
+            vh = values.reshape(batch, t, n_head, head_dim)
+            att = softmax(np.einsum("bhd,bthd->bht", qh, kh) / head_dim**0.5)
+            x = np.einsum("bht,bthd->bhd", att, vh).reshape(batch, self.n_embd)
+
+            x = self.linear(x, f"layer{li}.attn_wo") + x_residual
+            x_residual = x
+            x = np.maximum(self.linear(rmsnorm(x), f"layer{li}.mlp_fc1"), 0.0)
+            x = self.linear(x, f"layer{li}.mlp_fc2") + x_residual
+
+        cache.length = t
+        return self.linear(x, "lm_head")
+
+
+def sample_tokens(probs, rng):
+    """
+    Draw one token per row of ``probs`` with a single uniform per row.
+
+    Like random.choices() on the float engine, a row with no positive mass
+    (everything masked or filtered away) raises instead of picking a token.
+    """
+    cdf = np.cumsum(probs, axis=-1)
+    if not (cdf[:, -1] > 0).all():
+        raise ValueError("Total of weights must be greater than zero")
+    u = rng.random(len(probs))[:, None] * cdf[:, -1:]
+    return np.minimum((cdf <= u).sum(axis=-1), probs.shape[-1] - 1)
+
+
+def filter_probs(probs, top_k=None, top_p=None):
+    """
+    Zero every token outside the top ``top_k`` and/or the nucleus of each row.
+
+    The nucleus is the smallest set of most likely tokens whose mass reaches
+    ``top_p`` of the row total (after top-k). Ties at the k-th probability are
+    kept. sample_tokens() renormalizes what is left.
+    """
+    if top_k is not None and top_k < probs.shape[-1]:
+        kth = np.partition(probs, -top_k, axis=-1)[:, -top_k, None]
+        probs = np.where(probs >= kth, probs, 0.0)
+    if top_p is not None:
+        order = np.argsort(-probs, axis=-1, kind="stable")
+        sorted_probs = np.take_along_axis(probs, order, axis=-1)
+        mass_before = np.cumsum(sorted_probs, axis=-1) - sorted_probs
+        keep = np.empty_like(probs, dtype=bool)
+        np.put_along_axis(keep, order, mass_before < top_p * sorted_probs.sum(axis=-1, keepdims=True), axis=-1)
+        probs = np.where(keep, probs, 0.0)
+    return probs
+
+
+def mask_known_names(probs, bos, nodes, trie):
+    """Zero BOS in the rows whose trie node is a training name; sample_tokens() renormalizes.
+
+    ``nodes`` holds one trie node per row, -1 once a row has left the trie.
+    Each distinct node is looked up once.
+    """
+    unique, inverse = np.unique(nodes, return_inverse=True)
+    known = np.array([node >= 0 and trie.is_name(node) for node in unique.tolist()])[inverse]
+    known &= probs[:, bos] < probs.sum(axis=-1)
+    probs[known, bos] = 0.0
+    return probs
+
+
+def advance_nodes(nodes, token_ids, trie):
+    """Follow one token per row down the trie, resolving each distinct (node, token) edge once."""
+    on_trie = nodes >= 0
+    if on_trie.any():
+        vocab_size = len(trie.uchars)
+        edges, inverse = np.unique(nodes[on_trie] * vocab_size + token_ids[on_trie], return_inverse=True)
+        children = [trie.step(*divmod(edge, vocab_size)) for edge in edges.tolist()]
+        nodes[on_trie] = np.array([-1 if child is None else child for child in children])[inverse]
+    return nodes
+
+
+def prefill(model, bos, prefix_ids):
+    """Run BOS + ``prefix_ids`` through the model once; returns a prefix_cache.PrefillState."""
+    from prefix_cache import PrefillState
+
+    cache = model.new_cache(1)
+    for pos_id, token_id in enumerate([bos] + list(prefix_ids)):
+        logits = model.forward(np.array([token_id]), pos_id, cache)
+    return PrefillState(prefix_ids, cache, logits)
+
+
+def sample(
+    model,
+    num_samples,
+    temperature,
+    bos,
+    max_tokens,
+    seed,
+    batch_size=SAMPLE_BATCH_SIZE,
+    trie=None,
+    grammar=None,
+    top_k=None,
+    top_p=None,
+    prefill=None,
+    banned=(),
+):
+    """Generate ``num_samples`` token-id lists (without BOS), ``batch_size`` at a time.
+
+    ``seed`` is anything np.random.default_rng() accepts; the output only
+    depends on it, ``num_samples`` and ``batch_size``. With a
+    name_index.NameTrie, every row follows the trie and BOS is masked where it
+    would complete a training name. With a hangul_grammar.HangulGrammar, each
+    row keeps a grammar state and its precomputed mask is applied to the row.
+    ``top_k`` / ``top_p`` restrict each draw to the most likely tokens left
+    after those masks (see filter_probs()). With a prefix_cache.PrefillState,
+    each batch starts from copies of the prefilled cache row and the returned
+    ids include the prefix; ``banned`` tokens cannot directly follow it.
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be > 0")
+    max_tokens = min(max_tokens, model.block_size)
+    rng = np.random.default_rng(seed)
+    if grammar is not None:
+        masks = np.asarray(grammar.masks)
+        final_masks = np.asarray(grammar.final_masks)
+        transitions = np.asarray(grammar.transitions)
+
+    prefix_ids = prefill.prefix_ids if prefill is not None else []
+    first = len(prefix_ids)
+    if trie is not None:
+        root_node = trie.walk(prefix_ids)
+        root_node = -1 if root_node is None else root_node
+    root_state = grammar.walk(prefix_ids) if grammar is not None else 0
+
+    generated = np.full((num_samples, max_tokens - first), bos, dtype=np.int64)
+    lengths = np.full(num_samples, max_tokens - first, dtype=np.int64)
+    for start in range(0, num_samples, batch_size):
+        rows = np.arange(start, min(start + batch_size, num_samples))
+        cache = model.new_cache(len(rows)) if prefill is None else prefill.cache.repeat(len(rows))
+        token_ids = np.full(len(rows), bos, dtype=np.int64)
+        nodes = np.full(len(rows), root_node, dtype=np.int64) if trie is not None else None
+        states = np.full(len(rows), root_state, dtype=np.int64)
+
+        for pos_id in range(first, max_tokens):
+            if prefill is not None and pos_id == first:
+                logits = np.repeat(prefill.logits, len(rows), axis=0)
+            else:
+                logits = model.forward(token_ids, pos_id, cache)
+            probs = softmax(logits / temperature)
+            if banned and pos_id == first:
+                probs[:, list(banned)] = 0.0
+            if grammar is not None:
+                probs *= (final_masks if pos_id == max_tokens - 1 else masks)[states]
+            if nodes is not None:
+                probs = mask_known_names(probs, bos, nodes, trie)
+            if top_k is not None or top_p is not None:
+                probs = filter_probs(probs, top_k, top_p)
+            token_ids = sample_tokens(probs, rng)
+            generated[rows, pos_id - first] = token_ids
+
+            done = token_ids == bos
+            if done.any():
+                lengths[rows[done]] = pos_id - first
+                keep = ~done
+                rows, token_ids = rows[keep], token_ids[keep]
+                if not len(rows):
+                    break
+                cache.select(keep)
+                states = states[keep]
+                if nodes is not None:
+                    nodes = nodes[keep]
+            if nodes is not None:
+                nodes = advance_nodes(nodes, token_ids, trie)
+            if grammar is not None:
+                states = transitions[states, token_ids]
+
+    return [prefix_ids + generated[i, : lengths[i]].tolist() for i in range(num_samples)]
+
+
+def score(model, bos, sequences, batch_size=SAMPLE_BATCH_SIZE):
+    """
+    Log-probability of each token-id list followed by BOS, as a float array.
+
+    Sequences are right-padded and teacher-forced ``batch_size`` at a time in
+    lockstep. Padding only follows a row's last scored position, so causal
+    attention keeps it out of the row's score. A sequence of ``block_size``
+    tokens has no room for the closing BOS and is scored without it, like a
+    sample cut off at ``max_tokens``.
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be > 0")
+    too_long = [len(sequence) for sequence in sequences if len(sequence) > model.block_size]
+    if too_long:
+        raise ValueError(f"Sequence of {too_long[0]} tokens does not fit block_size {model.block_size}")
+
+    log_probs = np.zeros(len(sequences))
+    for start in range(0, len(sequences), batch_size):
+        chunk = sequences[start : start + batch_size]
+        lengths = np.array([len(sequence) for sequence in chunk])
+        steps = min(lengths.max() + 1, model.block_size)
+        targets = np.full((len(chunk), steps), bos, dtype=np.int64)
+        for i, sequence in enumerate(chunk):
+            targets[i, : len(sequence)] = sequence
+        inputs = np.concatenate([np.full((len(chunk), 1), bos), targets[:, :-1]], axis=1)
+
+        cache = model.new_cache(len(chunk))
+        rows = np.arange(len(chunk))
+        for pos_id in range(steps):
+            logp = log_softmax(model.forward(inputs[:, pos_id], pos_id, cache))
+            log_probs[start + rows] += np.where(pos_id <= lengths, logp[rows, targets[:, pos_id]], 0.0)
+    return log_probs
+
+
+def beam_search(
+    model, bos, beam_width, max_tokens, num_results=None, length_penalty=1.0, trie=None, grammar=None
+):
+    """
+    Deterministic beam search for the most likely names.
+
+    Returns up to ``num_results`` (default ``beam_width``) tuples
+    ``(token_ids, log_prob, score)``, best score first, where ``log_prob`` is
+    the model log-probability of the name including the closing BOS and
+    ``score = log_prob / length ** length_penalty`` (length counts the BOS).
+    Names cut off at ``max_tokens`` end without BOS; the empty name is never
+    returned. Each step expands every live beam by the whole vocabulary at
+    once and keeps the ``beam_width`` best continuations. The search stops
+    once no live beam scores better, at its current length, than the
+    ``num_results``-th finished name; with ``length_penalty=0`` that bound is
+    exact. ``trie`` and ``grammar`` apply the same BOS and token masks as
+    sample().
+    """
+    if beam_width <= 0:
+        raise ValueError("beam_width must be > 0")
+    num_results = beam_width if num_results is None else num_results
+    max_tokens = min(max_tokens, model.block_size)
+
+    cache = PagedKVCache(model.n_layer, beam_width * 4, model.block_size, model.n_embd)
+    sequences = [[]]
+    log_probs = np.zeros(1)
+    token_ids = np.array([bos])
+    nodes = np.zeros(1, dtype=np.int64) if trie is not None else None
+    states = np.zeros(1, dtype=np.int64)
+    if grammar is not None:
+        masks = np.asarray(grammar.masks)
+        final_masks = np.asarray(grammar.final_masks)
+        transitions = np.asarray(grammar.transitions)
+
+    finished = []
+    for pos_id in range(max_tokens):
+        logp = log_softmax(model.forward(token_ids, pos_id, cache))
+        if not pos_id:
+            logp[:, bos] = -np.inf  # no empty name
+        last = pos_id == max_tokens - 1
+        if grammar is not None:
+            logp = np.where((final_masks if last else masks)[states] > 0, logp, -np.inf)
+        if nodes is not None:
+            known = np.array([node >= 0 and trie.is_name(node) for node in nodes.tolist()])
+            logp[known, bos] = -np.inf
+
+        ended = log_probs + logp[:, bos]
+        for i in np.flatnonzero(np.isfinite(ended)).tolist():
+            finished.append((ended[i] / (pos_id + 1) ** length_penalty, ended[i], sequences[i]))
+
+        candidates = log_probs[:, None] + logp
+        candidates[:, bos] = -np.inf
+        best = np.argsort(-candidates, axis=None, kind="stable")[:beam_width]
+        best = best[np.isfinite(candidates.ravel()[best])]
+        parents, tokens = np.divmod(best, model.vocab_size)
+        log_probs = candidates[parents, tokens]
+        sequences = [sequences[parent] + [token] for parent, token in zip(parents.tolist(), tokens.tolist())]
+        if last or not len(best):
+            finished.extend(
+                (log_prob / (pos_id + 1) ** length_penalty, log_prob, sequence)
+                for log_prob, sequence in zip(log_probs.tolist(), sequences)
+            )
+            break
+
+        cache.fork(parents)
+        token_ids = tokens
+        if nodes is not None:
+            nodes = advance_nodes(nodes[parents], tokens, trie)
+        if grammar is not None:
+            states = transitions[states[parents], tokens]
+
+        if len(finished) >= num_results:
+            finished.sort(key=lambda entry: -entry[0])
+            del finished[num_results:]
+            if log_probs.max() / (pos_id + 2) ** length_penalty <= finished[-1][0]:
+                break
+
+    finished.sort(key=lambda entry: -entry[0])
+    return [(sequence, float(log_prob), float(score)) for score, log_prob, sequence in finished[:num_results]]
+
+
+def best_first_names(
+    model, bos, max_tokens, min_log_prob=-np.inf, batch_size=BEST_FIRST_BATCH_SIZE, trie=None, grammar=None
+):
+    """
+    Yield ``(token_ids, log_prob)`` for every name, most likely first.
+
+    Best-first search over the token tree. A priority queue holds prefixes
+    keyed by their log-probability, which can only drop as they grow, next to
+    finished names (prefix + BOS). A finished name at the head of the queue
+    is therefore the most likely name not yielded yet, and the order is exact.
+
+    Expanding a prefix runs a single position through the model; its
+    ancestors' keys and values stay in a PrefixTreeCache. The children of an
+    expanded prefix are sorted once and enter the queue one at a time, each
+    when its more likely sibling is popped. Up to ``batch_size`` prefixes
+    from the head of the queue are expanded per forward pass, which can only
+    cost extra expansions, never change the order. Children below
+    ``min_log_prob`` are pruned. Names reaching ``max_tokens`` end there
+    without BOS, as in sample(); the empty name is never yielded. ``trie``
+    and ``grammar`` apply the same masks as sample(). The generator is lazy:
+    stop iterating to stop the search.
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be > 0")
+    max_tokens = min(max_tokens, model.block_size)
+    if grammar is not None:
+        masks = np.asarray(grammar.masks)
+        final_masks = np.asarray(grammar.final_masks)
+        transitions = np.asarray(grammar.transitions)
+
+    cache = PrefixTreeCache(model.n_layer, 1024, model.block_size, model.n_embd)
+    # A prefix is (token ids, slot table, trie node, grammar state, log-prob).
+    # A family holds the children of one expanded prefix, most likely first:
+    # (prefix, child tokens, child log-probs, children end the name).
+    # Queue entries are (-log_prob, tie-breaker, finished, family, child index).
+    queue = []
+    counter = itertools.count()
+
+    def push(family, index):
+        _, tokens, log_probs, last = family
+        finished = last or tokens[index] == bos
+        heapq.heappush(queue, (-log_probs[index], next(counter), finished, family, index))
+
+    def pop():
+        neg_log_prob, _, finished, family, index = heapq.heappop(queue)
+        if index + 1 < len(family[1]):
+            push(family, index + 1)
+        return family[0], family[1][index], -neg_log_prob, finished
+
+    def child(prefix, token_id, log_prob):
+        token_ids, table, node, state, _ = prefix
+        if trie is not None and node >= 0:
+            node = trie.step(node, token_id)
+            node = -1 if node is None else node
+        if grammar is not None:
+            state = int(transitions[state, token_id])
+        return (token_ids + (token_id,), table, node, state, log_prob)
+
+    def expand(prefixes, pos_id):
+        cache.attach(np.array([prefix[1] for prefix in prefixes]).reshape(len(prefixes), pos_id), pos_id)
+        token_ids = np.array([prefix[0][-1] if pos_id else bos for prefix in prefixes])
+        logp = log_softmax(model.forward(token_ids, pos_id, cache))
+        if not pos_id:
+            logp[:, bos] = -np.inf  # no empty name
+        last = pos_id == max_tokens - 1
+        if grammar is not None:
+            states = np.array([prefix[3] for prefix in prefixes])
+            logp = np.where((final_masks if last else masks)[states] > 0, logp, -np.inf)
+        if trie is not None:
+            known = np.array([prefix[2] >= 0 and trie.is_name(prefix[2]) for prefix in prefixes])
+            logp[known, bos] = -np.inf
+        log_probs = logp + np.array([prefix[4] for prefix in prefixes])[:, None]
+        order = np.argsort(-log_probs, axis=-1, kind="stable")
+        sorted_log_probs = np.take_along_axis(log_probs, order, axis=-1)
+        counts = ((sorted_log_probs >= min_log_prob) & (sorted_log_probs > -np.inf)).sum(axis=-1)
+        for row, prefix in enumerate(prefixes):
+            if counts[row]:
+                # Children attend to this position too: extend the table by its new slot.
+                expanded = (prefix[0], cache.tables[row, : pos_id + 1], *prefix[2:])
+                family = (
+                    expanded,
+                    order[row, : counts[row]].tolist(),
+                    sorted_log_probs[row, : counts[row]].tolist(),
+                    last,
+                )
+                push(family, 0)
+
+    expand([((), np.zeros(0, dtype=np.int64), 0, 0, 0.0)], 0)
+    while queue:
+        prefix, token_id, log_prob, finished = pop()
+        if finished:
+            yield (list(prefix[0]) if token_id == bos else [*prefix[0], token_id]), log_prob
+            continue
+
+        # Batch the next most likely prefixes, looking past (and then restoring)
+        # finished names in between; they cannot be yielded before the
+        # prefixes ahead of them are expanded anyway.
+        pending = [child(prefix, token_id, log_prob)]
+        finished_entries = []
+        while len(pending) < batch_size and queue and len(finished_entries) < batch_size:
+            if queue[0][2]:
+                finished_entries.append(heapq.heappop(queue))
+                continue
+            prefix, token_id, log_prob, _ = pop()
+            pending.append(child(prefix, token_id, log_prob))
+        for entry in finished_entries:
+            heapq.heappush(queue, entry)
+        by_length = {}
+        for prefix in pending:
+            by_length.setdefault(len(prefix[0]), []).append(prefix)
+        for pos_id, prefixes in sorted(by_length.items()):
+            expand(prefixes, pos_id)
@@ -0,0 +1,189 @@
+"""
+Per-step observers for train(), so one training run can write every asset.
+
+train() calls each observer in this order:
+
+    on_train_begin(run)                          before the first step
+    on_gradients(run, step, batch, loss, lr_t)   after backward; run.params.grad holds the step's gradient
+    on_step_end(run, step)                       after the Adam update
+    on_train_end(run)                            after the last step; run.state_dict holds the trained weights
+
+``step`` is 0-based, ``batch`` is the list of (tokenizer-normalized) docs of the step.
+"""
+
+import time
+from pathlib import Path
+
+from trace_format import open_trace_writer
+
+MATRIX_ALIASES = {"attn_wq": "layer0.attn_wq"}
+
+
+class TrainingRun:
+    def __init__(self, docs, tokenizer, config, state_dict, params, num_steps, learning_rate, beta1, beta2, eps_adam):
+        self.docs = docs
+        self.tokenizer = tokenizer
+        self.config = config
+        self.state_dict = state_dict
+        self.params = params
+        self.num_steps = num_steps
+        self.learning_rate = learning_rate
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.eps_adam = eps_adam
+
+    def float_checkpoint(self):
+        """Checkpoint-shaped dict of the current weights (what the snapshot exporters read)."""
+        return {
+            "config": self.config,
+            "tokenizer": {
+                "uchars": self.tokenizer["uchars"],
+                "BOS": self.tokenizer["BOS"],
+                "vocab_size": self.tokenizer["vocab_size"],
+            },
+            "state_dict": self.params.to_float_state_dict(),
+        }
+
+
+class TrainingObserver:
+    def on_train_begin(self, run):
+        pass
+
+    def on_gradients(self, run, step, batch, loss, lr_t):
+        pass
+
+    def on_step_end(self, run, step):
+        pass
+
+    def on_train_end(self, run):
+        pass
+
+
+def tracked_row(params, spec, grad=False):
+    matrix_name = MATRIX_ALIASES.get(spec["matrix"], spec["matrix"])
+    row_index = int(spec["row_index"])
+    shape = params.shapes.get(matrix_name)
+    if shape is None:
+        raise ValueError(f"State dict matrix '{matrix_name}' is missing.")
+    if row_index < 0 or row_index >= shape[0]:
+        raise ValueError(f"Invalid row index for '{matrix_name}': {row_index}")
+    return params.row(matrix_name, row_index, grad=grad)
+
+
+class TraceObserver(TrainingObserver):
+    """Streams the Chapter 6 trace: gradient and updated value of each tracked row, every step."""
+
+    def __init__(self, output_path, parameter_options, step_options, round_digits, trace_format="chunked", word=None):
+        self.output_path = Path(output_path)
+        self.parameter_options = parameter_options
+        self.step_options = step_options
+        self.round_digits = round_digits
+        self.trace_format = trace_format
+        self.word = word or (lambda doc: doc)
+        self.writer = None
+        self._record = None
+
+    def _rounded(self, values):
+        return [round(float(value), self.round_digits) for value in values]
+
+    def on_train_begin(self, run):
+        header = {
+            "num_steps": run.num_steps,
+            "step_options": self.step_options,
+            "optimizer": {
+                "name": "Adam",
+                "beta1": run.beta1,
+                "beta2": run.beta2,
+                "eps": run.eps_adam,
+                "base_learning_rate": run.learning_rate,
+                "schedule": "linear_decay(lr_t = lr * (1 - step / num_steps))",
+            },
+            "parameter_options": self.parameter_options,
+        }
+        row_length = run.config["n_embd"]
+        self.writer = open_trace_writer(self.trace_format, self.output_path, header, row_length, self.round_digits)
+
+        params_payload = {}
+        for spec in self.parameter_options:
+            after = self._rounded(tracked_row(run.params, spec))
+            params_payload[spec["id"]] = {"grad": [0.0] * len(after), "after": after}
+        self.writer.write_step(
+            {
+                "step": 0,
+                "word": self.word(run.docs[0]) if run.docs else "",
+                "loss": None,
+                "learning_rate": round(float(run.learning_rate), self.round_digits),
+                "params": params_payload,
+            }
+        )
+
+    def on_gradients(self, run, step, batch, loss, lr_t):
+        self._record = {
+            "step": step + 1,
+            "word": self.word(batch[0]),
+            "loss": round(loss, self.round_digits),
+            "learning_rate": round(float(lr_t), self.round_digits),
+            "params": {
+                spec["id"]: {"grad": self._rounded(tracked_row(run.params, spec, grad=True)), "after": []}
+                for spec in self.parameter_options
+            },
+        }
+
+    def on_step_end(self, run, step):
+        for spec in self.parameter_options:
+            self._record["params"][spec["id"]]["after"] = self._rounded(tracked_row(run.params, spec))
+        self.writer.write_step(self._record)
+        self._record = None
+
+    def on_train_end(self, run):
+        self.writer.close()
+        print(f"Saved training trace ({self.trace_format}): {self.writer.path}")
+
+
+class CheckpointObserver(TrainingObserver):
+    """Saves the trained weights with ``save(path, state_dict, config, tokenizer, dataset_names)``."""
+
+    def __init__(self, path, dataset_names, save):
+        self.path = path
+        self.dataset_names = dataset_names
+        self.save = save
+        self.checkpoint = None
+
+    def on_train_end(self, run):
+        self.checkpoint = self.save(self.path, run.state_dict, run.config, run.tokenizer, self.dataset_names)
+
+
+class SnapshotObserver(TrainingObserver):
+    """Exports the embedding snapshot with ``export(checkpoint, output_path)`` from the trained weights."""
+
+    def __init__(self, output_path, export):
+        self.output_path = output_path
+        self.export = export
+
+    def on_train_end(self, run):
+        self.export(run.float_checkpoint(), self.output_path)
+
+
+class TimedObserver(TrainingObserver):
+    """Wraps an observer and adds up the wall time spent in its hooks."""
+
+    def __init__(self, observer):
+        self.observer = observer
+        self.elapsed = 0.0
+
+    def _timed(self, hook, *args):
+        start = time.perf_counter()
+        hook(*args)
+        self.elapsed += time.perf_counter() - start
+
+    def on_train_begin(self, run):
+        self._timed(self.observer.on_train_begin, run)
+
+    def on_gradients(self, run, step, batch, loss, lr_t):
+        self._timed(self.observer.on_gradients, run, step, batch, loss, lr_t)
+
+    def on_step_end(self, run, step):
+        self._timed(self.observer.on_step_end, run, step)
+
+    def on_train_end(self, run):
+        self._timed(self.observer.on_train_end, run)
@@ -0,0 +1,101 @@
+"""
+Flat parameter storage and the Adam optimizer used by every training engine.
+
+FlatParams keeps all weights (and their gradients) in one contiguous float64
+buffer, in state_dict order, and hands out matrix-shaped views into it. Adam
+keeps its moment buffers in the same layout and updates every parameter with a
+single vectorized step when NumPy is installed.
+"""
+
+from array import array
+from itertools import repeat
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class FlatParams:
+    def __init__(self, shapes):
+        self.shapes = dict(shapes)
+        self.offsets = {}
+        size = 0
+        for name, (rows, cols) in self.shapes.items():
+            self.offsets[name] = size
+            size += rows * cols
+        self.size = size
+        self.data = array("d", bytes(8 * size))
+        self.grad = array("d", bytes(8 * size))
+
+    @classmethod
+    def from_state_dict(cls, state_dict):
+        """Copy a state_dict of Value or float matrices into a new buffer."""
+        flat = cls({name: (len(mat), len(mat[0])) for name, mat in state_dict.items()})
+        flat.data = array("d", (getattr(x, "data", x) for mat in state_dict.values() for row in mat for x in row))
+        return flat
+
+    def to_float_state_dict(self):
+        return {name: [self.row(name, r) for r in range(rows)] for name, (rows, _cols) in self.shapes.items()}
+
+    def row(self, name, index, grad=False):
+        cols = self.shapes[name][1]
+        start = self.offsets[name] + index * cols
+        buf = self.grad if grad else self.data
+        return buf[start : start + cols].tolist()
+
+    def matrix(self, name, grad=False):
+        """NumPy (rows, cols) view into the data or grad buffer; writes go through."""
+        rows, cols = self.shapes[name]
+        start = self.offsets[name]
+        buf = np.frombuffer(self.grad if grad else self.data, dtype=np.float64)
+        return buf[start : start + rows * cols].reshape(rows, cols)
+
+
+def _pow(values, exponent):
+    # Python's float ``**`` (libm pow()) per element: NumPy's square/sqrt fast paths
+    # round differently from it for about 0.1% of inputs.
+    return np.fromiter(map(pow, values, repeat(float(exponent))), dtype=np.float64, count=len(values))
+
+
+class Adam:
+    def __init__(self, params, beta1, beta2, eps):
+        self.params = params
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.eps = eps
+        self.m = array("d", bytes(8 * params.size))
+        self.v = array("d", bytes(8 * params.size))
+
+    def step(self, step, lr_t):
+        """Apply one update with bias correction for ``step`` (0-based), then zero the grads.
+
+        Both paths evaluate the same expression in the same order and give
+        bit-identical parameters, so shipped assets do not depend on NumPy.
+        """
+        beta1, beta2, eps = self.beta1, self.beta2, self.eps
+        bias1 = 1 - beta1 ** (step + 1)
+        bias2 = 1 - beta2 ** (step + 1)
+
+        if np is not None:
+            p = np.frombuffer(self.params.data, dtype=np.float64)
+            g = np.frombuffer(self.params.grad, dtype=np.float64)
+            m = np.frombuffer(self.m, dtype=np.float64)
+            v = np.frombuffer(self.v, dtype=np.float64)
+            m *= beta1
+            m += (1 - beta1) * g
+            v *= beta2
+            v += (1 - beta2) * _pow(self.params.grad, 2)
+            p -= lr_t * (m / bias1) / (_pow((v / bias2).tolist(), 0.5) + eps)
+            g[:] = 0.0
+            return
+
+        data, grad, m, v = self.params.data, self.params.grad, self.m, self.v
+        for i in range(self.params.size):
+            g = grad[i]
+            m[i] = beta1 * m[i] + (1 - beta1) * g
+            v[i] = beta2 * v[i] + (1 - beta2) * g**2
+            m_hat = m[i] / bias1
+            v_hat = v[i] / bias2
+            data[i] -= lr_t * m_hat / (v_hat**0.5 + eps)
+            grad[i] = 0.0
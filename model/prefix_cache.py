@@ -0,0 +1,97 @@
+"""
+Prefix-conditioned generation: tokenize a prefix and cache its prefill.
+
+A prefill runs BOS and the prefix through the model once. The per-layer
+keys/values it leaves behind and the logits for the first free token make up
+a PrefillState. Every sample starts from a fork of that state instead of
+re-running the prefix. Popular prefixes (the UI asks for the same starts
+over and over) stay in an LRU cache keyed by model, engine and prefix tokens.
+"""
+
+import unicodedata
+from collections import OrderedDict
+
+from hangul_grammar import JONG, JUNG, jamo_class
+
+PREFILL_CACHE_SIZE = 256
+
+
+def encode_prefix(prefix, tokenizer):
+    """
+    Token ids of ``prefix`` in NFD, and the token ids that may not follow it.
+
+    A prefix ending in a full syllable without jongseong, such as "서", must
+    not take a jongseong next, or the NFC result would start with "선"
+    instead. A prefix typed as bare jamo keeps every continuation.
+    """
+    text = unicodedata.normalize("NFD", prefix)
+    stoi = {ch: i for i, ch in enumerate(tokenizer["uchars"])}
+    unknown = sorted({ch for ch in text if ch not in stoi})
+    if unknown:
+        raise ValueError(f"Prefix {prefix!r} has characters outside the model vocabulary: {unknown}")
+    token_ids = [stoi[ch] for ch in text]
+    banned = []
+    if text and jamo_class(text[-1]) == JUNG and prefix[-1] != text[-1]:
+        banned = [i for i, ch in enumerate(tokenizer["uchars"]) if jamo_class(ch) == JONG]
+    return token_ids, banned
+
+
+class PrefillState:
+    """
+    Model state after BOS + prefix.
+
+    ``cache`` is engine-native: per-layer ``(keys, values)`` lists for the
+    float and value engines, a one-row numpy_inference.KVCache for numpy.
+    ``logits`` are the next-token logits at position ``len(prefix_ids)``.
+    """
+
+    def __init__(self, prefix_ids, cache, logits):
+        self.prefix_ids = list(prefix_ids)
+        self.cache = cache
+        self.logits = logits
+
+    def fork_lists(self):
+        """Per-layer keys/values for one sample; vectors are shared, only the lists are copied."""
+        keys, values = self.cache
+        return [list(layer) for layer in keys], [list(layer) for layer in values]
+
+
+class PrefillCache:
+    """LRU map from (model, engine, prefix token ids) to PrefillState."""
+
+    def __init__(self, maxsize=PREFILL_CACHE_SIZE):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be > 0")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, model, engine, prefix_ids, run):
+        """
+        The cached state for ``prefix_ids``, or ``run()`` stored as the newest entry.
+
+        ``model`` identifies the weights by object identity; entries hold a
+        reference to it, so its id cannot be reused while they are cached.
+        """
+        key = (id(model), engine, tuple(prefix_ids))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        state = run()
+        self._entries[key] = (model, state)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return state
+
+    def clear(self):
+        self._entries.clear()
+
+
+PREFILL_CACHE = PrefillCache()
@@ -0,0 +1,43 @@
+"""
+Weight quantization for checkpoint storage and inference.
+
+"int8" stores each row as integers in [-127, 127] plus one float32 scale
+(symmetric per-row quantization: row ~= scale * q, scale = max|row| / 127).
+"float16" stores every weight as an IEEE half. Only wte, lm_head and the
+layer{i}.* matrices are quantized; wpe stays float32. checkpoint_format.save()
+writes quantized tensors and LazyStateDict decodes them back to floats, while
+numpy_inference.NumpyModel multiplies by the stored values directly.
+"""
+
+import struct
+from array import array
+
+QUANT_DTYPES = ("int8", "float16")
+INT8_MAX = 127
+
+
+def is_quantizable(name):
+    return name in ("wte", "lm_head") or name.startswith("layer")
+
+
+def float32(x):
+    return array("f", [x])[0]
+
+
+def quantize_int8(matrix):
+    """(rows of ints, per-row float32 scales) with row ~= scale * q."""
+    values, scales = [], []
+    for row in matrix:
+        amax = max(abs(x) for x in row)
+        scale = float32(amax / INT8_MAX) if amax > 0 else 1.0
+        values.append([max(-INT8_MAX, min(INT8_MAX, round(x / scale))) for x in row])
+        scales.append(scale)
+    return values, scales
+
+
+def dequantize_int8(values, scales):
+    return [[q * scale for q in row] for row, scale in zip(values, scales)]
+
+
+def round_float16(matrix):
+    return [list(struct.unpack(f"<{len(row)}e", struct.pack(f"<{len(row)}e", *row))) for row in matrix]
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""Benchmark training and generation throughput across engines, model sizes and datasets.
+
+For every language and N_EMBDxN_LAYERxBLOCK_SIZE configuration:
+- training, per engine (ko_main.ENGINES): steps/sec, tokens/sec (predicted
+  tokens), per-step time percentiles and the final loss; the value engine also
+  reports the Value nodes allocated per step, counted by replaying its first
+  batches with a counting Value.__init__ so the timed run is unaffected.
+- generation, per inference engine (ko_main.INFERENCE_ENGINES) on the model
+  just trained (with its layer-0 table): names/sec and tokens/sec from
+  inference(), and per-token latency from stream_name().
+
+Each case runs in its own spawned process, so its peak RSS is its own. Results
+are printed as a table or, with --json / --output, as JSON to compare across
+versions.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import multiprocessing
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+MODEL_ROOT = Path(__file__).resolve().parents[1]
+if str(MODEL_ROOT) not in sys.path:
+    sys.path.insert(0, str(MODEL_ROOT))
+
+import layer0_table  # noqa: E402
+from ko_main import (  # noqa: E402
+    ENGINES,
+    INFERENCE_ENGINES,
+    N_HEAD,
+    RANDOM_SEED,
+    Value,
+    ValueEngine,
+    build_tokenizer,
+    inference,
+    init_model,
+    load_dataset,
+    stream_name,
+    to_float_state_dict,
+    train,
+)
+from languages import LANGUAGES  # noqa: E402
+from observers import TrainingObserver  # noqa: E402
+from optim import FlatParams  # noqa: E402
+
+CONFIGS = ("16x1x16", "32x1x16", "16x2x16", "16x1x8")
+TRAIN_STEPS = 20
+TRAIN_BATCH_SIZE = 1
+NODE_COUNT_STEPS = 5
+GENERATE_SAMPLES = 100
+LATENCY_NAMES = 10
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+def parse_config(text: str) -> dict[str, int]:
+    """"32x2x16" -> the ko_main config dict with n_embd=32, n_layer=2, block_size=16."""
+    try:
+        n_embd, n_layer, block_size = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Config {text!r} is not N_EMBDxN_LAYERxBLOCK_SIZE, e.g. 16x1x16") from None
+    if min(n_embd, n_layer, block_size) <= 0:
+        raise ValueError(f"Config {text!r} has a non-positive size")
+    if n_embd % N_HEAD != 0:
+        raise ValueError(f"Config {text!r}: n_embd must be divisible by n_head ({N_HEAD})")
+    return {"n_layer": n_layer, "n_embd": n_embd, "block_size": block_size, "n_head": N_HEAD}
+
+
+def peak_rss_bytes() -> int:
+    # Linux carries ru_maxrss across fork+exec, so a spawned worker would report at least the parent's peak;
+    # VmHWM belongs to the process's own address space.
+    with contextlib.suppress(OSError):
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # ru_maxrss is in KiB on Linux
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+class StepTimer(TrainingObserver):
+    """Wall time, predicted tokens and loss of every train() step."""
+
+    def __init__(self, tokenizer: dict[str, Any], block_size: int) -> None:
+        self.tokenizer = tokenizer
+        self.block_size = block_size
+        self.step_seconds: list[float] = []
+        self.sequences: list[list[list[int]]] = []
+        self.loss = float("nan")
+
+    def on_train_begin(self, run) -> None:
+        self.last = time.perf_counter()
+
+    def on_gradients(self, run, step, batch, loss, lr_t) -> None:
+        # The same sequences train() built for this step, for the tokens/sec count and the node-count replay.
+        bos, stoi = self.tokenizer["BOS"], self.tokenizer["stoi"]
+        sequences = []
+        for doc in batch:
+            tokens = [bos] + [stoi[ch] for ch in doc] + [bos]
+            sequences.append(tokens[: min(self.block_size, len(tokens) - 1) + 1])
+        self.sequences.append(sequences)
+        self.loss = loss
+
+    def on_step_end(self, run, step) -> None:
+        now = time.perf_counter()
+        self.step_seconds.append(now - self.last)
+        self.last = now
+
+
+@contextlib.contextmanager
+def count_values():
+    """Count Value objects created inside the block (yields a one-element list)."""
+    counter = [0]
+    original_init = Value.__init__
+
+    def counting_init(self, *args, **kwargs):
+        counter[0] += 1
+        original_init(self, *args, **kwargs)
+
+    Value.__init__ = counting_init
+    try:
+        yield counter
+    finally:
+        Value.__init__ = original_init
+
+
+def value_nodes_per_step(state_dict, config: dict[str, int], batches: list[list[list[int]]]) -> float:
+    engine = ValueEngine(FlatParams.from_state_dict(state_dict), config)
+    with count_values() as counter:
+        for sequences in batches:
+            engine.forward_backward(sequences)
+    return counter[0] / len(batches)
+
+
+def train_case(lang: str, config: dict[str, int], engine: str, steps: int, batch_size: int) -> tuple[dict, dict]:
+    """Train from scratch for ``steps`` steps; returns the report and a checkpoint of the trained model."""
+    spec = LANGUAGES[lang]
+    with contextlib.redirect_stdout(io.StringIO()):
+        random.seed(RANDOM_SEED)
+        docs, dataset_names = load_dataset(spec.data_path, spec.pattern, spec.normalization, spec.lowercase)
+        tokenizer = build_tokenizer(docs)
+        state_dict, params = init_model(tokenizer["vocab_size"], config)
+        baseline_rss = peak_rss_bytes()
+        timer = StepTimer(tokenizer, config["block_size"])
+        train(
+            docs,
+            tokenizer,
+            state_dict,
+            params,
+            config,
+            num_steps=steps,
+            engine=engine,
+            batch_size=batch_size,
+            observers=[timer],
+        )
+    peak_rss = peak_rss_bytes()
+
+    seconds = sum(timer.step_seconds)
+    tokens = sum(len(tokens) - 1 for sequences in timer.sequences for tokens in sequences)
+    report = {
+        "lang": lang,
+        **config,
+        "engine": engine,
+        "batch_size": batch_size,
+        "num_params": len(params),
+        "steps": steps,
+        "tokens": tokens,
+        "seconds": seconds,
+        "steps_per_sec": steps / seconds,
+        "tokens_per_sec": tokens / seconds,
+        "step_ms_p50": 1000 * _percentile(timer.step_seconds, 50),
+        "step_ms_p99": 1000 * _percentile(timer.step_seconds, 99),
+        "final_loss": timer.loss,
+        "value_nodes_per_step": None,
+        "value_nodes_per_token": None,
+        "baseline_rss_bytes": baseline_rss,
+        "peak_rss_bytes": peak_rss,
+    }
+    if engine == "value":
+        replayed = timer.sequences[:NODE_COUNT_STEPS]
+        nodes = value_nodes_per_step(state_dict, config, replayed)
+        replayed_tokens = sum(len(tokens) - 1 for sequences in replayed for tokens in sequences)
+        report["value_nodes_per_step"] = nodes
+        report["value_nodes_per_token"] = nodes * len(replayed) / replayed_tokens
+
+    float_state_dict = to_float_state_dict(state_dict)
+    checkpoint = {
+        "config": config,
+        "tokenizer": {key: tokenizer[key] for key in ("uchars", "BOS", "vocab_size")},
+        "state_dict": float_state_dict,
+        "dataset_names": sorted(dataset_names),
+        "layer0_table": layer0_table.build(float_state_dict, config),
+    }
+    return report, checkpoint
+
+
+def generate_case(lang: str, checkpoint: dict, engine: str, samples: int, latency_names: int) -> dict:
+    config = checkpoint["config"]
+    baseline_rss = peak_rss_bytes()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        results = inference(checkpoint, num_samples=samples, seed=RANDOM_SEED, engine=engine)
+        seconds = time.perf_counter() - start
+    # Every name ends in BOS unless it ran into block_size tokens.
+    tokens = sum(min(len(result["jamo_text"]) + 1, config["block_size"]) for result in results)
+
+    first_token, token_seconds = [], []
+    for index in range(latency_names):
+        last = time.perf_counter()
+        for event_index, _ in enumerate(stream_name(checkpoint, seed=RANDOM_SEED + index, engine=engine)):
+            now = time.perf_counter()
+            (first_token if event_index == 0 else token_seconds).append(now - last)
+            last = now
+
+    return {
+        "lang": lang,
+        **config,
+        "engine": engine,
+        "names": len(results),
+        "tokens": tokens,
+        "seconds": seconds,
+        "names_per_sec": len(results) / seconds,
+        "tokens_per_sec": tokens / seconds,
+        # The first event includes stream_name() setup (e.g. the Value state_dict for the value engine).
+        "first_token_ms": 1000 * sum(first_token) / len(first_token) if first_token else None,
+        "token_ms_mean": 1000 * sum(token_seconds) / len(token_seconds) if token_seconds else None,
+        "token_ms_p50": 1000 * _percentile(token_seconds, 50) if token_seconds else None,
+        "token_ms_p99": 1000 * _percentile(token_seconds, 99) if token_seconds else None,
+        "baseline_rss_bytes": baseline_rss,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def _isolated(fn, *args):
+    # A fresh spawned process per case, since the peak RSS of a process only ever grows.
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(fn, *args).result()
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=MODEL_ROOT, capture_output=True, text=True, check=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_benchmarks(
+    langs: list[str],
+    configs: list[str],
+    train_engines: list[str],
+    inference_engines: list[str],
+    steps: int = TRAIN_STEPS,
+    batch_size: int = TRAIN_BATCH_SIZE,
+    samples: int = GENERATE_SAMPLES,
+    latency_names: int = LATENCY_NAMES,
+) -> dict:
+    if steps <= 0 or batch_size <= 0 or samples <= 0 or latency_names < 0:
+        raise ValueError("steps, batch_size and samples must be > 0, latency_names >= 0")
+    if not train_engines:
+        raise ValueError("at least one training engine is needed to train the benchmarked models")
+    parsed = [(text, parse_config(text)) for text in configs]
+
+    training, generation = [], []
+    for lang in langs:
+        for text, config in parsed:
+            checkpoint = None
+            for engine in train_engines:
+                print(f"[{lang} {text}] train {engine}", file=sys.stderr)
+                report, trained = _isolated(train_case, lang, config, engine, steps, batch_size)
+                training.append(report)
+                # Generation runs on the model trained by the first engine listed.
+                checkpoint = checkpoint or trained
+            for engine in inference_engines:
+                print(f"[{lang} {text}] generate {engine}", file=sys.stderr)
+                generation.append(_isolated(generate_case, lang, checkpoint, engine, samples, latency_names))
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": importlib.import_module("numpy").__version__ if HAS_NUMPY else None,
+        "settings": {
+            "seed": RANDOM_SEED,
+            "steps": steps,
+            "batch_size": batch_size,
+            "samples": samples,
+            "latency_names": latency_names,
+            "node_count_steps": NODE_COUNT_STEPS,
+        },
+        "training": training,
+        "generation": generation,
+    }
+
+
+def _print_table(results: dict) -> None:
+    print(f"{'training':<26s} {'steps/s':>9s} {'tokens/s':>10s} {'nodes/step':>11s} {'loss':>7s} {'peak RSS':>9s}")
+    for row in results["training"]:
+        nodes = row["value_nodes_per_step"]
+        print(
+            f"{row['lang']} {row['n_embd']}x{row['n_layer']}x{row['block_size']:<9} {row['engine']:<6s} "
+            f"{row['steps_per_sec']:9.2f} {row['tokens_per_sec']:10.1f} "
+            f"{'-' if nodes is None else f'{nodes:.0f}':>11s} {row['final_loss']:7.4f} "
+            f"{row['peak_rss_bytes'] / 2**20:7.1f}MB"
+        )
+    print(f"\n{'generation':<26s} {'names/s':>9s} {'tokens/s':>10s} {'ms/token':>9s} {'p99':>7s} {'peak RSS':>9s}")
+    for row in results["generation"]:
+        mean, p99 = row["token_ms_mean"], row["token_ms_p99"]
+        print(
+            f"{row['lang']} {row['n_embd']}x{row['n_layer']}x{row['block_size']:<9} {row['engine']:<6s} "
+            f"{row['names_per_sec']:9.1f} {row['tokens_per_sec']:10.1f} "
+            f"{'-' if mean is None else f'{mean:.3f}':>9s} {'-' if p99 is None else f'{p99:.3f}':>7s} "
+            f"{row['peak_rss_bytes'] / 2**20:7.1f}MB"
+        )
+
+
+def main(
+    langs: list[str] | None = None,
+    configs: list[str] | None = None,
+    train_engines: list[str] | None = None,
+    inference_engines: list[str] | None = None,
+    steps: int = TRAIN_STEPS,
+    batch_size: int = TRAIN_BATCH_SIZE,
+    samples: int = GENERATE_SAMPLES,
+    latency_names: int = LATENCY_NAMES,
+    output: Path | None = None,
+    as_json: bool = False,
+) -> dict:
+    default_train = [engine for engine in ENGINES if engine != "numpy" or HAS_NUMPY]
+    default_inference = [engine for engine in INFERENCE_ENGINES if engine != "numpy" or HAS_NUMPY]
+    results = run_benchmarks(
+        langs or sorted(LANGUAGES),
+        configs or list(CONFIGS),
+        train_engines or default_train,
+        inference_engines or default_inference,
+        steps,
+        batch_size,
+        samples,
+        latency_names,
+    )
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"wrote {output}", file=sys.stderr)
+    if as_json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+    return results
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--lang", action="append", choices=sorted(LANGUAGES), help="Dataset language (repeatable; default: all)."
+    )
+    parser.add_argument(
+        "--config",
+        action="append",
+        metavar="N_EMBDxN_LAYERxBLOCK_SIZE",
+        help=f"Model size (repeatable; default: {' '.join(CONFIGS)}).",
+    )
+    parser.add_argument(
+        "--engine", action="append", choices=ENGINES, help="Training engine (repeatable; default: all available)."
+    )
+    parser.add_argument(
+        "--inference-engine",
+        action="append",
+        choices=INFERENCE_ENGINES,
+        help="Generation engine (repeatable; default: all available).",
+    )
+    parser.add_argument("--steps", type=int, default=TRAIN_STEPS, help="Training steps per case.")
+    parser.add_argument("--batch-size", type=int, default=TRAIN_BATCH_SIZE, help="Training batch size.")
+    parser.add_argument("--samples", type=int, default=GENERATE_SAMPLES, help="Names generated per case.")
+    parser.add_argument(
+        "--latency-names", type=int, default=LATENCY_NAMES, help="Names streamed per case for per-token latency."
+    )
+    parser.add_argument("--output", type=Path, help="Also write the JSON results to this file.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(
+        args.lang,
+        args.config,
+        args.engine,
+        args.inference_engine,
+        args.steps,
+        args.batch_size,
+        args.samples,
+        args.latency_names,
+        args.output,
+        args.json,
+    )
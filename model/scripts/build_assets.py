@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Build model checkpoints and frontend assets for every language in one command.
+
+Outputs, per language in model/languages.py:
+- model/checkpoints/<lang>_model.bin
+- app/public/data/<lang>_name.txt
+- app/public/data/<lang>_embedding_snapshot.json
+- app/public/data/<lang>_training_trace/ (manifest.json + chunk_*.bin)
+
+Languages build concurrently in a process pool. Each language trains once and
+writes all of its assets from that run; assets whose inputs are unchanged
+come from the build cache instead.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import time
+import unicodedata
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+MODEL_ROOT = Path(__file__).resolve().parents[1]
+if str(MODEL_ROOT) not in sys.path:
+    sys.path.insert(0, str(MODEL_ROOT))
+
+import name_index  # noqa: E402
+from build_cache import BuildCache, Stage, build, cache_key, source_digest  # noqa: E402
+from export_embedding_snapshot import export_embedding_snapshot  # noqa: E402
+from ko_main import (  # noqa: E402
+    BATCH_SIZE,
+    ENGINE,
+    ENGINES,
+    RANDOM_SEED,
+    TRAIN_WORKERS,
+    build_config,
+    build_tokenizer,
+    init_model,
+    load_checkpoint,
+    load_dataset,
+    save,
+    train,
+    training_cache_inputs,
+)
+from languages import LANGUAGES, LanguageSpec  # noqa: E402
+from observers import CheckpointObserver, SnapshotObserver, TraceObserver  # noqa: E402
+from trace_format import TRACE_FORMATS, trace_output_path  # noqa: E402
+
+STEP_OPTIONS = [50, 100, 500, 1000]
+ROUND_DIGITS = 4
+ASSETS = ("checkpoint", "snapshot", "trace")
+TRACE_SOURCES = [MODEL_ROOT / "observers.py", MODEL_ROOT / "trace_format.py", MODEL_ROOT / "languages.py"]
+SNAPSHOT_SOURCES = [MODEL_ROOT / "scripts" / "export_embedding_snapshot.py"]
+
+
+def ensure_dataset(spec: LanguageSpec) -> None:
+    if spec.data_path.exists() or spec.data_url is None:
+        return
+    spec.data_path.parent.mkdir(parents=True, exist_ok=True)
+    print(f"Downloading dataset: {spec.data_url}")
+    urllib.request.urlretrieve(spec.data_url, spec.data_path)
+
+
+def _nfc_word(doc: str) -> str:
+    return unicodedata.normalize("NFC", doc)
+
+
+def build_trace_observer(
+    spec: LanguageSpec,
+    tokenizer: dict[str, Any],
+    config: dict[str, Any],
+    trace_format: str = "chunked",
+) -> TraceObserver:
+    n_embd = int(config.get("n_embd", 0))
+    if n_embd != 16:
+        raise ValueError(f"Expected n_embd == 16, got {n_embd}")
+    return TraceObserver(
+        spec.trace_path,
+        spec.parameter_options(tokenizer),
+        STEP_OPTIONS,
+        ROUND_DIGITS,
+        trace_format=trace_format,
+        word=_nfc_word,
+    )
+
+
+def language_stages(
+    spec: LanguageSpec,
+    tokenizer: dict[str, Any],
+    config: dict[str, Any],
+    dataset_names: set[str],
+    training: dict[str, Any],
+    trace_format: str = "chunked",
+    assets: tuple[str, ...] = ASSETS,
+) -> list[Stage]:
+    training_key = cache_key(training)
+    stages = []
+    if "checkpoint" in assets:
+        saver = CheckpointObserver(spec.checkpoint_path, dataset_names, save)
+        outputs = [spec.checkpoint_path, name_index.index_path(spec.checkpoint_path)]
+        stages.append(Stage(f"{spec.name}_checkpoint", training, outputs, saver))
+    if "snapshot" in assets:
+        # Exported from the trained weights when training runs anyway, otherwise
+        # from the (cached) checkpoint without retraining. The export rounds to the
+        # checkpoint's float32, so both give the same file.
+        stages.append(
+            Stage(
+                f"{spec.name}_snapshot",
+                {"training": training_key, "sources": source_digest(SNAPSHOT_SOURCES)},
+                [spec.snapshot_path],
+                SnapshotObserver(spec.snapshot_path, export_embedding_snapshot),
+                rebuild=lambda: export_embedding_snapshot(load_checkpoint(spec.checkpoint_path), spec.snapshot_path),
+            )
+        )
+    if "trace" in assets:
+        trace = build_trace_observer(spec, tokenizer, config, trace_format)
+        trace_inputs = {
+            "training": training_key,
+            "trace_format": trace_format,
+            "parameter_options": trace.parameter_options,
+            "step_options": STEP_OPTIONS,
+            "round_digits": ROUND_DIGITS,
+            "sources": source_digest(TRACE_SOURCES),
+        }
+        stages.append(
+            Stage(f"{spec.name}_trace", trace_inputs, [trace_output_path(trace_format, spec.trace_path)], trace)
+        )
+    return stages
+
+
+def build_language(
+    spec: LanguageSpec,
+    engine: str = ENGINE,
+    trace_format: str = "chunked",
+    use_cache: bool = True,
+    assets: tuple[str, ...] = ASSETS,
+    sync_dataset: bool = True,
+) -> dict[str, float]:
+    """Build one language's assets; returns wall time per stage in seconds."""
+    timings: dict[str, float] = {}
+    start = time.perf_counter()
+    ensure_dataset(spec)
+    random.seed(RANDOM_SEED)
+    docs, dataset_names = load_dataset(spec.data_path, spec.pattern, spec.normalization, spec.lowercase)
+    tokenizer = build_tokenizer(docs)
+    config = build_config()
+    state_dict, params = init_model(tokenizer["vocab_size"], config)
+    training = training_cache_inputs(
+        config,
+        engine=engine,
+        batch_size=BATCH_SIZE,
+        workers=TRAIN_WORKERS,
+        data_path=spec.data_path,
+        pattern=spec.pattern,
+        normalization=spec.normalization,
+        lowercase=spec.lowercase,
+    )
+    stages = language_stages(spec, tokenizer, config, dataset_names, training, trace_format, assets)
+    timings["load"] = time.perf_counter() - start
+
+    build(
+        BuildCache(enabled=use_cache),
+        stages,
+        lambda observers: train(
+            docs,
+            tokenizer,
+            state_dict,
+            params,
+            config,
+            engine=engine,
+            batch_size=BATCH_SIZE,
+            workers=TRAIN_WORKERS,
+            observers=observers,
+        ),
+        timings,
+    )
+
+    if sync_dataset:
+        start = time.perf_counter()
+        spec.app_dataset_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(spec.data_path, spec.app_dataset_path)
+        print(f"Synced dataset: {spec.app_dataset_path}")
+        timings["sync_dataset"] = time.perf_counter() - start
+    return timings
+
+
+def print_timings(results: dict[str, dict[str, float]], wall: float) -> None:
+    print("Stage timings (s):")
+    for language, timings in results.items():
+        for stage, seconds in timings.items():
+            print(f"  {language:>4s}  {stage:<16s} {seconds:8.2f}")
+        print(f"  {language:>4s}  {'total':<16s} {sum(timings.values()):8.2f}")
+    print(f"  wall time: {wall:.2f}")
+
+
+def main(
+    languages: list[str],
+    engine: str = ENGINE,
+    trace_format: str = "chunked",
+    use_cache: bool = True,
+    jobs: int | None = None,
+) -> dict[str, dict[str, float]]:
+    specs = [LANGUAGES[name] for name in languages]
+    jobs = min(len(specs), os.cpu_count() or 1) if jobs is None else jobs
+    if jobs <= 0:
+        raise ValueError("jobs must be > 0")
+
+    start = time.perf_counter()
+    if jobs == 1 or len(specs) == 1:
+        timings = [build_language(spec, engine, trace_format, use_cache) for spec in specs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(specs))) as executor:
+            futures = [executor.submit(build_language, spec, engine, trace_format, use_cache) for spec in specs]
+            timings = [future.result() for future in futures]
+    results = {spec.name: spec_timings for spec, spec_timings in zip(specs, timings)}
+    print_timings(results, time.perf_counter() - start)
+    return results
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--lang", nargs="+", choices=sorted(LANGUAGES), default=list(LANGUAGES), help="Languages to build (default: all)."
+    )
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINE, help="Autograd engine used for training.")
+    parser.add_argument(
+        "--format",
+        choices=TRACE_FORMATS,
+        default="chunked",
+        help="chunked: manifest + step-range binary chunks (what the app loads); json: single indent=2 JSON file.",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Retrain and re-export even if the build cache has them.")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: one per language, up to the CPU count).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args.lang, engine=args.engine, trace_format=args.format, use_cache=not args.no_cache, jobs=args.jobs)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Convert legacy pickle checkpoints to the memory-mapped binary format.
+
+By default converts model/checkpoints/ko_model.pkl and en_model.pkl into
+ko_model.bin and en_model.bin (plus their ko_model.names / en_model.names
+name indexes) next to them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import pickle
+import sys
+from pathlib import Path
+from typing import Any
+
+MODEL_ROOT = Path(__file__).resolve().parents[1]
+if str(MODEL_ROOT) not in sys.path:
+    sys.path.insert(0, str(MODEL_ROOT))
+
+import checkpoint_format  # noqa: E402
+
+DEFAULT_INPUTS = [
+    MODEL_ROOT / "checkpoints" / "ko_model.pkl",
+    MODEL_ROOT / "checkpoints" / "en_model.pkl",
+]
+
+
+def _load_pickle_checkpoint(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        raise FileNotFoundError(f"Checkpoint not found: {path.resolve()}")
+    with path.open("rb") as handle:
+        checkpoint = pickle.load(handle)
+    for key in ("config", "tokenizer", "state_dict"):
+        if key not in checkpoint:
+            raise ValueError(f"Invalid checkpoint format: missing key '{key}'.")
+    return checkpoint
+
+
+def convert(input_path: Path, output_path: Path) -> None:
+    checkpoint = _load_pickle_checkpoint(input_path)
+    checkpoint_format.save(
+        output_path,
+        checkpoint["config"],
+        checkpoint["tokenizer"],
+        checkpoint["state_dict"],
+        checkpoint.get("dataset_names", []),
+    )
+
+    # Round-trip check: float32 storage should only cost rounding error.
+    converted = checkpoint_format.load(output_path)
+    max_error = 0.0
+    for name, matrix in checkpoint["state_dict"].items():
+        for row, converted_row in zip(matrix, converted["state_dict"][name]):
+            for value, converted_value in zip(row, converted_row):
+                max_error = max(max_error, abs(float(value) - converted_value))
+    names = checkpoint.get("dataset_names", [])
+    index = converted["name_index"]
+    if len(index or ()) != len(set(names)) or not all(name in index for name in names):
+        raise ValueError(f"Dataset names did not round-trip for {input_path}")
+
+    index_size = index.path.stat().st_size if index else 0
+    print(
+        f"converted {input_path.name} -> {output_path.name}: "
+        f"{input_path.stat().st_size} -> {output_path.stat().st_size} bytes "
+        f"(+ {index_size} bytes name index), max float32 error {max_error:.2e}"
+    )
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", type=Path, default=DEFAULT_INPUTS, help="Pickle checkpoints to convert.")
+    return parser.parse_args()
+
+
+def main(inputs: list[Path]) -> None:
+    for input_path in inputs:
+        convert(input_path, input_path.with_suffix(".bin"))
+
+
+if __name__ == "__main__":
+    main(_parse_args().inputs)
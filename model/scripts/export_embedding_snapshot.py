@@ -1,18 +1,46 @@
 #!/usr/bin/env python3
-"""Export embedding snapshot JSON for frontend Chapter 3/4 visualization."""
+"""Export embedding snapshot JSON for frontend Chapter 3/4 visualization.
+
+Reads model/checkpoints/<lang>_model.bin (--lang, default ko) and writes
+app/public/data/<lang>_embedding_snapshot.json.
+
+Weights are written at the precision of the binary checkpoint: rounded to
+float32 and written with the 9 significant digits that identify a float32, so
+the snapshot is the same whether it comes from the trained weights or from
+the saved checkpoint, and this script reproduces the one build_assets.py
+ships. With --float16, weights are rounded to float16 and written with the 5
+significant digits that identify a float16, for a smaller file.
+"""
 
 from __future__ import annotations
 
+import argparse
 import json
-import pickle
+import sys
+from array import array
 from pathlib import Path
 from typing import Any
 
+MODEL_ROOT = Path(__file__).resolve().parents[1]
+if str(MODEL_ROOT) not in sys.path:
+    sys.path.insert(0, str(MODEL_ROOT))
+
+from ko_main import load_checkpoint  # noqa: E402
+from languages import LANGUAGES  # noqa: E402
+from quantize import round_float16  # noqa: E402
 
-def _to_float_matrix(matrix: list[list[Any]]) -> list[list[float]]:
+DEFAULT_OUTPUT_PATH = MODEL_ROOT.parent / "app" / "public" / "data" / "ko_embedding_snapshot.json"
+
+
+def _to_float_matrix(matrix: list[list[Any]], float16: bool = False) -> list[list[float]]:
     converted: list[list[float]] = []
     for row in matrix:
-        converted.append([float(getattr(value, "data", value)) for value in row])
+        floats = [float(getattr(value, "data", value)) for value in row]
+        if float16:
+            floats = [float(f"{value:.5g}") for value in round_float16([floats])[0]]
+        else:
+            floats = [float(f"{value:.9g}") for value in array("f", floats)]
+        converted.append(floats)
     return converted
 
 
@@ -31,18 +59,9 @@ def _validate_matrix_shape(matrix: Any, expected_rows: int, expected_cols: int,
     return matrix
 
 
-def main() -> None:
-    model_root = Path(__file__).resolve().parents[1]
-    repo_root = model_root.parent
-    checkpoint_path = model_root / "checkpoints" / "ko_model.pkl"
-    output_path = repo_root / "app" / "public" / "data" / "ko_embedding_snapshot.json"
-
-    if not checkpoint_path.exists():
-        raise FileNotFoundError(f"Checkpoint not found: {checkpoint_path}")
-
-    with checkpoint_path.open("rb") as handle:
-        checkpoint = pickle.load(handle)
-
+def export_embedding_snapshot(
+    checkpoint: dict[str, Any], output_path: Path = DEFAULT_OUTPUT_PATH, float16: bool = False
+) -> None:
     config = checkpoint.get("config", {})
     tokenizer = checkpoint.get("tokenizer", {})
     state_dict = checkpoint.get("state_dict", {})
@@ -93,24 +112,24 @@ def main() -> None:
             "uchars": uchars,
             "bos": bos,
         },
-        "wte": _to_float_matrix(wte),
-        "wpe": _to_float_matrix(wpe),
+        "wte": _to_float_matrix(wte, float16),
+        "wpe": _to_float_matrix(wpe, float16),
         "attention": {
             "layer_index": 0,
             "head_index": 0,
             "n_head": n_head,
             "head_dim": head_dim,
-            "attn_wq": _to_float_matrix(attn_wq),
-            "attn_wk": _to_float_matrix(attn_wk),
-            "attn_wv": _to_float_matrix(attn_wv),
-            "attn_wo": _to_float_matrix(attn_wo),
+            "attn_wq": _to_float_matrix(attn_wq, float16),
+            "attn_wk": _to_float_matrix(attn_wk, float16),
+            "attn_wv": _to_float_matrix(attn_wv, float16),
+            "attn_wo": _to_float_matrix(attn_wo, float16),
         },
         "mlp": {
             "layer_index": 0,
-            "mlp_fc1": _to_float_matrix(mlp_fc1),
-            "mlp_fc2": _to_float_matrix(mlp_fc2),
+            "mlp_fc1": _to_float_matrix(mlp_fc1, float16),
+            "mlp_fc2": _to_float_matrix(mlp_fc2, float16),
         },
-        "lm_head": _to_float_matrix(lm_head),
+        "lm_head": _to_float_matrix(lm_head, float16),
     }
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -138,5 +157,18 @@ def main() -> None:
     )
 
 
+def main(lang: str = "ko", float16: bool = False) -> None:
+    spec = LANGUAGES[lang]
+    export_embedding_snapshot(load_checkpoint(spec.checkpoint_path), spec.snapshot_path, float16)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lang", choices=sorted(LANGUAGES), default="ko", help="Checkpoint language.")
+    parser.add_argument("--float16", action="store_true", help="Round weights to float16 for a smaller file.")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    main()
+    args = _parse_args()
+    main(args.lang, args.float16)
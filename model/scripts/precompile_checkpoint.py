@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Precompute the layer-0 lookup table of binary checkpoints.
+
+By default updates model/checkpoints/ko_model.bin and en_model.bin in place.
+The table (layer0_table.py: normalized embeddings and layer-0 Q/K/V per
+(token, position), float32) is stored after the weights; the float and numpy
+inference engines use it automatically. It is opt-in: training, conversion and
+quantization write checkpoints without it, and this script is the only writer.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+MODEL_ROOT = Path(__file__).resolve().parents[1]
+if str(MODEL_ROOT) not in sys.path:
+    sys.path.insert(0, str(MODEL_ROOT))
+
+import checkpoint_format  # noqa: E402
+import float_engine  # noqa: E402
+
+TOLERANCE = 1e-5
+DEFAULT_INPUTS = [
+    MODEL_ROOT / "checkpoints" / "ko_model.bin",
+    MODEL_ROOT / "checkpoints" / "en_model.bin",
+]
+
+
+def precompile(path: Path) -> None:
+    before = path.stat().st_size
+    start = time.perf_counter()
+    checkpoint_format.add_layer0_table(path)
+    elapsed = time.perf_counter() - start
+
+    # Every (token, position) pair must give the same logits with and without the table, up to float32 rounding.
+    checkpoint = checkpoint_format.load(path)
+    state_dict, config, table = checkpoint["state_dict"], checkpoint["config"], checkpoint["layer0_table"]
+    n_layer = config["n_layer"]
+    for token_id in range(checkpoint["tokenizer"]["vocab_size"]):
+        keys, values = [[] for _ in range(n_layer)], [[] for _ in range(n_layer)]
+        table_keys, table_values = [[] for _ in range(n_layer)], [[] for _ in range(n_layer)]
+        for pos_id in range(config["block_size"]):
+            logits = float_engine.gpt(token_id, pos_id, keys, values, state_dict, config)
+            table_logits = float_engine.gpt(token_id, pos_id, table_keys, table_values, state_dict, config, table)
+            if max(abs(a - b) for a, b in zip(logits, table_logits)) > TOLERANCE * max(1.0, max(map(abs, logits))):
+                raise ValueError(f"Layer-0 table of {path} disagrees at token {token_id}, position {pos_id}")
+
+    print(f"{path.name}: {before} -> {path.stat().st_size} bytes with layer-0 table ({elapsed:.2f}s)")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", type=Path, default=DEFAULT_INPUTS, help="Binary checkpoints to update.")
+    return parser.parse_args()
+
+
+def main(inputs: list[Path]) -> None:
+    for path in inputs:
+        precompile(path)
+
+
+if __name__ == "__main__":
+    main(_parse_args().inputs)
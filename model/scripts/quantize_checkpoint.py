@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Write int8 / float16 quantized checkpoints and report their calibration.
+
+For each language and dtype, stores wte, lm_head and the layer matrices
+quantized (quantize.py) in <lang>_model.<dtype>.bin next to the original, then
+scores every training name under both checkpoints with numpy_inference.score().
+The quantized checkpoints share the original's <lang>_model.names index rather
+than writing a copy each. The report gives the mean log-likelihood per name and
+per token, its shift under quantization, the size of the weights, and the size
+of the files (checkpoint plus the name index it loads).
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import sys
+from pathlib import Path
+
+MODEL_ROOT = Path(__file__).resolve().parents[1]
+if str(MODEL_ROOT) not in sys.path:
+    sys.path.insert(0, str(MODEL_ROOT))
+
+import checkpoint_format  # noqa: E402
+import name_index  # noqa: E402
+from ko_main import load_checkpoint, load_dataset  # noqa: E402
+from languages import LANGUAGES  # noqa: E402
+from numpy_inference import NumpyModel, score  # noqa: E402
+from quantize import QUANT_DTYPES  # noqa: E402
+
+_ITEMSIZES = {"float32": 4, "float64": 8, "float16": 2, "int8": 1}
+
+
+def weight_bytes(path: Path) -> int:
+    """Bytes of the model tensors in a binary checkpoint (header and layer-0 table excluded)."""
+    total = 0
+    for entry in checkpoint_format.read_header(path)["tensors"].values():
+        rows, cols = entry["shape"]
+        total += rows * cols * _ITEMSIZES[entry.get("dtype", "float32")]
+        if "scale_offset" in entry:
+            total += 4 * rows
+    return total
+
+
+def _token_ids(docs: list[str], uchars: list[str], block_size: int) -> list[list[int]]:
+    # Like training, names longer than block_size are scored on their first block_size tokens.
+    stoi = {ch: i for i, ch in enumerate(uchars)}
+    return [[stoi[ch] for ch in doc][:block_size] for doc in docs]
+
+
+def calibrate(lang: str, dtype: str) -> dict:
+    spec = LANGUAGES[lang]
+    checkpoint = load_checkpoint(spec.checkpoint_path)
+    output_path = spec.checkpoint_path.with_name(f"{lang}_model.{dtype}.bin")
+    names = checkpoint.get("name_index")
+    index_path = name_index.index_path(spec.checkpoint_path)
+    checkpoint_format.save(
+        output_path,
+        checkpoint["config"],
+        checkpoint["tokenizer"],
+        checkpoint["state_dict"],
+        names or (),
+        quantization=dtype,
+        index_file=index_path.name,
+    )
+    # Copies of the index written by earlier versions of this script.
+    name_index.index_path(output_path).unlink(missing_ok=True)
+    quantized = load_checkpoint(output_path)
+
+    docs, _ = load_dataset(spec.data_path, spec.pattern, spec.normalization, spec.lowercase)
+    bos = checkpoint["tokenizer"]["BOS"]
+    sequences = _token_ids(docs, checkpoint["tokenizer"]["uchars"], checkpoint["config"]["block_size"])
+    num_tokens = sum(len(sequence) + 1 for sequence in sequences)
+    base = score(NumpyModel(checkpoint["state_dict"], checkpoint["config"]), bos, sequences)
+    shifted = score(NumpyModel(quantized["state_dict"], quantized["config"]), bos, sequences)
+    return {
+        "lang": lang,
+        "dtype": dtype,
+        "path": str(output_path),
+        "names": len(sequences),
+        "mean_log_likelihood": float(base.mean()),
+        "quantized_mean_log_likelihood": float(shifted.mean()),
+        "shift_per_name": float((shifted - base).mean()),
+        "shift_per_token": float((shifted - base).sum() / num_tokens),
+        "max_abs_shift_per_name": float(abs(shifted - base).max()),
+        "weight_bytes": weight_bytes(spec.checkpoint_path),
+        "quantized_weight_bytes": weight_bytes(output_path),
+        "file_bytes": output_path.stat().st_size,
+        "index_bytes": index_path.stat().st_size if names else 0,
+    }
+
+
+def main(
+    langs: list[str] | None = None,
+    dtypes: list[str] | None = None,
+    as_json: bool = False,
+) -> list[dict]:
+    reports = []
+    for lang in langs or sorted(LANGUAGES):
+        for dtype in dtypes or QUANT_DTYPES:
+            # load_dataset() and save() print progress; keep stdout clean for --json.
+            with contextlib.redirect_stdout(sys.stderr if as_json else sys.stdout):
+                reports.append(calibrate(lang, dtype))
+    if as_json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print(
+                f"{report['lang']} {report['dtype']:>7s}: "
+                f"mean log-likelihood {report['mean_log_likelihood']:.4f} -> "
+                f"{report['quantized_mean_log_likelihood']:.4f} "
+                f"(shift {report['shift_per_name']:+.5f}/name, {report['shift_per_token']:+.6f}/token, "
+                f"max |shift| {report['max_abs_shift_per_name']:.4f}) | "
+                f"weights {report['weight_bytes']} -> {report['quantized_weight_bytes']} bytes, "
+                f"file {report['file_bytes']} + {report['index_bytes']} bytes shared name index"
+            )
+    return reports
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--lang", action="append", choices=sorted(LANGUAGES), help="Language (repeatable; default: all)."
+    )
+    parser.add_argument(
+        "--dtype", action="append", choices=QUANT_DTYPES, help="Quantization (repeatable; default: all)."
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args.lang, args.dtype, as_json=args.json)
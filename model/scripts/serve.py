@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Serve the ko/en checkpoints over HTTP on localhost (see inference_server.py).
+
+Loads each checkpoint once and answers POST /generate, /complete and /score,
+coalescing concurrent requests into batched forward passes. GET /stats reports
+p50/p99 latency per endpoint and queue depth.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+MODEL_ROOT = Path(__file__).resolve().parents[1]
+if str(MODEL_ROOT) not in sys.path:
+    sys.path.insert(0, str(MODEL_ROOT))
+
+from inference_server import BATCH_WINDOW, SERVER_HOST, SERVER_PORT, load_models, serve  # noqa: E402
+from languages import LANGUAGES  # noqa: E402
+
+
+def main(
+    langs: list[str] | None = None,
+    host: str = SERVER_HOST,
+    port: int = SERVER_PORT,
+    window_ms: float = BATCH_WINDOW * 1000,
+) -> None:
+    if window_ms < 0:
+        raise ValueError("window_ms must be >= 0")
+    models = load_models(langs or sorted(LANGUAGES))
+    try:
+        asyncio.run(serve(models, host, port, window_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--lang", action="append", choices=sorted(LANGUAGES), help="Language to serve (repeatable; default: all)."
+    )
+    parser.add_argument("--host", default=SERVER_HOST, help=f"Bind address (default: {SERVER_HOST}).")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help=f"Port (default: {SERVER_PORT}).")
+    parser.add_argument(
+        "--window-ms",
+        type=float,
+        default=BATCH_WINDOW * 1000,
+        help="How long a batch waits for concurrent requests (default: %(default)s).",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(args.lang, host=args.host, port=args.port, window_ms=args.window_ms)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""List a checkpoint's most likely names in exact descending probability.
+
+Uses best-first search (ko_main.top_names), not sampling, so the list and its
+probabilities are exact. Prints one name per line, or JSON with --json. For ko
+the Hangul grammar is on unless --no-hangul-grammar is given, so every name is
+made of complete syllables.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import sys
+from pathlib import Path
+
+MODEL_ROOT = Path(__file__).resolve().parents[1]
+if str(MODEL_ROOT) not in sys.path:
+    sys.path.insert(0, str(MODEL_ROOT))
+
+from ko_main import load_checkpoint, top_names  # noqa: E402
+from languages import LANGUAGES  # noqa: E402
+
+
+def main(
+    lang: str = "ko",
+    count: int = 1000,
+    min_prob: float | None = None,
+    novel_only: bool = False,
+    hangul_grammar: bool | None = None,
+    max_syllables: int | None = None,
+    as_json: bool = False,
+) -> list[dict]:
+    if count <= 0:
+        raise ValueError("count must be > 0")
+    if hangul_grammar is None:
+        hangul_grammar = lang == "ko"
+    names = list(
+        itertools.islice(
+            top_names(
+                load_checkpoint(LANGUAGES[lang].checkpoint_path),
+                min_prob=min_prob,
+                novel_only=novel_only,
+                hangul_grammar=hangul_grammar,
+                max_syllables=max_syllables,
+            ),
+            count,
+        )
+    )
+    if as_json:
+        rows = [{"name": name["ko_text"], "prob": name["prob"], "in_dataset": name["in_dataset"]} for name in names]
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        for rank, name in enumerate(names, 1):
+            print(f"{rank:5d}  {name['ko_text']:<12s} {name['prob']:.3e}  in_dataset: {name['in_dataset']}")
+    return names
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lang", choices=sorted(LANGUAGES), default="ko", help="Checkpoint language.")
+    parser.add_argument("-n", "--count", type=int, default=1000, help="Number of names to list (default: 1000).")
+    parser.add_argument("--min-prob", type=float, default=None, help="Stop at names less likely than this.")
+    parser.add_argument("--novel-only", action="store_true", help="Skip names from the training data.")
+    parser.add_argument(
+        "--hangul-grammar",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Only complete Hangul syllables (default: on for ko).",
+    )
+    parser.add_argument("--max-syllables", type=int, default=None, help="At most this many syllables (ko).")
+    parser.add_argument("--json", action="store_true", help="Print a JSON list instead of a table.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(
+        args.lang,
+        count=args.count,
+        min_prob=args.min_prob,
+        novel_only=args.novel_only,
+        hangul_grammar=args.hangul_grammar,
+        max_syllables=args.max_syllables,
+        as_json=args.json,
+    )
@@ -0,0 +1,295 @@
+"""
+Array-backed autograd tape that mirrors ko_main.Value without per-node objects.
+
+Every op is recorded as one row of flat arrays (data, grad, two child indices and
+their local grads). The node layout and the child order match the graph that
+ko_main.gpt() builds out of Value objects, and backward() walks it in the same
+depth-first order, so the accumulated gradients are bit-identical.
+"""
+
+import math
+from array import array
+
+
+class Tape:
+    __slots__ = ("size", "capacity", "data", "grad", "child0", "child1", "local0", "local1", "_zeros")
+
+    def __init__(self, capacity=1 << 16):
+        self.size = 0
+        self.capacity = 0
+        self.data = array("d")
+        self.grad = array("d")
+        self.local0 = array("d")
+        self.local1 = array("d")
+        self.child0 = array("q")
+        self.child1 = array("q")
+        self._zeros = array("d")
+        self.reserve(capacity)
+
+    def reserve(self, extra):
+        needed = self.size + extra
+        if needed <= self.capacity:
+            return
+        grow = max(needed, 2 * self.capacity) - self.capacity
+        zeros = bytes(8 * grow)
+        for buf in (self.data, self.grad, self.local0, self.local1, self.child0, self.child1, self._zeros):
+            buf.frombytes(zeros)
+        self.capacity += grow
+
+    def truncate(self, size):
+        self.size = size
+
+    def _node(self, value, a, local_a, b, local_b):
+        i = self.size
+        if i == self.capacity:
+            self.reserve(1)
+        self.data[i] = value
+        self.child0[i] = a
+        self.local0[i] = local_a
+        self.child1[i] = b
+        self.local1[i] = local_b
+        self.size = i + 1
+        return i
+
+    def leaf(self, value):
+        return self._node(value, -1, 0.0, -1, 0.0)
+
+    def add(self, a, b):
+        return self._node(self.data[a] + self.data[b], a, 1.0, b, 1.0)
+
+    def add_const(self, a, c):
+        # Value(c) constants are leaves: they never route gradient anywhere, so they
+        # are not recorded and the walk order of every other node is unchanged.
+        return self._node(self.data[a] + c, a, 1.0, -1, 0.0)
+
+    def mul(self, a, b):
+        da, db = self.data[a], self.data[b]
+        return self._node(da * db, a, db, b, da)
+
+    def mul_const(self, a, c):
+        return self._node(self.data[a] * c, a, c, -1, 0.0)
+
+    def pow(self, a, exponent):
+        x = self.data[a]
+        return self._node(x**exponent, a, exponent * x ** (exponent - 1), -1, 0.0)
+
+    def log(self, a):
+        x = self.data[a]
+        return self._node(math.log(x), a, 1 / x, -1, 0.0)
+
+    def exp(self, a):
+        x = self.data[a]
+        return self._node(math.exp(x), a, math.exp(x), -1, 0.0)
+
+    def relu(self, a):
+        x = self.data[a]
+        return self._node(max(0, x), a, float(x > 0), -1, 0.0)
+
+    def dot(self, a_ids, b_ids):
+        # Same nodes as `sum(a * b for a, b in zip(a_ids, b_ids))` on Values,
+        # including the `0 + first` node that sum() starts with.
+        self.reserve(2 * len(a_ids))
+        data, child0, child1, local0, local1 = self.data, self.child0, self.child1, self.local0, self.local1
+        i = self.size
+        acc = -1
+        for a, b in zip(a_ids, b_ids):
+            da = data[a]
+            db = data[b]
+            data[i] = da * db
+            child0[i] = a
+            local0[i] = db
+            child1[i] = b
+            local1[i] = da
+            j = i + 1
+            child0[j] = i if acc < 0 else acc
+            local0[j] = 1.0
+            if acc < 0:
+                data[j] = data[i] + 0
+                child1[j] = -1
+                local1[j] = 0.0
+            else:
+                data[j] = data[acc] + data[i]
+                child1[j] = i
+                local1[j] = 1.0
+            acc = j
+            i += 2
+        self.size = i
+        return acc
+
+    def total(self, ids):
+        acc = self.add_const(ids[0], 0)
+        for i in ids[1:]:
+            acc = self.add(acc, i)
+        return acc
+
+    def backward(self, root):
+        size = self.size
+        grad = self.grad
+        grad[:size] = self._zeros[:size]
+        child0, child1 = self.child0, self.child1
+
+        # Iterative post-order DFS, visiting children left to right exactly like
+        # the recursive build_topo() in Value.backward().
+        visited = bytearray(size)
+        topo = []
+        stack = [root]
+        while stack:
+            v = stack.pop()
+            if v < 0:
+                topo.append(~v)
+                continue
+            if visited[v]:
+                continue
+            visited[v] = 1
+            a = child0[v]
+            if a < 0:
+                topo.append(v)
+                continue
+            stack.append(~v)
+            b = child1[v]
+            if b >= 0 and not visited[b]:
+                stack.append(b)
+            if not visited[a]:
+                stack.append(a)
+
+        local0, local1 = self.local0, self.local1
+        grad[root] = 1.0
+        for v in reversed(topo):
+            g = grad[v]
+            a = child0[v]
+            if a < 0:
+                continue
+            grad[a] += local0[v] * g
+            b = child1[v]
+            if b >= 0:
+                grad[b] += local1[v] * g
+
+
+def linear(tape, x, w):
+    return [tape.dot(wo, x) for wo in w]
+
+
+def softmax(tape, logits):
+    data = tape.data
+    max_val = max(data[val] for val in logits)
+    exps = [tape.exp(tape.add_const(val, -max_val)) for val in logits]
+    total = tape.total(exps)
+    return [tape.mul(e, tape.pow(total, -1)) for e in exps]
+
+
+def softmax_at(tape, logits, index):
+    # Only probs[index] of softmax() is reachable from the loss; the other
+    # probabilities would be dead nodes on the tape.
+    data = tape.data
+    max_val = max(data[val] for val in logits)
+    exps = [tape.exp(tape.add_const(val, -max_val)) for val in logits]
+    total = tape.total(exps)
+    return tape.mul(exps[index], tape.pow(total, -1))
+
+
+def rmsnorm(tape, x):
+    ms = tape.mul_const(tape.dot(x, x), len(x) ** -1)
+    scale = tape.pow(tape.add_const(ms, 1e-5), -0.5)
+    return [tape.mul(xi, scale) for xi in x]
+
+
+def gpt(tape, token_id, pos_id, keys, values, state_ids, config):
+    n_layer = config["n_layer"]
+    n_embd = config["n_embd"]
+    n_head = config["n_head"]
+    head_dim = n_embd // n_head
+    inv_scale = (head_dim**0.5) ** -1
+
+    tok_emb = state_ids["wte"][token_id]
+    pos_emb = state_ids["wpe"][pos_id]
+    x = [tape.add(t, p) for t, p in zip(tok_emb, pos_emb)]
+    x = rmsnorm(tape, x)
+
+    for li in range(n_layer):
+        x_residual = x
+        x = rmsnorm(tape, x)
+        q = linear(tape, x, state_ids[f"layer{li}.attn_wq"])
+        k = linear(tape, x, state_ids[f"layer{li}.attn_wk"])
+        v = linear(tape, x, state_ids[f"layer{li}.attn_wv"])
+        keys[li].append(k)
+        values[li].append(v)
+
+        x_attn = []
+        for h in range(n_head):
+            hs = h * head_dim
+            q_h = q[hs : hs + head_dim]
+            k_h = [ki[hs : hs + head_dim] for ki in keys[li]]
+            v_h = [vi[hs : hs + head_dim] for vi in values[li]]
+            attn_logits = [tape.mul_const(tape.dot(q_h, k_t), inv_scale) for k_t in k_h]
+            attn_weights = softmax(tape, attn_logits)
+            head_out = [
+                tape.dot(attn_weights, [v_t[j] for v_t in v_h])
+                for j in range(head_dim)
+            ]
+            x_attn.extend(head_out)
+
+        x = linear(tape, x_attn, state_ids[f"layer{li}.attn_wo"])
+        x = [tape.add(a, b) for a, b in zip(x, x_residual)]
+
+        x_residual = x
+        x = rmsnorm(tape, x)
+        x = linear(tape, x, state_ids[f"layer{li}.mlp_fc1"])
+        x = [tape.relu(xi) for xi in x]
+        x = linear(tape, x, state_ids[f"layer{li}.mlp_fc2"])
+        x = [tape.add(a, b) for a, b in zip(x, x_residual)]
+
+    return linear(tape, x, state_ids["lm_head"])
+
+
+def doc_loss(tape, tokens, n, state_ids, config):
+    n_layer = config["n_layer"]
+    keys, values = [[] for _ in range(n_layer)], [[] for _ in range(n_layer)]
+    losses = []
+    for pos_id in range(n):
+        token_id, target_id = tokens[pos_id], tokens[pos_id + 1]
+        logits = gpt(tape, token_id, pos_id, keys, values, state_ids, config)
+        prob = softmax_at(tape, logits, target_id)
+        losses.append(tape.mul_const(tape.log(prob), -1))
+    return tape.mul_const(tape.total(losses), 1 / n)
+
+
+def batch_loss(tape, sequences, state_ids, config):
+    # A single sequence keeps the exact graph of the unbatched loss; a batch
+    # mirrors `(1 / len(batch)) * sum(doc_losses)`.
+    losses = [doc_loss(tape, tokens, len(tokens) - 1, state_ids, config) for tokens in sequences]
+    if len(losses) == 1:
+        return losses[0]
+    return tape.mul_const(tape.total(losses), 1 / len(losses))
+
+
+class TapeEngine:
+    """Computes minibatch gradients for an optim.FlatParams buffer on a reusable tape.
+
+    The first ``params.size`` tape nodes are the parameter leaves, in buffer order;
+    forward_backward() copies the buffer onto them and accumulates their
+    gradients into ``params.grad``.
+    """
+
+    def __init__(self, params, config):
+        self.params = params
+        self.config = config
+        self.tape = Tape()
+        self.state_ids = {
+            name: [[self.tape.leaf(0.0) for _ in range(cols)] for _ in range(rows)]
+            for name, (rows, cols) in params.shapes.items()
+        }
+        self.num_params = self.tape.size
+
+    def forward_backward(self, sequences):
+        tape = self.tape
+        num_params = self.num_params
+        tape.truncate(num_params)
+        tape.data[:num_params] = self.params.data
+
+        root = batch_loss(tape, sequences, self.state_ids, self.config)
+        tape.backward(root)
+
+        grad, tape_grad = self.params.grad, tape.grad
+        for i in range(num_params):
+            grad[i] += tape_grad[i]
+        return tape.data[root]
@@ -0,0 +1,259 @@
+"""
+Streaming writers for the Chapter 6 training trace.
+
+A trace is a header (num_steps, step_options, optimizer, parameter_options)
+plus one record per step:
+
+    {"step", "word", "loss", "learning_rate", "params": {id: {"grad": [...], "after": [...]}}}
+
+Writers receive records one at a time and write them out as they go, so an
+export never holds more than one chunk of steps in memory.
+
+JsonTraceWriter reproduces the original single-file ``indent=2`` JSON byte for byte.
+
+ChunkedTraceWriter writes a directory with a small ``manifest.json`` and
+fixed-size step-range chunk files. A client fetches only the chunks that
+cover the steps it displays. Chunk 0 holds steps 0..chunk_size and chunk k
+holds the next chunk_size steps. With the default size of 50, every entry of
+step_options ends on a chunk boundary.
+
+Inside a chunk every column of the row layout is one typed-array block of
+fixed-point integers (``round(x * scale)``; the exporters already round to
+1 / scale). Columns marked "delta" store an int32 base row (the chunk's first
+row) followed by per-step differences from the previous row. Every other
+column stores its values directly. Each block uses the narrowest of
+int8/int16/int32 that fits the chunk, recorded as one struct code per column
+in the manifest's ``dtypes`` string. Blocks start on 4-byte boundaries. The
+chunk's words, UTF-8 and newline-separated, follow the last block. The
+step-0 loss is always null and is stored as 0.
+"""
+
+import json
+import sys
+from array import array
+from pathlib import Path
+
+TRACE_FORMATS = ("chunked", "json")
+CHUNKED_FORMAT_VERSION = 3
+CHUNK_SIZE = 50
+
+
+def _indent(text, spaces):
+    pad = " " * spaces
+    return "\n".join(pad + line for line in text.split("\n"))
+
+
+class JsonTraceWriter:
+    def __init__(self, path, header):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = self.path.open("w", encoding="utf-8")
+        self._count = 0
+        # "steps" is the last key of the payload, so everything before it can
+        # be written up front by json itself.
+        head = json.dumps({"format_version": 1, **header}, ensure_ascii=False, indent=2)
+        self._handle.write(head[: -len("\n}")] + ',\n  "steps": [')
+
+    def write_step(self, record):
+        prefix = "\n" if self._count == 0 else ",\n"
+        self._handle.write(prefix + _indent(json.dumps(record, ensure_ascii=False, indent=2), 4))
+        self._count += 1
+
+    def close(self):
+        self._handle.write("\n  ]\n}" if self._count else "]\n}")
+        self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def trace_columns(parameter_options, row_length):
+    columns = [
+        {"name": "loss", "length": 1, "delta": False},
+        {"name": "learning_rate", "length": 1, "delta": True},
+    ]
+    for spec in parameter_options:
+        columns.append({"name": "grad", "param": spec["id"], "length": row_length, "delta": False})
+        columns.append({"name": "after", "param": spec["id"], "length": row_length, "delta": True})
+    return columns
+
+
+def _record_values(record, column):
+    if "param" in column:
+        return record["params"][column["param"]][column["name"]]
+    value = record[column["name"]]
+    return [0.0 if value is None else value]
+
+
+def _narrowest_code(values):
+    low, high = min(values, default=0), max(values, default=0)
+    for code, bound in (("b", 1 << 7), ("h", 1 << 15)):
+        if -bound <= low and high < bound:
+            return code
+    return "i"
+
+
+def _little_endian(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _pad4(buf):
+    buf.extend(b"\0" * (-len(buf) % 4))
+
+
+class ChunkedTraceWriter:
+    """Writes ``<name>/manifest.json`` plus ``<name>/chunk_NNNN.bin`` for a ``<name>.json`` path."""
+
+    def __init__(self, path, header, row_length, round_digits, chunk_size=CHUNK_SIZE):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be > 0")
+        self.directory = Path(path).with_suffix("")
+        self.path = self.directory / "manifest.json"
+        self.header = header
+        self.scale = 10**round_digits
+        self.chunk_size = chunk_size
+        self.columns = trace_columns(header["parameter_options"], row_length)
+        self.chunks = []
+        self._pending = []
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for stale in self.directory.glob("chunk_*.bin"):
+            stale.unlink()
+
+    def write_step(self, record):
+        self._pending.append(record)
+        if record["step"] > 0 and record["step"] % self.chunk_size == 0:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        records, self._pending = self._pending, []
+        buf = bytearray()
+        dtypes = []
+        for column in self.columns:
+            rows = [[round(value * self.scale) for value in _record_values(record, column)] for record in records]
+            if column["delta"]:
+                base = rows[0]
+                buf.extend(_little_endian(array("i", base)))
+                previous = base
+                values = []
+                for row in rows:
+                    values.extend(value - prev for value, prev in zip(row, previous))
+                    previous = row
+            else:
+                values = [value for row in rows for value in row]
+            code = _narrowest_code(values)
+            dtypes.append(code)
+            buf.extend(_little_endian(array(code, values)))
+            _pad4(buf)
+        buf.extend("\n".join(record["word"] for record in records).encode("utf-8"))
+
+        name = f"chunk_{len(self.chunks):04d}.bin"
+        (self.directory / name).write_bytes(buf)
+        self.chunks.append(
+            {
+                "file": name,
+                "start_step": records[0]["step"],
+                "end_step": records[-1]["step"],
+                "bytes": len(buf),
+                "dtypes": "".join(dtypes),
+            }
+        )
+
+    def close(self):
+        self._flush()
+        manifest = {
+            "format_version": CHUNKED_FORMAT_VERSION,
+            **self.header,
+            "parameter_ids": [spec["id"] for spec in self.header["parameter_options"]],
+            "encoding": {"scale": self.scale, "byte_order": "little", "columns": self.columns},
+            "chunk_size": self.chunk_size,
+            "chunks": self.chunks,
+        }
+        with self.path.open("w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, ensure_ascii=False, separators=(",", ":"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_trace_writer(trace_format, path, header, row_length, round_digits):
+    if trace_format not in TRACE_FORMATS:
+        raise ValueError(f"Unknown trace format '{trace_format}', expected one of {TRACE_FORMATS}")
+    if trace_format == "json":
+        return JsonTraceWriter(path, header)
+    return ChunkedTraceWriter(path, header, row_length, round_digits)
+
+
+def trace_output_path(trace_format, path):
+    """What a writer for ``path`` creates: the chunk directory, or the JSON file itself."""
+    return Path(path).with_suffix("") if trace_format == "chunked" else Path(path)
+
+
+def decode_chunk(manifest, chunk, data):
+    """Step records of one chunk file, in the JSON payload shape."""
+    scale = manifest["encoding"]["scale"]
+    count = chunk["end_step"] - chunk["start_step"] + 1
+    records = [
+        {"step": chunk["start_step"] + i, "word": "", "loss": None, "learning_rate": None, "params": {}}
+        for i in range(count)
+    ]
+    offset = 0
+    for column, code in zip(manifest["encoding"]["columns"], chunk["dtypes"]):
+        length = column["length"]
+        base = None
+        if column["delta"]:
+            base = array("i")
+            base.frombytes(data[offset : offset + 4 * length])
+            offset += 4 * length
+        values = array(code)
+        size = values.itemsize * count * length
+        values.frombytes(data[offset : offset + size])
+        offset += size + (-(offset + size) % 4)
+        if sys.byteorder != "little":
+            values.byteswap()
+            if base is not None:
+                base.byteswap()
+
+        current = list(base) if base is not None else None
+        for i, record in enumerate(records):
+            row = values[i * length : (i + 1) * length]
+            if current is not None:
+                current = [prev + delta for prev, delta in zip(current, row)]
+                row = current
+            decoded = [value / scale for value in row]
+            if "param" in column:
+                record["params"].setdefault(column["param"], {})[column["name"]] = decoded
+            else:
+                record[column["name"]] = decoded[0]
+
+    for record, word in zip(records, data[offset:].decode("utf-8").split("\n")):
+        record["word"] = word
+    if records[0]["step"] == 0:
+        records[0]["loss"] = None
+    return records
+
+
+def read_chunked_trace(manifest_path, max_step=None):
+    """Decode a chunked trace (up to ``max_step`` if given) into the JSON payload shape."""
+    manifest_path = Path(manifest_path)
+    with manifest_path.open(encoding="utf-8") as handle:
+        manifest = json.load(handle)
+
+    steps = []
+    for chunk in manifest["chunks"]:
+        if max_step is not None and chunk["start_step"] > max_step:
+            break
+        steps.extend(decode_chunk(manifest, chunk, (manifest_path.parent / chunk["file"]).read_bytes()))
+
+    header_keys = ("num_steps", "step_options", "optimizer", "parameter_options")
+    return {"format_version": 1, **{key: manifest[key] for key in header_keys}, "steps": steps}